@@ -21,10 +21,15 @@
 # SOFTWARE.
 
 
+import os
+import time
 import typing
 import unittest
 import asyncio
-from manager.basic.dataLink import DataLinker, DataLink, DataLinkNotify
+import threading
+import multiprocessing
+from manager.basic.dataLink import DataLinker, DataLink, DataLinkNotify, \
+    notify_frame
 from manager.basic.letter import sending, NotifyLetter
 
 
@@ -38,6 +43,11 @@ async def data_processor(dl: DataLink, data: typing.Any, args: typing.Any) -> No
         dl.notify(notify)
 
 
+async def data_processor_each(dl: DataLink, data: typing.Any,
+                              args: typing.Any) -> None:
+    dl.notify(DataLinkNotify("Data", int(data.getHeader('ident'))))
+
+
 def data_processor_udp(dl: DataLink, data: typing.Any, args: typing.Any) -> None:
     received_data = args
     n = int(data.getHeader('ident'))
@@ -125,3 +135,67 @@ class DataLinkerTestCases(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(["SendDone"], notify_content)
 
         self.dlinker.stop()
+
+    async def test_DataLinker_Notify_InLoop(self) -> None:
+        # Setup
+        notifies = []  # type: typing.List
+
+        self.dlinker.addDataLink("127.0.0.1", 3502, DataLink.TCP_DATALINK,
+                                 data_processor_each, None)
+        self.dlinker.addNotify(
+            "Data", lambda msg, arg: notifies.append(
+                (msg, threading.get_ident(), time.time())), None)
+
+        # Exercise
+        self.dlinker.start()
+        await asyncio.sleep(1)
+
+        r, w = await asyncio.open_connection("127.0.0.1", 3502)
+
+        for n in range(10):
+            await sending(w, NotifyLetter(str(n), str(n), {}))
+        sent = time.time()
+
+        for i in range(100):
+            if len(notifies) == 10:
+                break
+            await asyncio.sleep(0.01)
+
+        # Verify
+        self.assertEqual(list(range(10)), [n for n, _, _ in notifies])
+
+        # Callbacks are called within the loop as soon as
+        # notifies arrive.
+        self.assertTrue(all(ident == threading.get_ident()
+                            for _, ident, _ in notifies))
+        self.assertLess(notifies[-1][2] - sent, 0.5)
+
+        w.close()
+        self.dlinker.stop()
+
+    async def test_DataLinker_Notify_Partial(self) -> None:
+        # Setup
+        notifies = []  # type: typing.List
+        self.dlinker.addNotify(
+            "Data", lambda msg, arg: notifies.append(msg), None)
+
+        r, w = multiprocessing.Pipe(duplex=False)
+        os.set_blocking(r.fileno(), False)
+        frame = notify_frame([("Data", 1), ("Data", 2)])
+
+        # Exercise
+        # Half of a batch is arrived, DataLinker should not
+        # wait for the rest.
+        os.write(w.fileno(), frame[:5])
+        self.dlinker._recv(r)
+        half = list(notifies)
+
+        os.write(w.fileno(), frame[5:])
+        self.dlinker._recv(r)
+
+        # Verify
+        self.assertEqual([], half)
+        self.assertEqual([1, 2], notifies)
+
+        r.close()
+        w.close()
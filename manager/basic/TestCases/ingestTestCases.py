@@ -0,0 +1,149 @@
+# MIT License
+#
+# Copyright (c) 2020 Gcom
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import hashlib
+import tempfile
+import unittest
+
+from manager.basic.ingest import IngestEngine, INGEST_STREAM_EXISTS, \
+    FSYNC_ALWAYS
+
+
+class IngestTestCases(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "file")
+        self.engine = IngestEngine(bufferSize=1024, maxPending=4096)
+
+    async def asyncTearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def content(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    async def test_Ingest_Write(self) -> None:
+        # Exercise
+        stream = self.engine.open("1_GL5610", self.path)
+        for i in range(100):
+            await stream.write(bytes([i]) * 100)
+        await stream.close()
+
+        # Verify
+        self.assertEqual(b"".join(bytes([i]) * 100 for i in range(100)),
+                         self.content())
+        self.assertEqual(0, self.engine.numOfStreams())
+
+    async def test_Ingest_Buffered(self) -> None:
+        # Exercise
+        stream = self.engine.open("1_GL5610", self.path)
+        await stream.write(b"x" * 100)
+
+        # Verify
+        self.assertEqual(100, stream.numOfPending())
+        self.assertEqual(b"", self.content())
+
+        await stream.flush()
+        self.assertEqual(0, stream.numOfPending())
+        await stream.close()
+
+        self.assertEqual(b"x" * 100, self.content())
+
+    async def test_Ingest_Bounded(self) -> None:
+        # Exercise
+        stream = self.engine.open("1_GL5610", self.path)
+
+        peak = 0
+        for i in range(1000):
+            await stream.write(b"x" * 512)
+            peak = max(peak, stream.numOfPending())
+        await stream.close()
+
+        # Verify
+        self.assertLessEqual(peak, 4096 + 1024)
+        self.assertEqual(512 * 1000, len(self.content()))
+
+    async def test_Ingest_Digest(self) -> None:
+        # Exercise
+        stream = self.engine.open("1_GL5610", self.path, digest=True)
+        for i in range(10):
+            await stream.write(b"x" * 300)
+        await stream.close()
+
+        # Verify
+        self.assertEqual(hashlib.sha256(b"x" * 3000).hexdigest(),
+                         stream.digest())
+
+    async def test_Ingest_Offset(self) -> None:
+        # Setup
+        with open(self.path, "wb") as f:
+            f.write(b"a" * 10)
+
+        # Exercise
+        stream = self.engine.open("1_GL5610", self.path, 4)
+        await stream.write(b"bb")
+        await stream.close()
+
+        # Verify
+        self.assertEqual(b"aaaabbaaaa", self.content())
+
+    async def test_Ingest_KeyedPerTransfer(self) -> None:
+        # Setup
+        other = os.path.join(self.tmp.name, "other")
+
+        # Exercise
+        s1 = self.engine.open("1_GL5610", self.path)
+        s2 = self.engine.open("1_GL8900", other)
+
+        with self.assertRaises(INGEST_STREAM_EXISTS):
+            self.engine.open("1_GL5610", other)
+
+        await s1.write(b"1")
+        await s2.write(b"2")
+        await s2.close()
+        await s1.close()
+
+        # Verify
+        self.assertEqual(b"1", self.content())
+        with open(other, "rb") as f:
+            self.assertEqual(b"2", f.read())
+
+    async def test_Ingest_Abort(self) -> None:
+        # Setup
+        engine = IngestEngine(bufferSize=1024, fsync=FSYNC_ALWAYS)
+
+        # Exercise
+        stream = engine.open("1_GL5610", self.path)
+        await stream.write(b"x" * 2048)
+        await stream.write(b"y" * 10)
+        await stream.abort()
+
+        # Verify
+        self.assertEqual(b"x" * 2048, self.content())
+        self.assertIsNone(engine.get("1_GL5610"))
+
+    def test_Ingest_FsyncPolicy(self) -> None:
+        with self.assertRaises(ValueError):
+            IngestEngine(fsync="sometimes")
@@ -0,0 +1,167 @@
+# MIT License
+#
+# Copyright (c) 2020 Gcom
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import typing
+import asyncio
+import unittest
+
+from manager.basic.letter import Letter, HeartbeatLetter, LogLetter, \
+    ResponseLetter, NewLetter, CancelLetter, TaskLogLetter
+from manager.basic.letterWriter import LetterWriter
+
+
+class WriterDummy:
+
+    def __init__(self) -> None:
+        self.writes = []  # type: typing.List[typing.List[bytes]]
+        self.drains = 0
+        self.closing = False
+
+    def is_closing(self) -> bool:
+        return self.closing
+
+    def writelines(self, datas: typing.List[bytes]) -> None:
+        self.writes.append(list(datas))
+
+    async def drain(self) -> None:
+        self.drains += 1
+
+    def letters(self) -> typing.List[Letter]:
+        return [Letter.parse(data) for datas in self.writes for data in datas]
+
+
+class LetterWriterTestCases(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        self.w = WriterDummy()
+        self.lw = LetterWriter(self.w)  # type: ignore
+
+    async def asyncTearDown(self) -> None:
+        self.lw.stop()
+
+    async def test_LetterWriter_Coalesce(self) -> None:
+        # Setup
+        self.lw.start()
+
+        # Exercise
+        await asyncio.gather(
+            *[self.lw.send(HeartbeatLetter("W", i)) for i in range(10)])
+
+        # Verify
+        self.assertEqual(1, len(self.w.writes))
+        self.assertEqual(1, self.w.drains)
+        self.assertEqual(list(range(10)),
+                         [l.getSeq() for l in self.w.letters()])
+
+    async def test_LetterWriter_Priority(self) -> None:
+        # Setup
+        logs = [self.lw.send(LogLetter("W", "L", str(i))) for i in range(3)]
+        resp = self.lw.send(ResponseLetter("W", "T", "0"))
+
+        # Exercise
+        sends = asyncio.gather(*logs, resp)
+        await asyncio.sleep(0)
+        self.lw.start()
+        await sends
+
+        # Verify
+        letters = self.w.letters()
+        self.assertEqual(Letter.Response, letters[0].typeOfLetter())
+        self.assertTrue(all(
+            l.typeOfLetter() == Letter.Log for l in letters[1:]))
+
+    async def test_LetterWriter_TaskOrder(self) -> None:
+        # Setup
+        sends = [
+            self.lw.send(NewLetter("T", "sn", "vsn", "", {})),
+            self.lw.send(TaskLogLetter("T", "log")),
+            self.lw.send(ResponseLetter("W", "T", "2")),
+            self.lw.send(CancelLetter("T", "single")),
+            self.lw.send(HeartbeatLetter("W", 0))
+        ]
+
+        # Exercise
+        fut = asyncio.gather(*sends)
+        await asyncio.sleep(0)
+        self.lw.start()
+        await fut
+
+        # Verify
+        # Only letters without task state overtake letters of task.
+        self.assertEqual(
+            [Letter.Heartbeat, Letter.NewTask, Letter.TaskLog,
+             Letter.Response, Letter.TaskCancel],
+            [l.typeOfLetter() for l in self.w.letters()])
+
+    async def test_LetterWriter_Frame(self) -> None:
+        # Setup
+        self.lw.setFrame(Letter.FRAME_V2)
+        self.lw.start()
+
+        # Exercise
+        await self.lw.send(HeartbeatLetter("W", 0))
+
+        # Verify
+        data = self.w.writes[0][0]
+        self.assertEqual(Letter.WIDE_FRAME_MARK,
+                         int.from_bytes(data[:2], "big"))
+
+    async def test_LetterWriter_Compress(self) -> None:
+        # Setup
+        letter = LogLetter("W", "L", "message" * 1000)
+        self.lw.setCompress(1024)
+        self.lw.start()
+
+        # Exercise
+        await self.lw.send(letter)
+        self.lw.setFrame(Letter.FRAME_V4)
+        await self.lw.send(letter)
+
+        # Verify
+        first, second = self.w.writes[0][0], self.w.writes[1][0]
+        self.assertEqual(len(first) - 2, int.from_bytes(first[:2], "big"))
+        self.assertEqual(Letter.COMPRESSED_FRAME_MARK,
+                         int.from_bytes(second[:2], "big"))
+        self.assertEqual(letter.toString(), self.w.letters()[1].toString())
+
+    async def test_LetterWriter_Closed(self) -> None:
+        # Setup
+        self.w.closing = True
+        self.lw.start()
+
+        # Exercise and Verify
+        with self.assertRaises(ConnectionError):
+            await self.lw.send(HeartbeatLetter("W", 0))
+
+    async def test_LetterWriter_Stop(self) -> None:
+        # Setup
+        t = asyncio.get_running_loop().create_task(
+            self.lw.send(HeartbeatLetter("W", 0)))
+        await asyncio.sleep(0)
+
+        # Exercise
+        self.lw.stop()
+
+        # Verify
+        with self.assertRaises(ConnectionError):
+            await t
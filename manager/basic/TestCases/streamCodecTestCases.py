@@ -0,0 +1,102 @@
+# MIT License
+#
+# Copyright (c) 2020 Gcom
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import asyncio
+import tempfile
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+from manager.basic.streamCodec import ENCODING_NONE, ENCODING_ZLIB, \
+    BLOCK_SIZE, choose_encoding, encode_range, decode_blocks
+
+
+class StreamCodecTestCases(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+
+    async def asyncTearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def file(self, name: str, content: bytes) -> str:
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_StreamCodec_Choose(self) -> None:
+        text = b"firmware image of GL5610\n" * 100000
+
+        self.assertEqual(ENCODING_ZLIB,
+                         choose_encoding(self.file("img.bin", text), 1))
+
+        # Disabled.
+        self.assertEqual(ENCODING_NONE,
+                         choose_encoding(self.file("img.bin", text), 0))
+
+        # Already compressed.
+        self.assertEqual(ENCODING_NONE,
+                         choose_encoding(self.file("img.rar", text), 1))
+        self.assertEqual(ENCODING_NONE, choose_encoding(
+            self.file("img.bin", os.urandom(1024 * 1024)), 1))
+
+    async def test_StreamCodec_Roundtrip(self) -> None:
+        # Setup
+        content = os.urandom(1024) * (3 * BLOCK_SIZE // 1024) + b"tail"
+        path = self.file("img.bin", content)
+
+        # Exercise
+        blocks = []
+        with ThreadPoolExecutor(4) as e:
+            async for block in encode_range(path, 100, len(content), 1,
+                                            e, 4):
+                blocks.append(block)
+
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"".join(blocks))
+        reader.feed_eof()
+
+        decoded = [chunk async for chunk in
+                   decode_blocks(reader, len(content) - 100)]
+
+        # Verify
+        self.assertEqual(3, len(blocks))
+        self.assertLess(sum(len(b) for b in blocks), len(content))
+        self.assertEqual(content[100:], b"".join(decoded))
+
+    async def test_StreamCodec_Truncated(self) -> None:
+        path = self.file("img.bin", b"x" * 1024)
+
+        blocks = []
+        with ThreadPoolExecutor(1) as e:
+            async for block in encode_range(path, 0, 1024, 1, e, 1):
+                blocks.append(block)
+
+        reader = asyncio.StreamReader()
+        reader.feed_data(blocks[0][:-1])
+        reader.feed_eof()
+
+        with self.assertRaises(ConnectionError):
+            async for chunk in decode_blocks(reader, 1024):
+                pass
@@ -0,0 +1,360 @@
+# MIT License
+#
+# Copyright (c) 2020 Gcom
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# letterBench.py
+#
+# Micro-benchmarks of letter encoding, decoding and of
+# sending()/receving() over loopback.
+#
+# Usage: python -m manager.basic.benchmarks.letterBench [--json] [--quick]
+#
+# With --json a list of records is printed, each record is:
+#   {"suite": ..., "name": ..., "frame": ..., "size": ...,
+#    "ops_per_sec": ..., "bytes_per_sec": ..., "alloc_per_op": ...,
+#    "peak_bytes": ...}
+# size is length of a letter in bytes and alloc_per_op is the peak
+# memory in bytes allocated while one operation is done. Loopback
+# records has no alloc_per_op but peak_bytes which is peak memory
+# allocated while LOOPBACK_TRACED letters is transfered.
+
+import sys
+import json
+import timeit
+import asyncio
+import argparse
+import tracemalloc
+
+from typing import Any, Dict, List, Optional, Tuple, Callable
+from manager.basic.letter import Letter, NewLetter, ResponseLetter, \
+    PropLetter, CommandLetter, CmdResponseLetter, PostTaskLetter, \
+    CancelLetter, NotifyLetter, LogLetter, LogRegLetter, ReqLetter, \
+    HeartbeatLetter, TaskLogLetter, BinaryLetter, FileDescLetter, \
+    parseMethods, compactLayouts, sending, receving
+
+
+Record = Dict[str, Any]
+
+FRAMES = [Letter.FRAME_V1, Letter.FRAME_V2, Letter.FRAME_V3,
+          Letter.FRAME_V4]
+CHUNK_SIZES = [1024, 16 * 1024, 64 * 1024, 256 * 1024]
+LOOPBACK_TRACED = 100
+
+# Threshold of compression of FRAME_V4 letters.
+COMPRESS_THRESHOLD = 256
+
+
+def compress_of(frame: int) -> int:
+    return COMPRESS_THRESHOLD if frame >= Letter.FRAME_V4 else 0
+
+
+def sample_letters() -> List[Letter]:
+    """
+    One letter of each type that transfer in json format.
+    """
+    return [
+        NewLetter("1_GL5610", "sn", "vsn", "2020-01-01 00:00:00",
+                  {"resultPath": "./out.rar",
+                   "cmds": ["echo " + str(i) for i in range(10)]},
+                  needPost="true"),
+        ResponseLetter("worker", "1_GL5610", Letter.RESPONSE_STATE_IN_PROC),
+        PropLetter("worker", "2", "0", "NORMAL"),
+        CommandLetter("cancel_job", {}, target="1_GL5610"),
+        CmdResponseLetter("worker", "post", CmdResponseLetter.STATE_SUCCESS,
+                          {}),
+        PostTaskLetter("1_Job", "vsn", ["cat * > total"], "./total",
+                       ["1_GL5610", "1_GL8900"]),
+        CancelLetter("1_GL5610", CancelLetter.TYPE_SINGLE),
+        NotifyLetter("worker", "WSC", {"state": "0"}),
+        LogLetter("worker", "logId", "message"),
+        LogRegLetter("worker", "logId"),
+        ReqLetter("worker", "type", "message"),
+        HeartbeatLetter("worker", 1),
+        TaskLogLetter("1_GL5610", "output of command"),
+        FileDescLetter("1_GL5610", "vsn", "out.rar", 1024 * 1024 * 1024),
+    ]
+
+
+def parse_twice(s: bytes) -> Letter:
+    """
+    Decode path before the single pass decoder, json is parsed
+    once to find the type and again by the typed parse method.
+    """
+    dict_ = json.loads(s[2:].decode())
+    return parseMethods[dict_['type']].parse(s)
+
+
+def bench(f: Callable, arg: Any, number: int) -> float:
+    """
+    Return operations per second.
+    """
+    seconds = timeit.timeit(lambda: f(arg), number=number)
+    return number / seconds
+
+
+def bench_parse(number: int = 20000) -> List[Tuple[str, float, float]]:
+    results = []
+
+    for letter in sample_letters():
+        bStr = letter.toBytesWithLength()
+
+        before = bench(parse_twice, bStr, number)
+        after = bench(Letter.parse, bStr, number)
+
+        results.append((letter.typeOfLetter(), before, after))
+
+    return results
+
+
+def bench_codec(number: int = 20000) \
+        -> List[Tuple[str, int, int, float, float]]:
+    """
+    Compare FRAME_V3 with json in FRAME_V2 for fixed-shape letters.
+    Each operation encode a letter and parse it back.
+    """
+    results = []
+
+    for letter in sample_letters():
+        if letter.typeOfLetter() not in compactLayouts:
+            continue
+
+        def roundtrip(frame: int) -> Optional[Letter]:
+            return Letter.parse(letter.toBytesWithLength(frame))
+
+        jsonLen = len(letter.toBytesWithLength(Letter.FRAME_V2))
+        compactLen = len(letter.toBytesWithLength(Letter.FRAME_V3))
+
+        json_ = bench(roundtrip, Letter.FRAME_V2, number)
+        compact = bench(roundtrip, Letter.FRAME_V3, number)
+
+        results.append((letter.typeOfLetter(), jsonLen, compactLen,
+                        json_, compact))
+
+    return results
+
+
+def binary_letter(size: int) -> BinaryLetter:
+    return BinaryLetter("1_GL5610", b"x" * size, fileName="out.rar",
+                        parent="vsn")
+
+
+def alloc_per_op(f: Callable, number: int = 100) -> int:
+    """
+    Average peak bytes allocated while f is called.
+    """
+    total = 0
+
+    tracemalloc.start()
+    try:
+        for i in range(number):
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            f()
+            _, peak = tracemalloc.get_traced_memory()
+            total += peak - base
+    finally:
+        tracemalloc.stop()
+
+    return total // number
+
+
+def record(suite: str, name: str, frame: int, size: int,
+           ops: float, alloc: Optional[int],
+           peak: Optional[int] = None) -> Record:
+    return {
+        "suite": suite,
+        "name": name,
+        "frame": frame,
+        "size": size,
+        "ops_per_sec": ops,
+        "bytes_per_sec": ops * size,
+        "alloc_per_op": alloc,
+        "peak_bytes": peak
+    }
+
+
+def bench_letters(number: int = 20000) -> List[Record]:
+    """
+    Encode and parse of each type in parseMethods for every framing.
+    """
+    records = []  # type: List[Record]
+    letters = sample_letters() + [binary_letter(1024)]
+
+    covered = set(l.typeOfLetter() for l in letters)
+    assert(covered == set(parseMethods.keys()))
+
+    for letter in letters:
+        type_ = letter.typeOfLetter()
+
+        # Framing is not matter to BinaryLetter except
+        # compression of FRAME_V4.
+        frames = [Letter.FRAME_V1, Letter.FRAME_V4] \
+            if type_ == Letter.BinaryFile else FRAMES
+
+        for frame in frames:
+            compress = compress_of(frame)
+            bStr = letter.toBytesWithLength(frame, compress)
+
+            def encode() -> bytes:
+                return letter.toBytesWithLength(frame, compress)
+
+            def parse_() -> Optional[Letter]:
+                return Letter.parse(bStr)
+
+            for suite, f in [("encode", encode), ("parse", parse_)]:
+                ops = number / timeit.timeit(f, number=number)
+                records.append(record(suite, type_, frame, len(bStr),
+                                      ops, alloc_per_op(f)))
+
+    return records
+
+
+async def _loopback(letters: List[Letter], frame: int) -> float:
+    """
+    Send letters via sending() to a local server which receive
+    them via receving(), return seconds used.
+    """
+    done = asyncio.get_running_loop().create_future()
+
+    async def serve(r: asyncio.StreamReader,
+                    w: asyncio.StreamWriter) -> None:
+        for i in range(len(letters)):
+            await receving(r)
+        done.set_result(None)
+        w.close()
+
+    server = await asyncio.start_server(serve, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    r, w = await asyncio.open_connection("127.0.0.1", port)
+
+    begin = timeit.default_timer()
+    for letter in letters:
+        await sending(w, letter, frame=frame, compress=compress_of(frame))
+    await done
+    seconds = timeit.default_timer() - begin
+
+    w.close()
+    server.close()
+    await server.wait_closed()
+
+    return seconds
+
+
+def loopback_peak(letter: Letter, frame: int) -> int:
+    tracemalloc.start()
+    try:
+        asyncio.run(_loopback([letter] * LOOPBACK_TRACED, frame))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak
+
+
+def bench_loopback(number: int = 20000,
+                   bytes_: int = 64 * 1024 * 1024) -> List[Record]:
+    """
+    Throughput of sending() and receving() over loopback for control
+    letters in each framing and BinaryLetter streams in several size
+    of chunk. bytes_ is the total size of a BinaryLetter stream.
+    """
+    records = []  # type: List[Record]
+
+    for letter in [HeartbeatLetter("worker", 1),
+                   ResponseLetter("worker", "1_GL5610",
+                                  Letter.RESPONSE_STATE_IN_PROC)]:
+        for frame in FRAMES:
+            seconds = asyncio.run(_loopback([letter] * number, frame))
+            size = len(letter.toBytesWithLength(frame, compress_of(frame)))
+            records.append(record("loopback", letter.typeOfLetter(),
+                                  frame, size, number / seconds, None,
+                                  loopback_peak(letter, frame)))
+
+    for size in CHUNK_SIZES:
+        letter = binary_letter(size)
+        count = max(bytes_ // size, 1)
+
+        seconds = asyncio.run(_loopback([letter] * count, Letter.FRAME_V1))
+        records.append(record(
+            "loopback", letter.typeOfLetter(), Letter.FRAME_V1,
+            len(letter.toBytesWithLength()), count / seconds, None,
+            loopback_peak(letter, Letter.FRAME_V1)))
+
+    return records
+
+
+def print_records(records: List[Record]) -> None:
+    print("%-9s %-12s %5s %8s %14s %14s %10s %10s" % (
+        "suite", "type", "frame", "size", "ops/s", "MB/s",
+        "alloc B", "peak B"))
+
+    def opt(v: Optional[int]) -> str:
+        return "-" if v is None else str(v)
+
+    for r in records:
+        print("%-9s %-12s %5d %8d %14.0f %14.2f %10s %10s" % (
+            r["suite"], r["name"], r["frame"], r["size"],
+            r["ops_per_sec"], r["bytes_per_sec"] / 1024 / 1024,
+            opt(r["alloc_per_op"]), opt(r["peak_bytes"])))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks of letters")
+    parser.add_argument("--json", action="store_true",
+                        help="print records in json")
+    parser.add_argument("--quick", action="store_true",
+                        help="less iterations, for a smoke run")
+    args = parser.parse_args(argv)
+
+    number = 500 if args.quick else 20000
+    bytes_ = 4 * 1024 * 1024 if args.quick else 64 * 1024 * 1024
+
+    records = bench_letters(number) + bench_loopback(number, bytes_)
+
+    if args.json:
+        json.dump(records, sys.stdout, indent=1)
+        print()
+        return None
+
+    print_records(records)
+
+    print()
+    print("%-12s %14s %14s %8s" % ("type", "parse2x ops/s",
+                                   "parse ops/s", "speedup"))
+
+    for type_, before, after in bench_parse(number):
+        print("%-12s %14.0f %14.0f %7.2fx" %
+              (type_, before, after, after / before))
+
+    print()
+    print("%-12s %10s %10s %14s %14s %8s" % (
+        "type", "json B", "compact B", "json ops/s",
+        "compact ops/s", "speedup"))
+
+    for type_, jsonLen, compactLen, json_, compact in bench_codec(number):
+        print("%-12s %10d %10d %14.0f %14.0f %7.2fx" % (
+            type_, jsonLen, compactLen, json_, compact, compact / json_))
+
+
+if __name__ == '__main__':
+    main()
@@ -20,7 +20,12 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import os
+import json
+import pickle
+import struct
 import asyncio
+import hashlib
 import multiprocessing
 import threading
 import traceback
@@ -28,10 +33,17 @@ import abc
 from collections import namedtuple
 from manager.basic.letter import receving
 from typing import Dict, List, Callable, Any, \
-    Optional
+    Optional, AsyncIterator, Tuple, cast
 from asyncio import StreamReader, StreamWriter
-from manager.basic.mmanager import ModuleTDaemon
-from manager.basic.letter import Letter
+from multiprocessing.connection import Connection
+from multiprocessing.reduction import ForkingPickler
+from manager.basic.mmanager import ModuleDaemon
+from manager.basic.letter import Letter, FileDescLetter, sending
+from manager.basic.util import sha256_of_file
+from manager.basic.storage import RANGES_SUFFIX
+from manager.basic.ingest import IngestEngine
+from manager.basic.streamCodec import SUPPORTED_ENCODINGS, ENCODING_NONE, \
+    ENCODING_ZLIB, decode_blocks
 
 
 M_NAME = "DATALINKER"
@@ -45,6 +57,40 @@ arg = Any
 DataLinkNotify = namedtuple("notify", "tag msg")
 
 
+# Batches of notifies are framed as multiprocessing.Connection
+# does, | Length (4Bytes) : : Int | Pickled batch |, so both side
+# of the pipe are able to work in non-blocking mode and a
+# Connection is still able to recv() them.
+NOTIFY_FRAME_HEADER = struct.Struct("!i")
+
+# Bytes read from pipe of notifies at a time.
+NOTIFY_READ_SIZE = 65536
+
+
+def notify_frame(batch: List[Tuple[tag, Any]]) -> bytes:
+    data = bytes(ForkingPickler.dumps(batch))
+    return NOTIFY_FRAME_HEADER.pack(len(data)) + data
+
+
+def notify_unframe(buf: bytearray) -> List[List[Tuple[tag, Any]]]:
+    """
+    Batches of frames that completely in buf, bytes of them
+    are removed from buf.
+    """
+    batches = []  # type: List[List[Tuple[tag, Any]]]
+    hlen = NOTIFY_FRAME_HEADER.size
+
+    while len(buf) >= hlen:
+        size, = NOTIFY_FRAME_HEADER.unpack_from(buf)
+        if len(buf) < hlen + size:
+            break
+
+        batches.append(pickle.loads(buf[hlen:hlen+size]))
+        del buf[:hlen+size]
+
+    return batches
+
+
 class DATA_LINK_NOT_EXISTS(Exception):
 
     def __init__(self, host: str, port: int) -> None:
@@ -84,6 +130,245 @@ class Notifier:
         self._cb(msg, self._arg)
 
 
+class RawFile:
+    """
+    A range of a file transfered in raw bytes right after it's
+    FileDescLetter. Processor of a DataLink receive a RawFile
+    instead of the FileDescLetter, the range is transfered after
+    accept() is called and it's bytes are read via chunks().
+
+    If a processor ignore a RawFile sender fallback to transfer
+    the file in BinaryLetters.
+
+    saveTo() write ranges of a file into a partial file at their
+    position, progress of ranges is recorded beside the partial
+    file so transfer of a range resume from where it's broken.
+    """
+
+    CHUNK_SIZE = 256 * 1024
+
+    # Results of saveTo()
+    SAVE_PENDING = 0
+    SAVE_DONE = 1
+    SAVE_MISMATCH = 2
+
+    def __init__(self, desc: FileDescLetter, reader: StreamReader,
+                 writer: StreamWriter) -> None:
+        self.desc = desc
+        self._reader = reader
+        self._writer = writer
+        self._remain = desc.getEnd() - desc.getBegin()
+        self._sha256 = hashlib.sha256()
+        self.accepted = False
+
+    def getTid(self) -> str:
+        return self.desc.getTid()
+
+    def getParent(self) -> str:
+        return self.desc.getParent()
+
+    def getFileName(self) -> str:
+        return self.desc.getFileName()
+
+    def getMenu(self) -> str:
+        return self.desc.getMenu()
+
+    def getSize(self) -> int:
+        return self.desc.getSize()
+
+    async def accept(self, held: int = 0, sha256: Any = None) -> None:
+        """
+        Accept the range, held is the number of bytes of the range
+        already held and sha256 is a sha256 object of these bytes.
+        """
+        if sha256 is not None:
+            self._sha256 = sha256
+
+        self._remain = self.desc.getEnd() - self.desc.getBegin() - held
+        self.accepted = True
+
+        # Bytes are transfered without encoding if the
+        # requested encoding is not supported.
+        if self.desc.getEncoding() not in SUPPORTED_ENCODINGS:
+            self.desc.setEncoding(ENCODING_NONE)
+
+        self.desc.setOffset(self.desc.getBegin() + held)
+        await sending(self._writer, self.desc)
+
+    async def chunks(self, size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """
+        Bytes of the range, ConnectionError is raised if the
+        stream is closed before all bytes is received. Encoded
+        bytes are decoded.
+        """
+        if self.desc.getEncoding() == ENCODING_ZLIB:
+            async for chunk in decode_blocks(self._reader, self._remain):
+                self._remain -= len(chunk)
+                self._sha256.update(chunk)
+                yield chunk
+            return
+
+        while self._remain > 0:
+            chunk = await self._reader.read(min(size, self._remain))
+            if chunk == b"":
+                raise ConnectionError()
+
+            self._remain -= len(chunk)
+            self._sha256.update(chunk)
+            yield chunk
+
+    def isDone(self) -> bool:
+        return self._remain == 0
+
+    async def verify(self) -> bool:
+        """
+        Reply digest of received bytes to sender, return True
+        if it's equal to the digest of the range.
+        """
+        desc = self.desc
+        digest = self._sha256.hexdigest()
+
+        reply = FileDescLetter(
+            self.getTid(), self.getParent(), self.getFileName(),
+            self.getSize(), self.getMenu(), desc.getEnd(),
+            desc.getSha256(), desc.getBegin(), desc.getEnd(), digest)
+        await sending(self._writer, reply)
+
+        return digest == desc.getRangeSha256()
+
+    async def saveTo(self, partial: str, engine: IngestEngine) -> int:
+        """
+        Receive the range into partial via engine, return SAVE_DONE
+        if all ranges of the file are received and verified and
+        SAVE_PENDING if another ranges are not done yet.
+
+        SAVE_MISMATCH is returned if digest of the range is
+        mismatched, progress of the range is dropped so next
+        transfer of the range begin from zero.
+        """
+        desc = self.desc
+        begin, end = desc.getBegin(), desc.getEnd()
+
+        record = _ranges_load(partial, desc)
+        held = record["ranges"].get(str(begin), {}).get("held", 0)
+
+        sha256 = None
+        if held > 0:
+            sha256 = await asyncio.get_running_loop().run_in_executor(
+                None, sha256_of_file, partial, begin, held)
+
+        await self.accept(held, sha256)
+
+        # Ranges of a file are write concurrently so the partial
+        # file must not be truncated.
+        stream = engine.open(partial + "@" + str(begin), partial,
+                             begin + held)
+        try:
+            async for chunk in self.chunks():
+                await stream.write(chunk)
+                held += len(chunk)
+        finally:
+            # Bytes received before a link is broken are kept.
+            await stream.close()
+            _ranges_update(partial, desc, held, False)
+
+        if not await self.verify():
+            _ranges_drop(partial, desc)
+            return RawFile.SAVE_MISMATCH
+
+        if _ranges_update(partial, desc, end - begin, True):
+            return RawFile.SAVE_DONE
+        return RawFile.SAVE_PENDING
+
+
+def _ranges_path(partial: str) -> str:
+    return partial + RANGES_SUFFIX
+
+
+def _ranges_load(partial: str, desc: FileDescLetter) -> Dict:
+    """
+    Load progress of ranges of the partial file, progress and the
+    partial file are dropped if they belong to another file.
+    """
+    path = _ranges_path(partial)
+
+    record = None
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                record = json.load(f)
+        except ValueError:
+            pass
+
+        if record is not None and record["sha256"] == desc.getSha256() \
+           and record["size"] == desc.getSize():
+            return record
+
+    fresh = {"sha256": desc.getSha256(), "size": desc.getSize(),
+             "ranges": {}}  # type: Dict[str, Any]
+
+    if os.path.exists(partial):
+        held = os.path.getsize(partial)
+
+        if record is not None or held > desc.getSize():
+            os.remove(partial)
+        elif desc.getBegin() == 0 and held <= desc.getEnd():
+            # Partial file without progress is write from the
+            # begin of the file sequentially.
+            fresh["ranges"]["0"] = {"end": desc.getEnd(), "held": held,
+                                    "done": False}
+
+    _ranges_save(partial, fresh)
+
+    return fresh
+
+
+def _ranges_save(partial: str, record: Dict) -> None:
+    path = _ranges_path(partial)
+    tmp = partial + ".tmp" + RANGES_SUFFIX
+
+    with open(tmp, "w") as f:
+        json.dump(record, f)
+    os.replace(tmp, path)
+
+
+def _ranges_drop(partial: str, desc: FileDescLetter) -> None:
+    """
+    Forget progress of a range.
+    """
+    record = _ranges_load(partial, desc)
+    record["ranges"].pop(str(desc.getBegin()), None)
+    _ranges_save(partial, record)
+
+
+def _ranges_update(partial: str, desc: FileDescLetter, held: int,
+                   done: bool) -> bool:
+    """
+    Record progress of a range, return True if all ranges of
+    the file are done then the progress is removed.
+    """
+    record = _ranges_load(partial, desc)
+    ranges = record["ranges"]
+
+    ranges[str(desc.getBegin())] = {
+        "end": desc.getEnd(), "held": held, "done": done}
+
+    # Is the whole file covered by done ranges.
+    pos = 0
+    for begin, r in sorted((int(b), r) for b, r in ranges.items()):
+        if begin > pos:
+            break
+        if r["done"]:
+            pos = max(pos, r["end"])
+
+    if pos < record["size"]:
+        _ranges_save(partial, record)
+        return False
+
+    os.remove(_ranges_path(partial))
+    return True
+
+
 class DataLink(abc.ABC):
 
     TCP_DATALINK = "tcp"
@@ -92,13 +377,21 @@ class DataLink(abc.ABC):
 
     def __init__(self, host: str, port: int,
                  processor: Callable[['DataLink', Any, Any], None],
-                 args: Any, notify_q: multiprocessing.Queue) -> None:
+                 args: Any, notify_conn: Connection) -> None:
         """
         protocol's value is TCP_DATALINK or UDP_DATALINK
+
+        Notifies are sent to DataLinker via notify_conn, notifies
+        made in the same loop turn are sent in one batch.
         """
         self.host = host
         self.port = port
-        self._notifyQ = notify_q
+        self._notifyConn = notify_conn
+        self._notifies = []  # type: List[Tuple[tag, Any]]
+
+        # Framed notifies that not yet written into pipe.
+        self._notifyOut = bytearray()
+        self._notifyWaiting = False
 
         # Processor
         self._processor = processor  # type: Callable[[DataLink, Any, Any], None]
@@ -108,7 +401,7 @@ class DataLink(abc.ABC):
 
     def start(self) -> None:
         self._p = multiprocessing.Process(
-            target=self.run, args=(self._notifyQ,))
+            target=self.run, args=(self._notifyConn,))
         self._p.start()
 
     def stop(self) -> None:
@@ -116,9 +409,58 @@ class DataLink(abc.ABC):
             self._p.terminate()
 
     def notify(self, notify: DataLinkNotify) -> None:
-        self._notifyQ.put_nowait(tuple(notify))
+        self._notifies.append(tuple(notify))
+
+        if len(self._notifies) > 1:
+            return None
+
+        try:
+            asyncio.get_running_loop().call_soon(self._notify_flush)
+        except RuntimeError:
+            self._notify_flush()
+
+    def _notify_flush(self) -> None:
+        batch, self._notifies = self._notifies, []
+        self._notifyOut += notify_frame(batch)
+        self._notify_write()
 
-    def run(self, notify_q: multiprocessing.Queue) -> None:
+    def _notify_write(self) -> None:
+        """
+        Write framed notifies into pipe without block the loop,
+        bytes that the pipe unable to hold are written while
+        it's writable.
+        """
+        fd = self._notifyConn.fileno()
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop to wait for the pipe.
+            os.set_blocking(fd, True)
+            while self._notifyOut:
+                n = os.write(fd, self._notifyOut)
+                del self._notifyOut[:n]
+            return None
+
+        os.set_blocking(fd, False)
+
+        try:
+            n = os.write(fd, self._notifyOut)
+        except BlockingIOError:
+            n = 0
+        except OSError:
+            # DataLinker is gone, nobody to notify.
+            n = len(self._notifyOut)
+        del self._notifyOut[:n]
+
+        if self._notifyOut and not self._notifyWaiting:
+            loop.add_writer(fd, self._notify_write)
+            self._notifyWaiting = True
+        elif not self._notifyOut and self._notifyWaiting:
+            loop.remove_writer(fd)
+            self._notifyWaiting = False
+
+    def run(self, notify_conn: Connection) -> None:
         # Setup a loop for current thread.
         asyncio.set_event_loop(
             asyncio.new_event_loop())
@@ -153,7 +495,17 @@ class TCPDataLink(DataLink):
         while True:
             try:
                 letter = await receving(reader)
-                await self._processor(self, letter, self._args)  # type: ignore
+
+                if isinstance(letter, FileDescLetter):
+                    raw = RawFile(letter, reader, writer)
+                    await self._processor(self, raw, self._args)  # type: ignore
+
+                    # Processor accept the file but not read all
+                    # of it, rest of the stream is unusable.
+                    if raw.accepted and not raw.isDone():
+                        raise ConnectionError()
+                else:
+                    await self._processor(self, letter, self._args)  # type: ignore
             except Exception:
                 writer.close()
                 break
@@ -193,7 +545,13 @@ class UDPDataLink(DataLink):
         transport.close()
 
 
-class DataLinker(ModuleTDaemon):
+class DataLinker(ModuleDaemon):
+    """
+    Own DataLinks and deliver their notifies to callbacks. Each
+    DataLink send notifies through it's own pipe which is read by
+    the event loop that start the DataLinker, so callbacks are
+    called within that loop as soon as notifies arrive.
+    """
 
     SUPPORT_PROTOS = {
         DataLink.TCP_DATALINK: TCPDataLink,
@@ -201,14 +559,13 @@ class DataLinker(ModuleTDaemon):
     }
 
     def __init__(self) -> None:
-        # Init as a Thread ModuleDaemon
-        ModuleTDaemon.__init__(self, M_NAME)
+        ModuleDaemon.__init__(self, M_NAME)
 
         self._links = []  # type: List[DataLink]
-        self._msgQueue = multiprocessing.Queue(256) \
-            # type: multiprocessing.Queue[DataLinkNotify]
+        self._conns = []  # type: List[Connection]
+        self._inbufs = {}  # type: Dict[int, bytearray]
         self._notify_cb = {}  # type: Dict[tag, Notifier]
-        self._isNeedStop = False
+        self._loop = None  # type: Optional[asyncio.AbstractEventLoop]
 
     def addDataLink(self, host: str, port: int, proto: str,
                     processor: Callable, args: Any) -> None:
@@ -220,9 +577,12 @@ class DataLinker(ModuleTDaemon):
         if proto not in DataLinker.SUPPORT_PROTOS:
             raise DATA_LINK_PROTO_NOT_SUPPORT(proto)
 
+        r, w = multiprocessing.Pipe(duplex=False)
+
         dl = DataLinker.SUPPORT_PROTOS[proto](
-            host, port, processor, args, self._msgQueue)
+            host, port, processor, args, w)
         self._links.append(dl)
+        self._conns.append(r)
 
     def addNotify(self, tag: str, cb: Callable[[Any, Any], None], arg: Any) -> None:
         if tag in self._notify_cb:
@@ -239,26 +599,61 @@ class DataLinker(ModuleTDaemon):
         return len(match) > 0
 
     def start(self) -> None:
-        threading.Thread.start(self)
-
-    def is_alive(self) -> bool:
-        return threading.Thread.is_alive(self)
-
-    def run(self) -> None:
+        self._loop = asyncio.get_running_loop()
 
         # Start all DataLinks
         for dl in self._links:
             dl.start()
 
-        # Deal with messages from DataLinks.
+        for conn in self._conns:
+            try:
+                os.set_blocking(conn.fileno(), False)
+                self._loop.add_reader(conn.fileno(), self._recv, conn)
+            except NotImplementedError:
+                # Loop unable to watch a pipe, read it in a
+                # thread and hand notifies over to the loop.
+                os.set_blocking(conn.fileno(), True)
+                threading.Thread(target=self._recv_thread, args=(conn,),
+                                 daemon=True).start()
+
+        self.alive = True
+
+    async def run(self) -> None:
+        return None
+
+    def _recv(self, conn: Connection) -> None:
+        # Pipe is readable doesn't mean a whole batch is arrived,
+        # bytes are buffered until frames of them are complete.
+        fd = conn.fileno()
+        buf = self._inbufs.setdefault(fd, bytearray())
+
+        try:
+            data = os.read(fd, NOTIFY_READ_SIZE)
+            if data == b"":
+                raise EOFError
+            buf += data
+        except BlockingIOError:
+            pass
+        except (EOFError, OSError):
+            cast(asyncio.AbstractEventLoop, self._loop) \
+                .remove_reader(fd)
+
+        for batch in notify_unframe(buf):
+            self._dispatch(batch)
+
+    def _recv_thread(self, conn: Connection) -> None:
+        loop = cast(asyncio.AbstractEventLoop, self._loop)
+
         while True:
             try:
-                tag, msg = self._msgQueue.get(timeout=3)
-            except multiprocessing.queues.Empty:
-                if self._isNeedStop is True:
-                    break
-                continue
+                batch = conn.recv()
+            except (EOFError, OSError):
+                return
 
+            loop.call_soon_threadsafe(self._dispatch, batch)
+
+    def _dispatch(self, batch: List[Tuple[tag, Any]]) -> None:
+        for tag, msg in batch:
             if tag not in self._notify_cb:
                 continue
 
@@ -267,13 +662,20 @@ class DataLinker(ModuleTDaemon):
             except Exception:
                 traceback.print_exc()
 
+    def stop(self) -> None:
+        if self._loop is not None and self.alive:
+            for conn in self._conns:
+                try:
+                    self._loop.remove_reader(conn.fileno())
+                except NotImplementedError:
+                    pass
+
+        self.alive = False
+
         # Stop all DataLinks
         for dl in self._links:
             dl.stop()
 
-    def stop(self) -> None:
-        self._isNeedStop = True
-
     async def begin(self) -> None:
         return
 
@@ -0,0 +1,259 @@
+# MIT License
+#
+# Copyright (c) 2020 Gcom
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# ingest.py
+#
+# Write files received from DataLinks behind buffers, bytes are
+# flushed to disk by a dedicated thread so disk writes never block
+# the event loop of a DataLink.
+
+import os
+import asyncio
+import hashlib
+import typing as T
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+# When is a file sync to disk.
+FSYNC_NEVER = "never"
+FSYNC_CLOSE = "close"
+FSYNC_ALWAYS = "always"
+
+FSYNC_POLICIES = (FSYNC_NEVER, FSYNC_CLOSE, FSYNC_ALWAYS)
+
+
+class INGEST_STREAM_EXISTS(Exception):
+
+    def __init__(self, key: str) -> None:
+        self._key = key
+
+    def __str__(self) -> str:
+        return "IngestStream " + self._key + " is already exists."
+
+
+class IngestStream:
+    """
+    A file in write. Bytes are collected into a buffer, a buffer
+    is flushed by the flush thread after it's full. write() wait
+    if more than maxPending bytes are not flushed so memory used
+    by a stream is bounded.
+
+    Error of a flush is raised by the next write() or close().
+    """
+
+    def __init__(self, engine: 'IngestEngine', key: str, path: str,
+                 fd: T.BinaryIO, digest: bool = False) -> None:
+        self._engine = engine
+        self._key = key
+        self._path = path
+        self._fd = fd
+
+        # Bytes are hashed in the flush thread.
+        self._sha256 = hashlib.sha256() if digest else None
+
+        self._buffer = bytearray()
+        self._pending = 0
+        self._flushes = deque()  # type: T.Deque[asyncio.Future]
+
+    def path(self) -> str:
+        return self._path
+
+    def key(self) -> str:
+        return self._key
+
+    def digest(self) -> str:
+        """
+        Hex sha256 of bytes flushed, "" if the stream is
+        opened without digest.
+        """
+        if self._sha256 is None:
+            return ""
+        return self._sha256.hexdigest()
+
+    def numOfPending(self) -> int:
+        """
+        Bytes that are not write to file yet.
+        """
+        return len(self._buffer) + self._pending
+
+    async def write(self, data: bytes) -> None:
+        self._buffer += data
+
+        if len(self._buffer) >= self._engine.bufferSize:
+            self._submit()
+
+        while self._pending > self._engine.maxPending:
+            await self._wait_oldest()
+
+    async def flush(self) -> None:
+        self._submit()
+
+        while self._flushes:
+            await self._wait_oldest()
+
+    async def close(self) -> None:
+        """
+        Flush all bytes then close the file, the file is sync
+        to disk unless the fsync policy is FSYNC_NEVER.
+        """
+        try:
+            await self.flush()
+        finally:
+            self._engine._remove(self._key)
+
+            await asyncio.get_running_loop().run_in_executor(
+                self._engine._executor, self._closeSync,
+                self._engine.fsync != FSYNC_NEVER)
+
+    async def abort(self) -> None:
+        """
+        Close the file without flush bytes in buffer.
+        """
+        self._buffer = bytearray()
+        self._engine._remove(self._key)
+
+        for f in self._flushes:
+            await asyncio.wait([f])
+        self._flushes.clear()
+
+        await asyncio.get_running_loop().run_in_executor(
+            self._engine._executor, self._closeSync, False)
+
+    def _submit(self) -> None:
+        if len(self._buffer) == 0:
+            return None
+
+        data, self._buffer = bytes(self._buffer), bytearray()
+        self._pending += len(data)
+
+        f = asyncio.get_running_loop().run_in_executor(
+            self._engine._executor, self._flushSync, data,
+            self._engine.fsync == FSYNC_ALWAYS)
+        self._flushes.append(f)
+
+    async def _wait_oldest(self) -> None:
+        f = self._flushes.popleft()
+        self._pending -= await f
+
+    def _flushSync(self, data: bytes, sync: bool) -> int:
+        self._fd.write(data)
+
+        if self._sha256 is not None:
+            self._sha256.update(data)
+
+        if sync:
+            self._fd.flush()
+            os.fsync(self._fd.fileno())
+
+        return len(data)
+
+    def _closeSync(self, sync: bool) -> None:
+        try:
+            if sync:
+                self._fd.flush()
+                os.fsync(self._fd.fileno())
+        finally:
+            self._fd.close()
+
+
+class IngestEngine:
+    """
+    Own streams of files in transfer, a stream is keyed by it's
+    transfer so concurrent transfers never share a file handle.
+
+    All streams are flushed by one thread so bytes of a stream are
+    write in order.
+    """
+
+    BUFFER_SIZE = 1024 * 1024
+    MAX_PENDING = 8 * 1024 * 1024
+
+    def __init__(self, bufferSize: int = BUFFER_SIZE,
+                 maxPending: int = MAX_PENDING,
+                 fsync: str = FSYNC_CLOSE) -> None:
+
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError("Unknown fsync policy: " + fsync)
+
+        self.bufferSize = bufferSize
+        self.maxPending = maxPending
+        self.fsync = fsync
+
+        self._streams = {}  # type: T.Dict[str, IngestStream]
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="Ingest")
+
+    @staticmethod
+    def fromConfig(config: T.Any) -> 'IngestEngine':
+        """
+        Create an engine via INGEST section of config:
+
+        INGEST:
+          buffer: 1048576
+          pending: 8388608
+          fsync: close
+        """
+        bufferSize = config.getConfig('INGEST', 'buffer')
+        maxPending = config.getConfig('INGEST', 'pending')
+        fsync = config.getConfig('INGEST', 'fsync')
+
+        return IngestEngine(
+            int(bufferSize) if bufferSize != "" else IngestEngine.BUFFER_SIZE,
+            int(maxPending) if maxPending != "" else IngestEngine.MAX_PENDING,
+            fsync if fsync != "" else FSYNC_CLOSE)
+
+    def open(self, key: str, path: str,
+             offset: T.Optional[int] = None,
+             digest: bool = False) -> IngestStream:
+        """
+        Open a stream write to path, the file is truncated if offset
+        is None otherwise bytes are write begin from offset and rest
+        of the file is kept. If digest is True bytes write via the
+        stream are hashed.
+        """
+        if key in self._streams:
+            raise INGEST_STREAM_EXISTS(key)
+
+        if offset is None:
+            fd = open(path, "wb")
+        else:
+            fd = os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o644),
+                           "r+b")
+            fd.seek(offset)
+
+        stream = IngestStream(self, key, path, fd, digest)
+        self._streams[key] = stream
+
+        return stream
+
+    def get(self, key: str) -> T.Optional[IngestStream]:
+        return self._streams.get(key, None)
+
+    def numOfStreams(self) -> int:
+        return len(self._streams)
+
+    def _remove(self, key: str) -> None:
+        if key in self._streams:
+            del self._streams[key]
@@ -27,7 +27,9 @@
 import json
 import asyncio
 import socket
+import struct
 import time
+import zlib
 
 import traceback
 from typing import Optional, Dict, \
@@ -78,6 +80,10 @@ def logRegisterLetterValidity(letter:  'Letter') -> bool:
 
 class Letter:
 
+    # Letters are created for every message and every chunk
+    # of a file, no __dict__ for them.
+    __slots__ = ('type_', 'header', 'content')
+
     # Format of NewTask letter
     # Type    :  'new'
     # header  :  '{"tid": "...", "parent": "...", "needPost": "true/false", "menu": "..."}'
@@ -185,10 +191,65 @@ class Letter:
 
     Notify = "Notify"
 
+    """
+    Format of FileDescLetter
+    Type    : "FD"
+    Header  : {"tid":..., "parent":..., "fileName":..., "menu":...}
+    Content : {"size":..., "offset":..., "sha256":...,
+               "begin":..., "end":..., "rangeSha256":...,
+               "encoding":...}
+
+    Describe a range [begin, end) of a file which is transfered
+    in raw bytes right after this letter on a DataLink. sha256
+    is hex digest of the whole file and rangeSha256 is hex
+    digest of the range. encoding is how bytes are encoded
+    while transfer.
+    """
+    FileDesc = "FD"
+
     BINARY_HEADER_LEN = 260
     BINARY_MIN_HEADER_LEN = 6
     LETTER_TYPE_LEN = 2
 
+    # Framing of a json letter in a stream
+    # FRAME_V1 : | Length (2Bytes) : : Int | Json |
+    # FRAME_V2 : | Mark (2Bytes) 00002 : : Int | Length (4Bytes) : : Int | Json |
+    #
+    # FRAME_V3 : | Mark (2Bytes) 00003 : : Int | Length (4Bytes) : : Int |
+    #            | TypeCode (1Byte) | FieldLen (2Bytes) | Field | ... |
+    #
+    # FRAME_V1 is unable to carry a letter longer than 65535 bytes.
+    # FRAME_V2 and FRAME_V3 are used only if both side of a link support
+    # it, this is negotiated via PropLetter while a link is created.
+    #
+    # FRAME_V3 encode fixed-shape letters (see compactLayouts) as a
+    # sequence of string fields, other letters are still send in
+    # FRAME_V2.
+    #
+    # FRAME_V4 is FRAME_V3 plus compressed frames:
+    # | Mark (2Bytes) 00004 : : Int | Length (4Bytes) : : Int | zlib(Json) |
+    # BinaryLetter with mark 00005 has the same header as mark 00001
+    # but it's content is compressed, Length is the compressed length.
+    #
+    # Letter is compressed only if it's longer than the threshold
+    # passed to toBytesWithLength() and become shorter after compress,
+    # the threshold is configured per link type (see compressThreshold).
+    FRAME_V1 = 1
+    FRAME_V2 = 2
+    FRAME_V3 = 3
+    FRAME_V4 = 4
+
+    WIDE_FRAME_MARK = 2
+    WIDE_FRAME_HEADER_LEN = 6
+    COMPACT_FRAME_MARK = 3
+    COMPRESSED_FRAME_MARK = 4
+    COMPRESSED_BINARY_MARK = 5
+
+    BINARY_MARKS = (1, COMPRESSED_BINARY_MARK)
+    WIDE_MARKS = (WIDE_FRAME_MARK, COMPACT_FRAME_MARK, COMPRESSED_FRAME_MARK)
+
+    COMPRESS_LEVEL = 6
+
     MAX_LEN = 512
 
     format = '{"type": "%s", "header": %s, "content": %s}'
@@ -231,10 +292,33 @@ class Letter:
         jsonStr = self.toString()
         return json.loads(jsonStr)
 
-    def toBytesWithLength(self) -> bytes:
+    def toBytesWithLength(self, frame: int = FRAME_V1,
+                          compress: int = 0) -> bytes:
+        if frame >= Letter.FRAME_V3:
+            compact = compactEncode(self)
+
+            # Big letter is compressed rather than compact.
+            if compact is not None and \
+                    (compress == 0 or len(compact) <= compress):
+                return Letter.COMPACT_FRAME_MARK.to_bytes(2, "big") + \
+                    len(compact).to_bytes(4, "big") + compact
+
+            # Letter is not fixed-shape.
+            frame = Letter.FRAME_V2
+
         str = self.toString()
         bStr = str.encode()
 
+        if compress > 0 and len(bStr) > compress:
+            zStr = zlib.compress(bStr, Letter.COMPRESS_LEVEL)
+            if len(zStr) < len(bStr):
+                return Letter.COMPRESSED_FRAME_MARK.to_bytes(2, "big") + \
+                    len(zStr).to_bytes(4, "big") + zStr
+
+        if frame == Letter.FRAME_V2:
+            return Letter.WIDE_FRAME_MARK.to_bytes(2, "big") + \
+                len(bStr).to_bytes(4, "big") + bStr
+
         return len(bStr).to_bytes(2, "big") + bStr
 
     @staticmethod
@@ -280,39 +364,91 @@ class Letter:
         if len(s) < 2:
             return 2 - len(s)
         else:
-            if int.from_bytes(s[:2], "big") == 1:
+            mark = int.from_bytes(s[:2], "big")
+
+            if mark in Letter.BINARY_MARKS:
                 if len(s) < Letter.BINARY_HEADER_LEN:
                     return Letter.BINARY_HEADER_LEN - len(s)
 
                 length = int.from_bytes(s[2:6], "big")
                 return length - (len(s) - Letter.BINARY_HEADER_LEN)
+            elif mark in Letter.WIDE_MARKS:
+                if len(s) < Letter.WIDE_FRAME_HEADER_LEN:
+                    return Letter.WIDE_FRAME_HEADER_LEN - len(s)
+
+                length = int.from_bytes(s[2:6], "big")
+                return length - (len(s) - Letter.WIDE_FRAME_HEADER_LEN)
             else:
                 length = int.from_bytes(s[:2], "big")
                 return length - (len(s) - 2)
 
+    @staticmethod
+    def frameHeaderLen(s: bytes) -> int:
+        """
+        Length of the frame header of a letter.
+        """
+        mark = int.from_bytes(s[:2], "big")
+
+        if mark in Letter.BINARY_MARKS:
+            return Letter.BINARY_HEADER_LEN
+        elif mark in Letter.WIDE_MARKS:
+            return Letter.WIDE_FRAME_HEADER_LEN
+        else:
+            return 2
+
     @staticmethod
     def parse(s: bytes) -> Optional['Letter']:
         # To check that is BinaryFile type or another
-        if int.from_bytes(s[: 2], "big") == 1:
+        mark = int.from_bytes(s[: 2], "big")
+
+        if mark in Letter.BINARY_MARKS:
             return BinaryLetter.parse(s)
+        elif mark == Letter.COMPACT_FRAME_MARK:
+            return compactDecode(s[Letter.WIDE_FRAME_HEADER_LEN:])
+        elif mark == Letter.COMPRESSED_FRAME_MARK:
+            return Letter._parseCompressed(s[Letter.WIDE_FRAME_HEADER_LEN:])
         else:
             return Letter._parse(s)
 
     @staticmethod
-    def _parse(s: bytes) -> Optional['Letter']:
+    def parseFrame(head: bytes, payload: bytes) -> Optional['Letter']:
+        """
+        Parse a letter which frame header and payload are
+        received separately, payload is used without copy.
+        """
+        mark = int.from_bytes(head[:2], "big")
+
+        if mark in Letter.BINARY_MARKS:
+            return BinaryLetter.fromFrame(head, payload)
+        elif mark == Letter.COMPACT_FRAME_MARK:
+            return compactDecode(payload)
+        elif mark == Letter.COMPRESSED_FRAME_MARK:
+            return Letter._parseCompressed(payload)
+        else:
+            return Letter._parsePayload(payload)
+
+    @staticmethod
+    def _parseCompressed(payload: bytes) -> Optional['Letter']:
         try:
-            letter = s[2:].decode()
-        except Exception:
-            traceback.print_exc()
-            raise Exception
+            return Letter._parsePayload(zlib.decompress(payload))
+        except zlib.error:
+            return None
+
+    @staticmethod
+    def _parse(s: bytes) -> Optional['Letter']:
+        return Letter._parsePayload(s[Letter.frameHeaderLen(s):])
 
+    @staticmethod
+    def _parsePayload(payload: bytes) -> Optional['Letter']:
+        # Json is parsed only once, typed letter is build
+        # from the parsed dictionary directly.
         try:
-            dict_ = json.loads(letter)
-            type_ = dict_['type']
+            dict_ = json.loads(payload)
+            fromParts = jsonDecodeMethods[dict_['type']]
         except Exception:
             return None
 
-        return parseMethods[type_].parse(s)
+        return fromParts(dict_['header'], dict_['content'])
 
     def validity(self) -> bool:
         type = self.typeOfLetter()
@@ -330,7 +466,7 @@ class Letter:
 
 
 def bytesDivide(s: bytes) -> Tuple:
-    letter = s[2: ].decode()
+    letter = s[Letter.frameHeaderLen(s):].decode()
     dict_ = json.loads(letter)
 
     type_ = dict_['type']
@@ -342,6 +478,8 @@ def bytesDivide(s: bytes) -> Tuple:
 
 class NewLetter(Letter):
 
+    __slots__ = ()
+
     def __init__(self, tid: str, sn: str,
                  vsn: str, datetime: str,
                  extra: Dict,
@@ -362,6 +500,10 @@ class NewLetter(Letter):
         if type_ != Letter.NewTask:
             return None
 
+        return NewLetter.fromParts(header, content)
+
+    @staticmethod
+    def fromParts(header: Dict, content: Dict) -> 'NewLetter':
         return NewLetter(
             tid=header['tid'],
             sn=content['sn'],
@@ -398,6 +540,8 @@ class NewLetter(Letter):
 
 class CancelLetter(Letter):
 
+    __slots__ = ()
+
     TYPE_SINGLE = "Single"
     TYPE_POST = "Post"
 
@@ -412,6 +556,10 @@ class CancelLetter(Letter):
         if type_ != Letter.TaskCancel:
             return None
 
+        return CancelLetter.fromParts(header, content)
+
+    @staticmethod
+    def fromParts(header: Dict, content: Dict) -> 'CancelLetter':
         return CancelLetter(header['taskId'], header['type'])
 
     def getIdent(self) -> str:
@@ -430,6 +578,8 @@ CmdSubType = int
 
 class CommandLetter(Letter):
 
+    __slots__ = ()
+
     def __init__(self, type:  str, content:  Dict[str, str], target:  str = "",
                  extra: str = "") -> None:
         Letter.__init__(self, Letter.Command,
@@ -443,6 +593,10 @@ class CommandLetter(Letter):
         if type_ != Letter.Command:
             return None
 
+        return CommandLetter.fromParts(header, content)
+
+    @staticmethod
+    def fromParts(header: Dict, content: Dict) -> 'CommandLetter':
         return CommandLetter(header['type'], content, header['target'],
                              header['extra'])
 
@@ -461,6 +615,8 @@ class CommandLetter(Letter):
 
 class CmdResponseLetter(Letter):
 
+    __slots__ = ()
+
     STATE_SUCCESS = "s"
     STATE_FAILED = "f"
 
@@ -479,6 +635,10 @@ class CmdResponseLetter(Letter):
         if type_ != Letter.CmdResponse:
             return None
 
+        return CmdResponseLetter.fromParts(header, content)
+
+    @staticmethod
+    def fromParts(header: Dict, content: Dict) -> 'CmdResponseLetter':
         return CmdResponseLetter(header['ident'], header['type'], header['state'],
                                  content['extra'],
                                  target=header['target'],
@@ -508,6 +668,8 @@ class CmdResponseLetter(Letter):
 
 class PostTaskLetter(Letter):
 
+    __slots__ = ()
+
     def __init__(self, ident: str, ver: str,
                  cmds: List[str], output: str,
                  frags: List) -> None:
@@ -523,6 +685,10 @@ class PostTaskLetter(Letter):
         if type_ != Letter.Post:
             return None
 
+        return PostTaskLetter.fromParts(header, content)
+
+    @staticmethod
+    def fromParts(header: Dict, content: Dict) -> 'PostTaskLetter':
         return PostTaskLetter(header['ident'], header['version'],
                               content['cmds'], header['output'],
                               frags=content['Fragments'])
@@ -553,6 +719,8 @@ class PostTaskLetter(Letter):
 
 class ResponseLetter(Letter):
 
+    __slots__ = ()
+
     def __init__(self, ident:  str, tid:  str, state:  str,
                  parent: str = "") -> None:
         Letter.__init__(
@@ -569,6 +737,10 @@ class ResponseLetter(Letter):
         if type_ != Letter.Response:
             return None
 
+        return ResponseLetter.fromParts(header, content)
+
+    @staticmethod
+    def fromParts(header: Dict, content: Dict) -> 'ResponseLetter':
         return ResponseLetter(
             ident=header['ident'],
             tid=header['tid'],
@@ -594,6 +766,8 @@ class ResponseLetter(Letter):
 
 class NotifyLetter(Letter):
 
+    __slots__ = ()
+
     def __init__(self, ident: str, type: str, content: Dict) -> None:
         Letter.__init__(self, Letter.Notify,
                         {"ident": ident, "type": type}, content)
@@ -614,17 +788,25 @@ class NotifyLetter(Letter):
         if type_ != Letter.Notify:
             return None
 
+        return NotifyLetter.fromParts(header, content)
+
+    @staticmethod
+    def fromParts(header: Dict, content: Dict) -> 'NotifyLetter':
         return NotifyLetter(header['ident'], header['type'], content)
 
 
 class PropLetter(Letter):
 
-    def __init__(self, ident: str, max: str, proc: str, role: str) -> None:
+    __slots__ = ()
+
+    def __init__(self, ident: str, max: str, proc: str, role: str,
+                 frame: int = Letter.FRAME_V1) -> None:
         Letter.__init__(
             self,
             Letter.PropertyNotify,
             {"ident":  ident},
-            {"MAX":  max, "PROC":  proc, "role": role}
+            {"MAX":  max, "PROC":  proc, "role": role,
+             "frame": str(frame)}
         )
 
     @staticmethod
@@ -634,11 +816,17 @@ class PropLetter(Letter):
         if type_ != Letter.PropertyNotify:
             return None
 
+        return PropLetter.fromParts(header, content)
+
+    @staticmethod
+    def fromParts(header: Dict, content: Dict) -> 'PropLetter':
         return PropLetter(
             ident=header['ident'],
             max=content['MAX'],
             proc=content['PROC'],
-            role=content['role']
+            role=content['role'],
+            # PropLetter from old workers carry no frame field.
+            frame=int(content.get('frame', Letter.FRAME_V1))
         )
 
     def getIdent(self) -> str:
@@ -653,9 +841,25 @@ class PropLetter(Letter):
     def getRole(self) -> int:
         return self.getContent('role')
 
+    def getFrame(self) -> int:
+        """
+        Highest framing version supported by the sender.
+        """
+        frame = self.getContent('frame')
+        if frame == "":
+            return Letter.FRAME_V1
+        return int(frame)
+
 
 class BinaryLetter(Letter):
 
+    # Header of a received letter is kept in raw bytes
+    # and decoded while it's accessed.
+    __slots__ = ('_head', '_header')
+
+    _head: Optional[Union[bytes, memoryview]]
+    _header: Optional[Dict[str, str]]
+
     TYPE_DATA = 1
     TYPE_BROKEN = 2
 
@@ -666,6 +870,12 @@ class BinaryLetter(Letter):
     PARENT_FIELD_LEN = 64
     MENU_FIELD_LEN = 30
 
+    # | Type | Length | FileName | TaskId | Parent | Menu |
+    # String fields are padded with spaces at left.
+    HEADER = struct.Struct("!HI%ds%ds%ds%ds" % (
+        FILE_NAME_FIELD_LEN, TASK_ID_FIELD_LEN,
+        PARENT_FIELD_LEN, MENU_FIELD_LEN))
+
     class FIELD_LENGTH_EXCEPTION(Exception):
         pass
 
@@ -690,6 +900,8 @@ class BinaryLetter(Letter):
             menu
         )
 
+        self._head = None
+
         Letter.__init__(
             self,
             Letter.BinaryFile,
@@ -698,6 +910,29 @@ class BinaryLetter(Letter):
             {"bytes":  bStr}
         )
 
+    @property
+    def header(self) -> Dict[str, str]:
+        if self._header is None:
+            self._header = self._decodeHead()
+        return self._header
+
+    @header.setter
+    def header(self, header: Dict[str, str]) -> None:
+        self._header = header
+
+    def _decodeHead(self) -> Dict[str, str]:
+        assert(self._head is not None)
+
+        _, _, fileName, tid, parent, menu = \
+            BinaryLetter.HEADER.unpack_from(self._head)
+
+        return {
+            "tid": tid.replace(b" ", b"").decode(),
+            "fileName": fileName.replace(b" ", b"").decode(),
+            "parent": parent.replace(b" ", b"").decode(),
+            "menu": menu.replace(b" ", b"").decode()
+        }
+
     @staticmethod
     def field_length_check(l, field):
         if len(field) > l:
@@ -705,24 +940,40 @@ class BinaryLetter(Letter):
 
     @staticmethod
     def parse(s:  bytes) -> Optional['BinaryLetter']:
-        fileName = s[6:38].decode().replace(" ", "")
-        tid = s[38:166].decode().replace(" ", "")
-        parent = s[166:230].decode().replace(" ", "")
-        menu = s[230:260].decode().replace(" ", "")
-        content = s[260:]
+        # Header and content refer to the received bytes via
+        # memoryview so a chunk is not copied.
+        frame = memoryview(s)
+        return BinaryLetter.fromFrame(
+            frame[:Letter.BINARY_HEADER_LEN],
+            frame[Letter.BINARY_HEADER_LEN:])
 
-        return BinaryLetter(tid, content, menu, fileName, parent = parent)
-
-    def toBytesWithLength(self) -> bytes:
-
-        bStr = self.binaryPack()
+    @staticmethod
+    def fromFrame(head: Union[bytes, memoryview],
+                  content: Union[bytes, memoryview]) -> 'BinaryLetter':
+        if int.from_bytes(head[:2], "big") == Letter.COMPRESSED_BINARY_MARK:
+            content = zlib.decompress(content)
+
+        # Fields of header is not decoded until accessed.
+        letter = BinaryLetter.__new__(BinaryLetter)
+        letter.type_ = Letter.BinaryFile
+        letter.content = {"bytes": content}
+        letter._head = head
+        letter._header = None
+
+        return letter
+
+    def toBytesWithLength(self, frame: int = Letter.FRAME_V1,
+                          compress: int = 0) -> bytes:
+        # BinaryLetter has it's own 4 bytes length field
+        # so frame is not matter.
+        bStr = self.binaryPack(compress)
 
         if bStr is None:
             return b''
 
         return bStr
 
-    def binaryPack(self) -> Optional[bytes]:
+    def binaryPack(self, compress: int = 0) -> Optional[bytes]:
 
         tid = self.getHeader('tid')
         fileName = self.getHeader('fileName')
@@ -733,35 +984,23 @@ class BinaryLetter(Letter):
         if type(content) is str:
             return None
 
-        def extend_bytes(n: int, bs: bytes):
-            return b' ' * n + bs
-
-        type_field = (1).to_bytes(BinaryLetter.TYPE_FIELD_LEN, "big")
-        len_field = len(content).to_bytes(BinaryLetter.LENGTH_FIELD_LEN, "big")
-
-        tid_field = extend_bytes(
-            BinaryLetter.TASK_ID_FIELD_LEN - len(tid),
-            tid.encode())
-
-        parent_field = extend_bytes(
-            BinaryLetter.PARENT_FIELD_LEN -
-            len(parent), parent.encode())
-
-        name_field = extend_bytes(
-            BinaryLetter.FILE_NAME_FIELD_LEN -
-            len(fileName), fileName.encode())
-
-        menu_field = extend_bytes(
-            BinaryLetter.MENU_FIELD_LEN - len(menu),
-            menu.encode())
+        mark = 1
+        if compress > 0 and len(content) > compress:
+            zContent = zlib.compress(content, Letter.COMPRESS_LEVEL)
+            if len(zContent) < len(content):
+                mark, content = Letter.COMPRESSED_BINARY_MARK, zContent
 
         # Safe here content must not str and must a bytes
         # | Type (2Bytes) 00001 :: Int | Length (4Bytes) :: Int
-        # | Ext (32 Bytes) | TaskId (64Bytes) :: String
+        # | Ext (32 Bytes) | TaskId (128Bytes) :: String
         # | Parent(64 Bytes) :: String | Menu (30 Bytes) :: String
         # | Content :: Bytes |
-        packet = type_field + len_field + name_field + tid_field + \
-            parent_field + menu_field + content
+        packet = BinaryLetter.HEADER.pack(
+            mark, len(content),
+            fileName.encode().rjust(BinaryLetter.FILE_NAME_FIELD_LEN),
+            tid.encode().rjust(BinaryLetter.TASK_ID_FIELD_LEN),
+            parent.encode().rjust(BinaryLetter.PARENT_FIELD_LEN),
+            menu.encode().rjust(BinaryLetter.MENU_FIELD_LEN)) + content
 
         return packet
 
@@ -786,6 +1025,8 @@ class BinaryLetter(Letter):
 
 class LogLetter(Letter):
 
+    __slots__ = ()
+
     def __init__(self, ident:  str, logId:  str, logMsg:  str) -> None:
         Letter.__init__(
             self,
@@ -801,6 +1042,10 @@ class LogLetter(Letter):
         if type_ != Letter.Log:
             return None
 
+        return LogLetter.fromParts(header, content)
+
+    @staticmethod
+    def fromParts(header: Dict, content: Dict) -> 'LogLetter':
         return LogLetter(
             ident=header['ident'],
             logId=header['logId'],
@@ -819,6 +1064,8 @@ class LogLetter(Letter):
 
 class LogRegLetter(Letter):
 
+    __slots__ = ()
+
     def __init__(self, ident:  str, logId:  str) -> None:
         Letter.__init__(
             self,
@@ -834,6 +1081,10 @@ class LogRegLetter(Letter):
         if type_ != Letter.LogRegister:
             return None
 
+        return LogRegLetter.fromParts(header, content)
+
+    @staticmethod
+    def fromParts(header: Dict, content: Dict) -> 'LogRegLetter':
         return LogRegLetter(
             ident=header['ident'],
             logId=header['logId']
@@ -852,6 +1103,8 @@ class ReqLetter(Letter):
     request something.
     """
 
+    __slots__ = ()
+
     def __init__(self, ident: str, type: str, reqMsg: str) -> None:
         Letter.__init__(self, Letter.Req,
                         {"ident": ident, "type": type},
@@ -879,6 +1132,10 @@ class ReqLetter(Letter):
         if type_ != Letter.Req:
             return None
 
+        return ReqLetter.fromParts(header, content)
+
+    @staticmethod
+    def fromParts(header: Dict, content: Dict) -> 'ReqLetter':
         return ReqLetter(header['ident'], header['type'], content['reqMsg'])
 
 
@@ -888,6 +1145,8 @@ class HeartbeatLetter(Letter):
     between master and worker.
     """
 
+    __slots__ = ()
+
     def __init__(self, ident: str, seq: int) -> None:
         Letter.__init__(self, Letter.Heartbeat,
                         {"ident": ident, "seq": str(seq)}, {})
@@ -911,6 +1170,10 @@ class HeartbeatLetter(Letter):
         if type_ != Letter.Heartbeat:
             return None
 
+        return HeartbeatLetter.fromParts(header, content)
+
+    @staticmethod
+    def fromParts(header: Dict, content: Dict) -> 'HeartbeatLetter':
         return HeartbeatLetter(header['ident'], header['seq'])
 
 
@@ -919,6 +1182,8 @@ class TaskLogLetter(Letter):
     Contain message of output of running task.
     """
 
+    __slots__ = ()
+
     def __init__(self, tid: str, message: str) -> None:
         Letter.__init__(self, Letter.TaskLog,
                         {"ident": tid},
@@ -937,9 +1202,113 @@ class TaskLogLetter(Letter):
         if type_ != Letter.TaskLog:
             return None
 
+        return TaskLogLetter.fromParts(header, content)
+
+    @staticmethod
+    def fromParts(header: Dict, content: Dict) -> 'TaskLogLetter':
         return TaskLogLetter(header['ident'], content['message'])
 
 
+class FileDescLetter(Letter):
+    """
+    Send before a file which is transfered in raw bytes, opposite
+    reply with a FileDescLetter to accept the file then size - offset
+    bytes of the range [begin, end) of the file are transfered
+    begin from offset. offset of the reply is where opposite
+    want the transfer begin, bytes before it are already held.
+
+    After all bytes are received opposite reply again with the
+    digest it computed, range is transfered only if it's equal to
+    rangeSha256 of the FileDescLetter.
+
+    A file is transfered in several ranges concurrently, by default
+    a FileDescLetter describe a range that is the whole file.
+
+    encoding of the reply is the encoding the range transfered in,
+    it's the requested encoding or "" if opposite not support it.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, tid: str, parent: str, fileName: str,
+                 size: int, menu: str = "", offset: int = 0,
+                 sha256: str = "", begin: int = 0, end: int = -1,
+                 rangeSha256: str = "", encoding: str = "") -> None:
+
+        if end < 0:
+            end = size
+        if rangeSha256 == "" and begin == 0 and end == size:
+            rangeSha256 = sha256
+
+        Letter.__init__(self, Letter.FileDesc,
+                        {"tid": tid, "parent": parent,
+                         "fileName": fileName, "menu": menu},
+                        {"size": str(size), "offset": str(offset),
+                         "sha256": sha256, "begin": str(begin),
+                         "end": str(end), "rangeSha256": rangeSha256,
+                         "encoding": encoding})
+
+    def getTid(self) -> str:
+        return self.getHeader('tid')
+
+    def getParent(self) -> str:
+        return self.getHeader('parent')
+
+    def getFileName(self) -> str:
+        return self.getHeader('fileName')
+
+    def getMenu(self) -> str:
+        return self.getHeader('menu')
+
+    def getSize(self) -> int:
+        return int(self.getContent('size'))
+
+    def getOffset(self) -> int:
+        return int(self.getContent('offset'))
+
+    def setOffset(self, offset: int) -> None:
+        self.setContent('offset', str(offset))
+
+    def getSha256(self) -> str:
+        return self.getContent('sha256')
+
+    def setSha256(self, digest: str) -> None:
+        self.setContent('sha256', digest)
+
+    def getBegin(self) -> int:
+        return int(self.getContent('begin'))
+
+    def getEnd(self) -> int:
+        return int(self.getContent('end'))
+
+    def getRangeSha256(self) -> str:
+        return self.getContent('rangeSha256')
+
+    def getEncoding(self) -> str:
+        return self.getContent('encoding')
+
+    def setEncoding(self, encoding: str) -> None:
+        self.setContent('encoding', encoding)
+
+    @staticmethod
+    def parse(s: bytes) -> Optional['FileDescLetter']:
+        (type_, header, content) = bytesDivide(s)
+
+        if type_ != Letter.FileDesc:
+            return None
+
+        return FileDescLetter.fromParts(header, content)
+
+    @staticmethod
+    def fromParts(header: Dict, content: Dict) -> 'FileDescLetter':
+        return FileDescLetter(header['tid'], header['parent'],
+                              header['fileName'], int(content['size']),
+                              header['menu'], int(content['offset']),
+                              content['sha256'], int(content['begin']),
+                              int(content['end']), content['rangeSha256'],
+                              content['encoding'])
+
+
 validityMethods = {
     Letter.NewTask:         newTaskLetterValidity,
     Letter.Response:        responseLetterValidity,
@@ -956,6 +1325,7 @@ validityMethods = {
     Letter.Heartbeat:       lambda letter: True,
     Letter.Notify:          lambda letter: True,
     Letter.TaskLog:         lambda letter: True,
+    Letter.FileDesc:        lambda letter: True,
 }  # type:   Dict[str, Callable]
 
 parseMethods = {
@@ -972,33 +1342,156 @@ parseMethods = {
     Letter.Req:              ReqLetter,
     Letter.Heartbeat:        HeartbeatLetter,
     Letter.Notify:           NotifyLetter,
-    Letter.TaskLog:          TaskLogLetter
+    Letter.TaskLog:          TaskLogLetter,
+    Letter.FileDesc:         FileDescLetter
 }  # type: Any
 
+# Letters transfer in json format are build directly
+# from header and content of the parsed json.
+jsonDecodeMethods = {
+    type_: letterClass.fromParts
+    for type_, letterClass in parseMethods.items()
+    if type_ != Letter.BinaryFile
+}  # type: Dict[str, Callable[[Dict, Dict], Letter]]
+
+
+# Layout of letters that able to be encoded in FRAME_V3,
+# type : (TypeCode, header fields, content fields)
+#
+# TypeCode is part of the protocol, never reuse a code.
+compactLayouts = {
+    Letter.Response:        (1, ("ident", "tid", "parent"), ("state",)),
+    Letter.PropertyNotify:  (2, ("ident",), ("MAX", "PROC", "role", "frame")),
+    Letter.Log:             (3, ("ident", "logId"), ("logMsg",)),
+    Letter.LogRegister:     (4, ("ident", "logId"), ()),
+    Letter.TaskCancel:      (5, ("taskId", "type"), ()),
+    Letter.Req:             (6, ("ident", "type"), ("reqMsg",)),
+    Letter.Heartbeat:       (7, ("ident", "seq"), ()),
+    Letter.TaskLog:         (8, ("ident",), ("message",)),
+    Letter.FileDesc:        (9, ("tid", "parent", "fileName", "menu"),
+                             ("size", "offset", "sha256", "begin", "end",
+                              "rangeSha256", "encoding")),
+}  # type: Dict[str, Tuple[int, Tuple[str, ...], Tuple[str, ...]]]
+
+compactTypes = {
+    code: (type_, hFields, cFields)
+    for type_, (code, hFields, cFields) in compactLayouts.items()
+}  # type: Dict[int, Tuple[str, Tuple[str, ...], Tuple[str, ...]]]
+
+COMPACT_FIELD_LEN = struct.Struct("!H")
+
+
+def compactEncode(letter: Letter) -> Optional[bytes]:
+    """
+    Encode a letter into payload of FRAME_V3, None is returned
+    if the letter is not fixed-shape.
+    """
+    try:
+        code, hFields, cFields = compactLayouts[letter.type_]
+        header, content = letter.header, letter.content
+
+        if len(header) != len(hFields) or len(content) != len(cFields):
+            return None
+
+        values = [header[k] for k in hFields] + [content[k] for k in cFields]
+        fields = [bytes((code,))]
+
+        for v in values:
+            b = v.encode()
+            fields.append(COMPACT_FIELD_LEN.pack(len(b)))
+            fields.append(b)
+    except (KeyError, AttributeError, struct.error):
+        # Unknown type, missing field, field that is
+        # not a str or a field that too long.
+        return None
+
+    return b"".join(fields)
+
+
+def compactDecode(payload: bytes) -> Optional[Letter]:
+    """
+    Build a letter from payload of FRAME_V3.
+    """
+    try:
+        type_, hFields, cFields = compactTypes[payload[0]]
+
+        values = []
+        pos = 1
+        for i in range(len(hFields) + len(cFields)):
+            length, = COMPACT_FIELD_LEN.unpack_from(payload, pos)
+            pos += 2
+            values.append(str(payload[pos:pos+length], "utf-8"))
+            pos += length
+    except (KeyError, IndexError, struct.error, UnicodeDecodeError):
+        return None
+
+    if pos != len(payload):
+        return None
+
+    nh = len(hFields)
+    header = dict(zip(hFields, values[:nh]))
+    content = dict(zip(cFields, values[nh:]))
+
+    return jsonDecodeMethods[type_](header, content)
+
 
 # Function to receive a letter from a socket
+#
+# Header of a frame is read first then the payload is read
+# in one readexactly() and handed to the letter without copy.
 async def receving(reader: asyncio.StreamReader,
                    timeout=None) -> Optional[Letter]:
-    content, remain = b'', 2
+    try:
+        head = await asyncio.wait_for(
+            reader.readexactly(2), timeout=timeout)
+    except asyncio.IncompleteReadError:
+        raise ConnectionError
 
-    while remain > 0:
-        chunk = await asyncio.wait_for(
-            reader.read(remain), timeout=timeout
-        )
+    try:
+        # Rest of header of BinaryLetter and wide frame.
+        remain = Letter.frameHeaderLen(head) - 2
+        if remain > 0:
+            head += await asyncio.wait_for(
+                reader.readexactly(remain), timeout=timeout)
+
+        remain = Letter.letterBytesRemain(head)
+        payload = b''
+        if remain > 0:
+            payload = await asyncio.wait_for(
+                reader.readexactly(remain), timeout=timeout)
+
+    except (asyncio.IncompleteReadError, asyncio.exceptions.TimeoutError):
+        # Part of a frame is consumed, the stream
+        # is unable to be used any more.
+        raise ConnectionError
 
-        if chunk == b'':
-            raise ConnectionError
+    return Letter.parseFrame(head, payload)
 
-        content += chunk
-        remain = Letter.letterBytesRemain(content)
 
-    return Letter.parse(content)
+def negotiateFrame(frame: int) -> int:
+    """
+    Choose a framing version both side of a link support.
+    """
+    return min(frame, Letter.FRAME_V4)
+
+
+def compressThreshold(config: Any) -> int:
+    """
+    Threshold of compression from a config value, a letter
+    longer than it is compressed. 0 means no compression.
+    """
+    try:
+        return max(int(config), 0)
+    except (TypeError, ValueError):
+        return 0
 
 
 async def sending(writer: asyncio.StreamWriter,
                   letter: Letter,
-                  lock: asyncio.Lock = None) -> None:
-    writer.write(letter.toBytesWithLength())
+                  lock: asyncio.Lock = None,
+                  frame: int = Letter.FRAME_V1,
+                  compress: int = 0) -> None:
+    writer.write(letter.toBytesWithLength(frame, compress))
 
     if writer.is_closing():
         raise ConnectionError
@@ -1012,36 +1505,43 @@ async def sending(writer: asyncio.StreamWriter,
     else:
         await writer.drain()
 
-# Function to receive a letter from a socket
-def receving_sock(sock: socket.socket) -> Optional[Letter]:
-    content = b''
-    remain = 2
+def _recv_exactly(sock: socket.socket, n: int) -> bytearray:
+    """
+    Receive n bytes into a preallocated buffer.
+    """
+    buffer = bytearray(n)
+    view = memoryview(buffer)
+    received = 0
 
-    # Get first 2 bytes to know is a BinaryFile letter or
-    # another letter
-    while remain > 0:
-        chunk = sock.recv(remain)
-        if chunk == b'':
+    while received < n:
+        nbytes = sock.recv_into(view[received:], n - received)
+        if nbytes == 0:
             raise Exception
-        remain -= len(chunk)
-        content += chunk
+        received += nbytes
 
-    remain = Letter.letterBytesRemain(content)
+    return buffer
 
-    while remain > 0:
-        chunk = sock.recv(remain)
-        if chunk == b'':
-            raise Exception
 
-        content += chunk
+# Function to receive a letter from a socket
+def receving_sock(sock: socket.socket) -> Optional[Letter]:
+    # Get first 2 bytes to know is a BinaryFile letter or
+    # another letter
+    head = _recv_exactly(sock, 2)
+
+    remain = Letter.frameHeaderLen(head) - 2
+    if remain > 0:
+        head += _recv_exactly(sock, remain)
 
-        remain = Letter.letterBytesRemain(content)
+    remain = Letter.letterBytesRemain(head)
+    payload = _recv_exactly(sock, remain) if remain > 0 else bytearray()
 
-    return Letter.parse(content)
+    return Letter.parseFrame(head, payload)
 
 
-def sending_sock(sock: socket.socket, l: Letter) -> None:
-    jBytes = l.toBytesWithLength()
+def sending_sock(sock: socket.socket, l: Letter,
+                 frame: int = Letter.FRAME_V1,
+                 compress: int = 0) -> None:
+    jBytes = l.toBytesWithLength(frame, compress)
     totalSent = 0
     length = len(jBytes)
 
@@ -1165,3 +1665,237 @@ class LetterTestCases(unittest.TestCase):
         self.assertIsNotNone(heartbeatLetter_parsed)
         self.assertEqual("HB", heartbeatLetter_parsed.getIdent())
         self.assertEqual(1, heartbeatLetter_parsed.getSeq())
+
+    def test_NewLetter_WideFrame(self) -> None:
+        # Setup
+        cmds = ["echo " + str(i) + " > file" + str(i) for i in range(10000)]
+        newLetter = NewLetter("newLetter", "sn_1", "vsn_1", datetime="",
+                              extra={"cmds": cmds})
+        bStr = newLetter.toBytesWithLength(Letter.FRAME_V2)
+        self.assertTrue(len(bStr) > 65535)
+
+        # Exercise
+        self.assertEqual(len(bStr), Letter.letterBytesRemain(bStr[:6]) + 6)
+        self.assertEqual(0, Letter.letterBytesRemain(bStr))
+        newLetter = cast(NewLetter, Letter.parse(bStr))
+
+        # Verify
+        self.assertIsNotNone(newLetter)
+        self.assertEqual("sn_1", newLetter.getSN())
+        self.assertEqual(cmds, newLetter.getExtra()['cmds'])
+
+    def test_Letter_ParseAllTypes(self) -> None:
+        # Setup
+        letters = [
+            CancelLetter("tid", CancelLetter.TYPE_SINGLE),
+            PostTaskLetter("ident", "ver", ["cmd"], "out", ["F1"]),
+            NotifyLetter("ident", "WSC", {"state": "0"}),
+            PropLetter("ident", "1", "0", "NORMAL"),
+            LogLetter("ident", "logId", "msg"),
+            LogRegLetter("ident", "logId"),
+            ReqLetter("ident", "type", "msg"),
+            TaskLogLetter("tid", "message")
+        ]  # type: List[Letter]
+
+        for letter in letters:
+            # Exercise
+            parsed = Letter.parse(letter.toBytesWithLength())
+
+            # Verify
+            self.assertTrue(isinstance(parsed, type(letter)))
+            self.assertEqual(letter.toString(), cast(Letter, parsed).toString())
+
+    def test_Letter_CompactFrame(self) -> None:
+        # Setup
+        letters = [
+            ResponseLetter("ident", "tid", Letter.RESPONSE_STATE_FINISHED),
+            PropLetter("ident", "1", "0", "NORMAL", frame=Letter.FRAME_V3),
+            LogLetter("ident", "logId", "\u6d88\u606f"),
+            LogRegLetter("ident", "logId"),
+            CancelLetter("tid", CancelLetter.TYPE_SINGLE),
+            ReqLetter("ident", "type", "msg"),
+            HeartbeatLetter("ident", 1),
+            TaskLogLetter("tid", "message")
+        ]  # type: List[Letter]
+
+        for letter in letters:
+            # Exercise
+            bStr = letter.toBytesWithLength(Letter.FRAME_V3)
+            parsed = Letter.parse(bStr)
+
+            # Verify
+            self.assertEqual(Letter.COMPACT_FRAME_MARK,
+                             int.from_bytes(bStr[:2], "big"))
+            self.assertTrue(len(bStr) < len(letter.toBytesWithLength()))
+            self.assertEqual(0, Letter.letterBytesRemain(bStr))
+            self.assertTrue(isinstance(parsed, type(letter)))
+            self.assertEqual(letter.toString(), cast(Letter, parsed).toString())
+
+    def test_Letter_CompactFrameFallback(self) -> None:
+        # Setup
+        letters = [
+            NotifyLetter("ident", "WSC", {"state": "0"}),
+            CommandLetter("cancel", {}, target="tid"),
+            ResponseLetter("ident", "tid", 2)  # type: ignore
+        ]  # type: List[Letter]
+
+        for letter in letters:
+            # Exercise
+            bStr = letter.toBytesWithLength(Letter.FRAME_V3)
+
+            # Verify
+            self.assertEqual(Letter.WIDE_FRAME_MARK,
+                             int.from_bytes(bStr[:2], "big"))
+            parsed = Letter.parse(bStr)
+            self.assertEqual(letter.toString(), cast(Letter, parsed).toString())
+
+    def test_Letter_CompactFrameTruncated(self) -> None:
+        # Setup
+        bStr = HeartbeatLetter("ident", 1).toBytesWithLength(Letter.FRAME_V3)
+
+        # Exercise and Verify
+        self.assertIsNone(compactDecode(bStr[6:-1]))
+        self.assertIsNone(compactDecode(b"\xff"))
+
+    def test_Letter_CompressedFrame(self) -> None:
+        # Setup
+        message = "make[1]: Entering directory '/build'\n" * 100
+        letter = TaskLogLetter("tid", message)
+
+        # Exercise
+        bStr = letter.toBytesWithLength(compress=1024)
+        parsed = cast(TaskLogLetter, Letter.parse(bStr))
+        parsedFrame = cast(TaskLogLetter, Letter.parseFrame(
+            bStr[:6], bStr[6:]))
+
+        # Verify
+        self.assertEqual(Letter.COMPRESSED_FRAME_MARK,
+                         int.from_bytes(bStr[:2], "big"))
+        self.assertTrue(len(bStr) < len(letter.toBytesWithLength()))
+        self.assertEqual(0, Letter.letterBytesRemain(bStr))
+        self.assertEqual(message, parsed.getMessage())
+        self.assertEqual(message, parsedFrame.getMessage())
+
+        # Letter below threshold is not compressed.
+        bStr = TaskLogLetter("tid", "short").toBytesWithLength(compress=1024)
+        self.assertEqual(len(bStr) - 2, int.from_bytes(bStr[:2], "big"))
+
+    def test_BinaryLetter_LazyHeader(self) -> None:
+        # Setup
+        bStr = BinaryLetter("tid", b"content", menu="menu",
+                            fileName="file", parent="ver") \
+            .toBytesWithLength()
+
+        # Exercise
+        letter = cast(BinaryLetter, Letter.parse(bStr))
+
+        # Verify
+        self.assertIsNone(letter._header)
+        self.assertFalse(hasattr(letter, "__dict__"))
+        self.assertEqual(b"content", bytes(letter.getContent("bytes")))
+
+        self.assertEqual("tid", letter.getTid())
+        self.assertEqual("file", letter.getFileName())
+        self.assertEqual("ver", letter.getParent())
+        self.assertEqual("menu", letter.getMenu())
+        self.assertEqual(bStr, letter.toBytesWithLength())
+
+    def test_BinaryLetter_Compressed(self) -> None:
+        # Setup
+        content = b"0123456789" * 1000
+        letter = BinaryLetter("tid", content, fileName="file")
+
+        # Exercise
+        bStr = letter.toBytesWithLength(compress=1024)
+        parsed = cast(BinaryLetter, Letter.parse(bStr))
+
+        # Verify
+        self.assertEqual(Letter.COMPRESSED_BINARY_MARK,
+                         int.from_bytes(bStr[:2], "big"))
+        self.assertTrue(len(bStr) < len(content))
+        self.assertEqual(0, Letter.letterBytesRemain(bStr))
+        self.assertEqual(content, bytes(parsed.getContent("bytes")))
+        self.assertEqual("file", parsed.getFileName())
+
+    def test_Letter_ParseUnknownType(self) -> None:
+        # Setup
+        letter = Letter("unknown", {}, {})
+
+        # Exercise and Verify
+        self.assertIsNone(Letter.parse(letter.toBytesWithLength()))
+
+    def test_Letter_Receving(self) -> None:
+        # Setup
+        binary = BinaryLetter("tid_1", b"1" * 1024, menu="menu",
+                              fileName="rar", parent="123456")
+        response = ResponseLetter("ident", "tid_1",
+                                  Letter.RESPONSE_STATE_IN_PROC)
+        cmds = ["echo " + str(i) for i in range(10000)]
+        newLetter = NewLetter("tid_1", "sn", "vsn", "", {"cmds": cmds})
+
+        async def receive_all() -> List[Optional[Letter]]:
+            reader = asyncio.StreamReader()
+            reader.feed_data(binary.toBytesWithLength())
+            reader.feed_data(response.toBytesWithLength())
+            reader.feed_data(newLetter.toBytesWithLength(Letter.FRAME_V2))
+            reader.feed_eof()
+
+            return [await receving(reader) for i in range(3)]
+
+        # Exercise
+        binary_r, response_r, newLetter_r = asyncio.run(receive_all())
+
+        # Verify
+        self.assertEqual(b"1" * 1024, cast(BinaryLetter, binary_r).getBytes())
+        self.assertEqual("rar", cast(BinaryLetter, binary_r).getFileName())
+        self.assertEqual("tid_1", cast(ResponseLetter, response_r).getTid())
+        self.assertEqual(cmds, cast(NewLetter, newLetter_r).getExtra()['cmds'])
+
+    def test_Letter_RecevingEOF(self) -> None:
+        # Setup
+        response = ResponseLetter("ident", "tid_1",
+                                  Letter.RESPONSE_STATE_IN_PROC)
+
+        async def receive_partial() -> Optional[Letter]:
+            reader = asyncio.StreamReader()
+            reader.feed_data(response.toBytesWithLength()[:10])
+            reader.feed_eof()
+
+            return await receving(reader)
+
+        # Exercise and Verify
+        with self.assertRaises(ConnectionError):
+            asyncio.run(receive_partial())
+
+    def test_Letter_RecevingSock(self) -> None:
+        # Setup
+        binary = BinaryLetter("tid_1", b"1" * 1024, fileName="rar")
+        response = ResponseLetter("ident", "tid_1",
+                                  Letter.RESPONSE_STATE_IN_PROC)
+        s1, s2 = socket.socketpair()
+        s1.sendall(binary.toBytesWithLength() + response.toBytesWithLength())
+
+        # Exercise
+        binary_r = cast(BinaryLetter, receving_sock(s2))
+        response_r = cast(ResponseLetter, receving_sock(s2))
+        s1.close()
+        s2.close()
+
+        # Verify
+        self.assertEqual(b"1" * 1024, binary_r.getBytes())
+        self.assertEqual("tid_1", response_r.getTid())
+
+    def test_PropLetter_Frame(self) -> None:
+        # Setup
+        prop = PropLetter("w", "1", "0", "NORMAL", frame=Letter.FRAME_V2)
+        prop_old = PropLetter("w", "1", "0", "NORMAL")
+        del prop_old.content['frame']
+
+        # Exercise
+        prop_p = cast(PropLetter, Letter.parse(prop.toBytesWithLength()))
+        prop_old_p = cast(PropLetter, Letter.parse(
+            prop_old.toBytesWithLength()))
+
+        # Verify
+        self.assertEqual(Letter.FRAME_V2, prop_p.getFrame())
+        self.assertEqual(Letter.FRAME_V1, prop_old_p.getFrame())
@@ -0,0 +1,201 @@
+# MIT License
+#
+# Copyright (c) 2020 Gcom
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# letterWriter.py
+#
+# Write letters of a link in a dedicated task so a slow link
+# unable to block another links.
+
+import asyncio
+import typing as T
+
+from manager.basic.letter import Letter
+
+
+# Priority of letters, letters in lower lane
+# are write before letters in higher lane.
+#
+# Letters of a task must not be reordered, e.g. a TaskCancel
+# overtake the NewTask of the task or a Response of final state
+# overtake TaskLogs of the task, so all of them are in normal lane
+# and only letters without task state are in control lane.
+LANE_CONTROL = 0
+LANE_NORMAL = 1
+LANE_BULK = 2
+
+NUM_OF_LANES = 3
+
+LANE_OF_LETTERS = {
+    Letter.Heartbeat:      LANE_CONTROL,
+    Letter.PropertyNotify: LANE_CONTROL,
+    Letter.Log:            LANE_BULK,
+    Letter.LogRegister:    LANE_BULK,
+}  # type: T.Dict[str, int]
+
+
+def laneOf(letter: Letter) -> int:
+    return LANE_OF_LETTERS.get(letter.typeOfLetter(), LANE_NORMAL)
+
+
+class LetterWriter:
+    """
+    LetterWriter own a task that write letters of a link. Letters
+    queued in the same loop turn are write in one call and drained
+    once, letters in control lane are write before normal and bulk
+    letters, letters in the same lane are write in order.
+
+    send() return after the letter is drained and raise
+    ConnectionError if the link is broken just like sending().
+    Letters are queued until start() is called so the owner of
+    the link is able to finish handshake before any letter is
+    write.
+    """
+
+    MAX_BATCH = 64
+
+    def __init__(self, writer: asyncio.StreamWriter,
+                 frame: int = Letter.FRAME_V1,
+                 maxsize: int = 256,
+                 compress: int = 0) -> None:
+        self._writer = writer
+        self._frame = frame
+
+        # Threshold of compression, only work if
+        # opposite support FRAME_V4.
+        self._compress = compress
+
+        self._lanes = [
+            asyncio.Queue(maxsize) for i in range(NUM_OF_LANES)
+        ]  # type: T.List[asyncio.Queue]
+
+        self._pending = asyncio.Event()
+        self._t = None  # type: T.Optional[asyncio.Task]
+
+    def setWriter(self, writer: asyncio.StreamWriter) -> None:
+        self._writer = writer
+
+    def setFrame(self, frame: int) -> None:
+        self._frame = frame
+
+    def setCompress(self, threshold: int) -> None:
+        self._compress = threshold
+
+    def isRunning(self) -> bool:
+        return self._t is not None
+
+    def start(self) -> None:
+        if self._t is not None:
+            return None
+
+        self._t = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._t is not None:
+            self._t.cancel()
+            self._t = None
+
+        # Letters unable to be sent any more.
+        self._fail(self._collect(), ConnectionError())
+
+    async def send(self, letter: Letter) -> None:
+        fut = asyncio.get_running_loop().create_future()
+        await self._lanes[laneOf(letter)].put((letter, fut))
+        self._pending.set()
+
+        await fut
+
+    def numOfPending(self) -> int:
+        return sum([lane.qsize() for lane in self._lanes])
+
+    async def _run(self) -> None:
+        batch = []  # type: T.List[T.Tuple[Letter, asyncio.Future]]
+
+        try:
+            while True:
+                await self._pending.wait()
+                self._pending.clear()
+
+                # Let letters that sent in the same loop
+                # turn join into the batch.
+                await asyncio.sleep(0)
+
+                batch = self._collect(LetterWriter.MAX_BATCH)
+                if self.numOfPending() > 0:
+                    self._pending.set()
+
+                await self._write(batch)
+                batch = []
+
+        except asyncio.CancelledError:
+            self._fail(batch, ConnectionError())
+            raise
+
+    def _collect(self, limit: int = 0) -> T.List[T.Tuple[Letter, asyncio.Future]]:
+        batch = []  # type: T.List[T.Tuple[Letter, asyncio.Future]]
+
+        for lane in self._lanes:
+            while not lane.empty():
+                if limit > 0 and len(batch) >= limit:
+                    return batch
+                batch.append(lane.get_nowait())
+
+        return batch
+
+    async def _write(self, batch: T.List[T.Tuple[Letter, asyncio.Future]]) -> None:
+        datas = []  # type: T.List[bytes]
+        written = []  # type: T.List[asyncio.Future]
+
+        compress = self._compress if self._frame >= Letter.FRAME_V4 else 0
+
+        for letter, fut in batch:
+            try:
+                datas.append(letter.toBytesWithLength(self._frame, compress))
+                written.append(fut)
+            except Exception as e:
+                self._fail([(letter, fut)], e)
+
+        if datas == []:
+            return None
+
+        try:
+            if self._writer.is_closing():
+                raise ConnectionError
+
+            self._writer.writelines(datas)
+            await self._writer.drain()
+        except Exception as e:
+            for fut in written:
+                if not fut.done():
+                    fut.set_exception(e)
+            return None
+
+        for fut in written:
+            if not fut.done():
+                fut.set_result(None)
+
+    @staticmethod
+    def _fail(batch: T.List[T.Tuple[Letter, asyncio.Future]],
+              e: Exception) -> None:
+        for _, fut in batch:
+            if not fut.done():
+                fut.set_exception(e)
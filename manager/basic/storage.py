@@ -27,7 +27,7 @@ import platform
 import shutil
 
 from typing import Optional, Dict, BinaryIO, \
-    Any, List, cast
+    Any, List, Tuple, cast
 
 from .mmanager import Module
 from manager.basic.type import State, Ok, Error
@@ -39,6 +39,14 @@ else:
 
 M_NAME = "Storage"
 
+# Suffix of a file which is still in transfer and
+# suffix of progress of the transfer.
+PARTIAL_SUFFIX = ".part"
+RANGES_SUFFIX = ".ranges"
+
+# Directory of blobs of a content-addressed Storage.
+BLOBS_DIR = ".blobs"
+
 
 class STORAGE_IDENT_NOT_FOUND(Exception):
     pass
@@ -129,7 +137,9 @@ class Box:
     def _recover(self) -> State:
         files = os.listdir(self._path)
 
-        files = list(filter(lambda f:  os.path.isfile(self._path+seperator+f),
+        files = list(filter(lambda f:  os.path.isfile(self._path+seperator+f)
+                            and not f.endswith((PARTIAL_SUFFIX,
+                                                RANGES_SUFFIX)),
                             files))
         if len(files) == 0:
             return Ok
@@ -153,8 +163,20 @@ class Box:
     def openFile(self, fileName: str) -> Optional[StoChooser]:
         if fileName not in self._files:
             return None
+
+        self.detach(fileName)
         return self._files[fileName].open()
 
+    def detach(self, fileName: str) -> None:
+        # A file shared with another boxes is unlinked before
+        # it's write so content of another boxes is kept.
+        if fileName not in self._files:
+            return None
+
+        path = self._files[fileName].path()
+        if os.path.exists(path) and os.stat(path).st_nlink > 1:
+            self._where.unref(path)
+
     def exists(self, fileName: str) -> bool:
         return fileName in self._files
 
@@ -172,7 +194,7 @@ class Box:
         theFile = self._files[fileName]
 
         try:
-            theFile.remove()
+            self._where.unref(theFile.path())
         except Exception:
             pass
 
@@ -192,6 +214,24 @@ class Box:
 
         return StoChooser(filePath)
 
+    def partialPath(self, name: str, tag: str = "") -> str:
+        return self.path() + seperator + name + tag + PARTIAL_SUFFIX
+
+    def commitPartial(self, name: str, digest: str = "",
+                      tag: str = "") -> Optional[str]:
+        # Replace the file with it's partial file.
+        partial = self.partialPath(name, tag)
+        if not os.path.exists(partial):
+            return None
+
+        filePath = self.path() + seperator + name
+        self._where.place(partial, filePath, digest, move=True)
+
+        if not self.exists(name):
+            self.add(name, File(name, filePath))
+
+        return filePath
+
     def copyFrom(self, filePath: str, fileName: str) -> State:
         # Copy a file specified by the filePath to this box.
 
@@ -223,8 +263,15 @@ class Box:
 
 
 class Storage(Module):
+    """
+    Files are kept in boxes. A Storage with dedup enabled is
+    content-addressed, content of files are kept once as blobs
+    in BLOBS_DIR and files of boxes are hardlinks to blobs. Link
+    count of a blob is it's reference count, a blob is removed
+    while the last file link to it is removed.
+    """
 
-    def __init__(self, path: str, inst: Any) -> None:
+    def __init__(self, path: str, inst: Any, dedup: bool = False) -> None:
 
         Module.__init__(self, M_NAME)
 
@@ -232,6 +279,11 @@ class Storage(Module):
         self._boxes = {}  # type:  Dict[str, Box]
         self._num = 0
 
+        self._dedup = dedup
+
+        # (st_dev, st_ino) of blobs to their path.
+        self._blobs = {}  # type: Dict[Tuple[int, int], str]
+
         # Need to check that is the path valid
         self._path = path
 
@@ -251,13 +303,108 @@ class Storage(Module):
         global seperator
 
         boxes = os.listdir(self._path)
-        boxes = list(filter(lambda f:  os.path.isdir(self._path+seperator+f),
+        boxes = list(filter(lambda f:  os.path.isdir(self._path+seperator+f)
+                            and f != BLOBS_DIR,
                             boxes))
 
         for boxName in boxes:
             box = Box(boxName, self)
             self._boxes[boxName] = box
 
+        self._blobScan()
+
+    def _blobPath(self, digest: str) -> str:
+        return seperator.join([self._path, BLOBS_DIR, digest[:2], digest])
+
+    def _blobScan(self) -> None:
+        self._blobs.clear()
+
+        blobs = self._path + seperator + BLOBS_DIR
+        for d, _, names in os.walk(blobs):
+            for name in names:
+                self._blobIndex(d + seperator + name)
+
+    def _blobIndex(self, blob: str) -> None:
+        st = os.stat(blob)
+        self._blobs[(st.st_dev, st.st_ino)] = blob
+
+    def _blobOf(self, path: str) -> Optional[str]:
+        """
+        Blob that the file link to. Blobs may be created by
+        another process (DataLink), blobs on disk are indexed
+        again if the file is not link to a known blob.
+        """
+        st = os.stat(path)
+        if st.st_nlink <= 1:
+            return None
+
+        key = (st.st_dev, st.st_ino)
+        if key not in self._blobs:
+            self._blobScan()
+
+        # Blob may be removed by another process.
+        blob = self._blobs.get(key, None)
+        if blob is None or not os.path.exists(blob) or \
+           not os.path.samefile(blob, path):
+            return None
+
+        return blob
+
+    def _blobCollect(self, blob: str) -> None:
+        # No more files link to the blob.
+        st = os.stat(blob)
+        if st.st_nlink <= 1:
+            os.remove(blob)
+            self._blobs.pop((st.st_dev, st.st_ino), None)
+
+    def place(self, src: str, dest: str, digest: str,
+              move: bool = False) -> None:
+        """
+        Move or copy src to dest. If dedup is enabled and digest
+        of src is given dest is link to the blob of the digest
+        and src is copied only if the blob is not exists.
+        """
+        # dest may share it's content with another files.
+        if os.path.exists(dest):
+            self.unref(dest)
+
+        if not self._dedup or digest == "":
+            if move:
+                os.replace(src, dest)
+            else:
+                shutil.copy(src, dest)
+            return None
+
+        blob = self._blobPath(digest)
+
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            if move:
+                os.replace(src, blob)
+            else:
+                shutil.copy(src, blob)
+            self._blobIndex(blob)
+        elif move:
+            os.remove(src)
+
+        try:
+            os.link(blob, dest)
+        except OSError:
+            # Filesystem unable to link, keep a copy.
+            shutil.copy(blob, dest)
+            self._blobCollect(blob)
+
+    def unref(self, path: str) -> None:
+        """
+        Remove a file, the blob it link to is removed if
+        no more files link to it.
+        """
+        blob = self._blobOf(path)
+        os.remove(path)
+
+        if blob is not None:
+            self._blobCollect(blob)
+
     def recover(self) -> None:
         self._recover()
 
@@ -281,11 +428,71 @@ class Storage(Module):
 
         f = theBox.getFile(fileName)
         if f is not None:
+            theBox.detach(fileName)
             return f.open()
 
         # The file is not exist.
         return theBox.newFile(fileName)
 
+    def partialPath(self, boxName: str, fileName: str,
+                    tag: str = "") -> Optional[str]:
+        """
+        Path of the partial file of a file in transfer, bytes are
+        write into the partial file and it become the file after
+        commitPartial() is called. Transfers of the same file
+        with different tags are write into different partial files.
+        """
+        if boxName == "" or fileName == "":
+            return None
+
+        if boxName not in self._boxes:
+            self._createBox(boxName)
+
+        return self._boxes[boxName].partialPath(fileName, tag)
+
+    def commitPartial(self, boxName: str, fileName: str,
+                      digest: str = "", tag: str = "") -> Optional[str]:
+        """
+        Replace the file with it's partial file, return path of
+        the file. digest is sha256 of the partial file, it's used
+        to find out the blob of the file if dedup is enabled.
+        """
+        theBox = self._getBox(boxName)
+        if theBox is None:
+            return None
+
+        return theBox.commitPartial(fileName, digest, tag)
+
+    def share(self, srcBox: str, fileName: str,
+              boxName: str) -> Optional[str]:
+        """
+        Put a file of srcBox into another box, the file is a
+        hardlink of the file of srcBox so content is shared,
+        return path of the file in the box.
+        """
+        src = seperator.join([self._path, srcBox, fileName])
+        if not os.path.isfile(src) or boxName == "":
+            return None
+
+        if boxName not in self._boxes:
+            self._createBox(boxName)
+
+        theBox = self._boxes[boxName]
+        dest = theBox.path() + seperator + fileName
+
+        if os.path.exists(dest):
+            self.unref(dest)
+
+        try:
+            os.link(src, dest)
+        except OSError:
+            shutil.copy(src, dest)
+
+        if not theBox.exists(fileName):
+            theBox.add(fileName, File(fileName, dest))
+
+        return dest
+
     def _createBox(self, boxName: str) -> State:
         if self._isExists(boxName):
             return Error
@@ -386,6 +593,7 @@ class Storage(Module):
 import unittest
 import os
 import shutil
+import hashlib
 
 class StorageTestCases(unittest.TestCase):
 
@@ -464,3 +672,104 @@ class StorageTestCases(unittest.TestCase):
         self.assertTrue(not os.path.exists("./Storage/B2/File2"))
         self.assertTrue(os.path.exists("./Storage/B1/File2"))
         self.assertTrue(os.path.exists("./Storage/B2/File1"))
+
+    def test_Storage_commitPartial(self) -> None:
+        # Setup
+        boxName = "Test"
+        partial = cast(str, self.storage.partialPath(boxName, "File"))
+
+        with open(partial, "wb") as f:
+            f.write(b"Contents")
+
+        # Exercise
+        path = self.storage.commitPartial(boxName, "File")
+
+        # Verify
+        self.assertEqual("./Storage/Test/File", path)
+        self.assertFalse(os.path.exists(partial))
+        self.assertEqual(["File"],
+                         [f.name for f in self.storage.filesOf(boxName)])
+
+        # Partial files are not recovered as files.
+        open(cast(str, self.storage.partialPath(boxName, "File2")), "wb")
+        self.assertEqual(["File"], [f.name for f in
+                                    Storage("./Storage", None).filesOf(boxName)])
+
+    def test_Storage_Dedup(self) -> None:
+        # Setup
+        storage = Storage("./Storage", None, dedup=True)
+        digest = hashlib.sha256(b"Contents").hexdigest()
+
+        # Exercise
+        for boxName in ["B1", "B2"]:
+            partial = cast(str, storage.partialPath(boxName, "File"))
+            with open(partial, "wb") as f:
+                f.write(b"Contents")
+            storage.commitPartial(boxName, "File", digest)
+
+        # Verify
+        blob = "./Storage/" + BLOBS_DIR + "/" + digest[:2] + "/" + digest
+        self.assertTrue(os.path.samefile(blob, "./Storage/B1/File"))
+        self.assertTrue(os.path.samefile(blob, "./Storage/B2/File"))
+        self.assertEqual(3, os.stat(blob).st_nlink)
+
+        # Blob is not a box.
+        storage = Storage("./Storage", None, dedup=True)
+        self.assertIsNone(storage._getBox(BLOBS_DIR))
+
+        # Write to a file not affect another boxes.
+        chooser = cast(StoChooser, storage.open("B1", "File"))
+        chooser.store(b"Changed")
+        chooser.close()
+
+        with open("./Storage/B2/File", "rb") as f:
+            self.assertEqual(b"Contents", f.read())
+
+        # Blob is removed after last file link to it is removed.
+        storage.delete("B2", "File")
+        self.assertFalse(os.path.exists(blob))
+
+    def test_Storage_share(self) -> None:
+        # Setup
+        chooser = cast(StoChooser, self.storage.create("B1", "File"))
+        chooser.store(b"Contents")
+        chooser.close()
+
+        # Exercise
+        path = self.storage.share("B1", "File", "B2")
+
+        # Verify
+        self.assertEqual("./Storage/B2/File", path)
+        self.assertTrue(os.path.samefile("./Storage/B1/File", path))
+        self.assertEqual(["File"], [f.name for f in
+                                    self.storage.filesOf("B2")])
+
+        # Removal of one box keep the file of another.
+        self.storage.delete("B1", "File")
+        with open("./Storage/B2/File", "rb") as f:
+            self.assertEqual(b"Contents", f.read())
+
+        # File not exists.
+        self.assertIsNone(self.storage.share("B1", "File", "B3"))
+
+    def test_Storage_Dedup_AnotherProcess(self) -> None:
+        # Setup
+        # Storage of master is created before the blob is
+        # created by Storage of DataLink.
+        master = Storage("./Storage", None, dedup=True)
+        datalink = Storage("./Storage", None, dedup=True)
+        digest = hashlib.sha256(b"Contents").hexdigest()
+
+        partial = cast(str, datalink.partialPath("B1", "File"))
+        with open(partial, "wb") as f:
+            f.write(b"Contents")
+        datalink.commitPartial("B1", "File", digest)
+
+        # Exercise
+        master.share("B1", "File", "B2")
+        datalink.delete("B1", "File")
+        master.delete("B2", "File")
+
+        # Verify
+        blob = "./Storage/" + BLOBS_DIR + "/" + digest[:2] + "/" + digest
+        self.assertFalse(os.path.exists(blob))
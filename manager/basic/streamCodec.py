@@ -0,0 +1,151 @@
+# MIT License
+#
+# Copyright (c) 2020 Gcom
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# streamCodec.py
+#
+# Encoding of files transfered in raw bytes over DataLinks. An
+# encoded range is a sequence of blocks, each block is a header
+# (length of payload, length of raw bytes) followed by payload.
+# Blocks are independent so they are encoded on several cores.
+
+import os
+import zlib
+import struct
+import asyncio
+import typing as T
+
+from collections import deque
+from concurrent.futures import Executor
+
+
+ENCODING_NONE = ""
+ENCODING_ZLIB = "zlib"
+
+SUPPORTED_ENCODINGS = (ENCODING_NONE, ENCODING_ZLIB)
+
+BLOCK_SIZE = 1024 * 1024
+BLOCK_HEADER = struct.Struct("!II")
+
+# Files of these types are already compressed.
+INCOMPRESSIBLE_EXTS = {
+    ".rar", ".zip", ".7z", ".gz", ".tgz", ".bz2", ".xz", ".zst",
+    ".lz4", ".lzma", ".jar", ".apk", ".jpg", ".jpeg", ".png", ".mp4"
+}
+
+# A file is compressed only if samples of it shrink below
+# this ratio.
+SAMPLE_SIZE = 64 * 1024
+SAMPLE_COUNT = 4
+SAMPLE_RATIO = 0.9
+
+
+def choose_encoding(path: str, level: int) -> str:
+    """
+    Encoding of a file, decided by it's extension and a sample
+    of it's content.
+    """
+    if level <= 0:
+        return ENCODING_NONE
+
+    if os.path.splitext(path)[1].lower() in INCOMPRESSIBLE_EXTS:
+        return ENCODING_NONE
+
+    size = os.path.getsize(path)
+    if size == 0:
+        return ENCODING_NONE
+
+    raw = compressed = 0
+    step = max(size // SAMPLE_COUNT, SAMPLE_SIZE)
+
+    with open(path, "rb") as f:
+        for pos in range(0, size, step):
+            f.seek(pos)
+            sample = f.read(SAMPLE_SIZE)
+
+            raw += len(sample)
+            compressed += len(zlib.compress(sample, 1))
+
+    if compressed / raw < SAMPLE_RATIO:
+        return ENCODING_ZLIB
+
+    return ENCODING_NONE
+
+
+def encode_block(path: str, pos: int, length: int, level: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(pos)
+        data = f.read(length)
+
+    payload = zlib.compress(data, level)
+    return BLOCK_HEADER.pack(len(payload), len(data)) + payload
+
+
+async def encode_range(path: str, begin: int, end: int, level: int,
+                       executor: Executor, workers: int) \
+        -> T.AsyncIterator[bytes]:
+    """
+    Encoded blocks of bytes [begin, end) of the file, at most
+    workers blocks are encoded at the same time.
+    """
+    loop = asyncio.get_running_loop()
+    pending = deque()  # type: T.Deque[asyncio.Future]
+    pos = begin
+
+    while pos < end or pending:
+        while pos < end and len(pending) < workers:
+            length = min(BLOCK_SIZE, end - pos)
+            pending.append(loop.run_in_executor(
+                executor, encode_block, path, pos, length, level))
+            pos += length
+
+        yield await pending.popleft()
+
+
+async def decode_blocks(reader: asyncio.StreamReader, length: int) \
+        -> T.AsyncIterator[bytes]:
+    """
+    Raw bytes of blocks read from reader until length bytes
+    are decoded, ConnectionError is raised if the stream is
+    closed or a block is corrupted.
+    """
+    loop = asyncio.get_running_loop()
+
+    while length > 0:
+        try:
+            header = await reader.readexactly(BLOCK_HEADER.size)
+            size, rawSize = BLOCK_HEADER.unpack(header)
+            payload = await reader.readexactly(size)
+        except asyncio.IncompleteReadError:
+            raise ConnectionError()
+
+        try:
+            data = await loop.run_in_executor(
+                None, zlib.decompress, payload)
+        except zlib.error:
+            raise ConnectionError()
+
+        if len(data) != rawSize or rawSize > length:
+            raise ConnectionError()
+
+        length -= rawSize
+        yield data
@@ -30,6 +30,7 @@ import asyncio
 import psutil
 import chardet
 import datetime
+import hashlib
 
 from concurrent.futures import ThreadPoolExecutor
 from threading import Thread
@@ -256,8 +257,52 @@ def datetime_format(time: datetime.datetime, format: str) -> Optional[str]:
 
     return format
 
+def sha256_of_file(path: str, begin: int = 0, length: int = -1,
+                   chunk_size: int = 1024 * 1024) -> Any:
+    """
+    Return a sha256 object updated with content of the file,
+    length bytes from begin or to the end if length is negative.
+    """
+    h = hashlib.sha256()
+
+    with open(path, "rb") as f:
+        f.seek(begin)
+
+        while length != 0:
+            chunk = f.read(chunk_size if length < 0
+                           else min(chunk_size, length))
+            if chunk == b"":
+                break
+
+            h.update(chunk)
+            if length > 0:
+                length -= len(chunk)
+
+    return h
+
+
 def zero_expand_str(s: str, n: int) -> str:
     if len(s) < n:
         return "0" * (n-len(s)) + s
 
     return s
+
+
+# Copies of a task that are started by speculation are named
+# <tid>~<n>, result of a copy is the result of the task.
+SPECULATION_SEP = "~"
+
+
+def speculation_origin(tid: str) -> str:
+    """
+    Ident of the task that tid is a copy of.
+    """
+    return tid.split(SPECULATION_SEP)[0]
+
+
+def speculation_tag(tid: str) -> str:
+    """
+    Suffix of ident of a copy, "" if tid is not a copy.
+    """
+    pos = tid.find(SPECULATION_SEP)
+    return "" if pos < 0 else tid[pos:]
@@ -0,0 +1,59 @@
+# MIT License
+#
+# Copyright (c) 2020 Gcom
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import unittest
+
+from manager.master.buildStats import BuildStats
+
+
+class BuildStatsTestCases(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.sut = BuildStats(alpha=0.5)
+
+    def test_BuildStats_Record(self) -> None:
+        # Exercise
+        self.sut.record("GL5610", "W1", 400)
+        self.sut.record("GL5610", "W1", 200)
+
+        # Verify
+        self.assertEqual(300, self.sut.expected("GL5610", "W1"))
+        self.assertEqual(None, self.sut.expected("GL8900", "W1"))
+
+    def test_BuildStats_Speed(self) -> None:
+        # Exercise
+        self.sut.record("GL5610", "Slow", 400)
+        self.sut.record("GL5610", "Fast", 200)
+        self.sut.record("GL8900", "Slow", 100)
+
+        # Verify
+        # Fast is twice as fast, speed moves from 1.0 toward 0.5.
+        self.assertEqual(0.75, self.sut.speed("Fast"))
+        self.assertEqual(1.0, self.sut.speed("Unknown"))
+
+        # GL8900 is never run on Fast.
+        self.assertEqual(75, self.sut.expected("GL8900", "Fast"))
+        self.assertEqual(100, self.sut.expected("GL8900", "Unknown"))
+
+        self.assertGreater(self.sut.usual("GL5610"),
+                           self.sut.usual("GL8900"))
@@ -20,6 +20,7 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import time
 import asyncio
 import unittest
 import typing
@@ -28,13 +29,15 @@ import manager.master.configs as cfg
 
 from manager.basic.info import Info
 from manager.master.dispatcher import Dispatcher, WaitArea, \
-    WaitAreaSpec, theListener, viaOverhead
+    WaitAreaSpec, theListener, viaOverhead, ExpectedFinish, BuildAffinity
 from manager.master.workerRoom import WorkerRoom
 from manager.master.taskTracker import TaskTracker
 from manager.master.TestCases.misc.workerStub import WorkerStub
 from manager.master.worker import Worker
 from manager.master.task import Task, SingleTask, PostTask
 from manager.master.build import Build, BuildSet
+from manager.basic.endpoint import Endpoint
+from manager.master.job import Job
 
 
 class sInst:
@@ -42,6 +45,35 @@ class sInst:
         return Info("./manager/master/TestCases/misc/config.yaml")
 
 
+class EndpointStub(Endpoint):
+
+    def __init__(self) -> None:
+        Endpoint.__init__(self)
+        self.received = []  # type: typing.List[typing.Any]
+
+    async def handle(self, data: typing.Any) -> typing.Any:
+        self.received.append(data)
+        return None
+
+
+class WriterRecorder:
+    """
+    StreamWriter that record each write.
+    """
+
+    def __init__(self) -> None:
+        self.writes = []  # type: typing.List[typing.List[bytes]]
+
+    def is_closing(self) -> bool:
+        return False
+
+    def writelines(self, datas: typing.List[bytes]) -> None:
+        self.writes.append(list(datas))
+
+    async def drain(self) -> None:
+        return None
+
+
 class MsgPri0:
 
     def __init__(self, msg: str) -> None:
@@ -132,6 +164,37 @@ class WaitAreaTestCases(unittest.IsolatedAsyncioTestCase):
         msg = self.sut.peek()
         self.assertEqual(None, msg)
 
+    async def test_WaitArea_PeekDequeueOf(self) -> None:
+        # Exercise
+        await self.sut.enqueue(MsgPri0("Head"))
+        await self.sut.enqueue(MsgPri1("1"))
+        await self.sut.enqueue(MsgPri1("2"))
+
+        # Verify
+        self.assertEqual(["MsgPri0", "MsgPri1", "MsgPri2"], self.sut.types())
+        self.assertEqual("1", self.sut.peek_of("MsgPri1").msg)
+        self.assertEqual(None, self.sut.peek_of("MsgPri2"))
+
+        self.assertEqual("1", self.sut.dequeue_of_nowait("MsgPri1").msg)
+        self.assertEqual("Head", self.sut.peek().msg)
+        self.assertEqual(2, len(self.sut.all()))
+
+        with self.assertRaises(WaitArea.Area_Empty):
+            self.sut.dequeue_of_nowait("MsgPri2")
+
+    async def test_WaitArea_Unbounded(self) -> None:
+        # Exercise
+        for i in range(1000):
+            self.sut.enqueue_nowait(MsgPri1(str(i)))
+
+        # Verify
+        # Only head of the queue is seen by placement.
+        self.assertEqual(10, len(self.sut.all_of("MsgPri1")))
+        self.assertEqual(1000, len(self.sut.all()))
+        self.assertEqual(
+            [str(i) for i in range(1000)],
+            [self.sut.dequeue_of_nowait("MsgPri1").msg for i in range(1000)])
+
 
 class DispatcherUnitTest(unittest.IsolatedAsyncioTestCase):
 
@@ -248,3 +311,504 @@ class DispatcherUnitTest(unittest.IsolatedAsyncioTestCase):
         worker_another = self.sut._taskTracker.whichWorker(t.id())  # type: ignore
         self.assertTrue(worker_another is not None)
         self.assertTrue(worker_another, worker)
+
+    async def test_Dispatcher_Drain_WorkerFree(self) -> None:
+        """
+        Tasks in WaitArea are dispatched as soon as workers are
+        able to accept, not one per tick.
+        """
+
+        # Setup
+        self.wr.removeWorker("Merger")
+        self.sut.start()
+
+        tasks = [
+            SingleTask("S" + str(i), "SN", "REV",
+                       Build("B", {"cmd": "...", "output": "..."}))
+            for i in range(20)
+        ]
+
+        # Exercise
+        for t in tasks:
+            self.sut.dispatch(t)
+        await asyncio.sleep(0.1)
+
+        # Only 4 workers with max 1.
+        self.assertEqual(16, len(self.sut.getTaskInWaits()))
+
+        workers = [self.n, self.n1, self.n2, self.n3]
+        for w in workers:
+            w.setMax(5)
+        await asyncio.sleep(0.1)
+
+        # Verify
+        self.assertEqual(0, len(self.sut.getTaskInWaits()))
+        self.assertEqual(20, sum(w.numOfTaskProc() for w in workers))
+
+    async def test_Dispatcher_Drain_WorkerConnected(self) -> None:
+        # Setup
+        self.wr.removeWorker("Merger")
+        self.sut.start()
+
+        # Exercise
+        self.sut.dispatch(PostTask("P", "V", [], None))
+        await asyncio.sleep(0.1)
+        self.assertEqual(1, len(self.sut.getTaskInWaits()))
+
+        self.wr.addWorker(self.m)
+        await asyncio.sleep(0.1)
+
+        # Verify
+        self.assertEqual(0, len(self.sut.getTaskInWaits()))
+        self.assertEqual(1, self.m.postCount)
+
+    async def test_Dispatcher_Drain_TaskDone(self) -> None:
+        # Setup
+        self.wr.removeWorker("Merger")
+        self.sut.start()
+
+        for i in range(5):
+            self.sut.dispatch(
+                SingleTask("S" + str(i), "SN", "REV",
+                           Build("B", {"cmd": "...", "output": "..."})))
+        await asyncio.sleep(0.1)
+        self.assertEqual(1, len(self.sut.getTaskInWaits()))
+
+        # Exercise
+        self.n.removeTask(self.n.inProcTasks()[0].id())
+        await asyncio.sleep(0.1)
+
+        # Verify
+        self.assertEqual(0, len(self.sut.getTaskInWaits()))
+        self.assertEqual(1, self.n.numOfTaskProc())
+
+    async def test_Dispatcher_Drain_BlockedHead(self) -> None:
+        """
+        A PostTask without merger online not block SingleTasks
+        behind it.
+        """
+
+        # Setup
+        self.wr.removeWorker("Merger")
+        self.sut.start()
+
+        for i in range(5):
+            self.sut.dispatch(
+                SingleTask("S" + str(i), "SN", "REV",
+                           Build("B", {"cmd": "...", "output": "..."})))
+        self.sut.dispatch(PostTask("P", "V", [], None))
+        await asyncio.sleep(0.1)
+
+        waits = self.sut.getTaskInWaits()
+        self.assertEqual(["P", "S4"], [t.id() for t in waits])
+
+        # Exercise
+        self.n.removeTask(self.n.inProcTasks()[0].id())
+        await asyncio.sleep(0.1)
+
+        # Verify
+        waits = self.sut.getTaskInWaits()
+        self.assertEqual(["P"], [t.id() for t in waits])
+        self.assertEqual(1, self.n.numOfTaskProc())
+
+        # PostTask is placed once merger is connected.
+        self.wr.addWorker(self.m)
+        await asyncio.sleep(0.1)
+
+        self.assertEqual([], self.sut.getTaskInWaits())
+        self.assertEqual(1, self.m.postCount)
+
+    async def test_Dispatcher_ExpectedFinish(self) -> None:
+        """
+        Longest builds are placed to fastest workers.
+        """
+
+        # Setup
+        stats = self.sut.buildStats()
+        for w, speed in [("Normal", 4), ("Normal1", 3),
+                         ("Normal2", 2), ("Normal3", 1)]:
+            stats.record("Warm", w, 10 * speed)
+
+        for b, seconds in [("Short", 10), ("Mid", 20),
+                           ("Long", 40), ("Longest", 80)]:
+            stats.record(b, "Other", seconds)
+
+        self.sut.add_worker_search_cond(SingleTask,
+                                        ExpectedFinish(stats))
+        self.sut.start()
+
+        # Exercise
+        self.sut.dispatch_batch([
+            SingleTask(b, "SN", "REV",
+                       Build(b, {"cmd": "...", "output": "..."}))
+            for b in ["Short", "Mid", "Long", "Longest"]])
+        await asyncio.sleep(0.1)
+
+        # Verify
+        placed = {w.ident: w.in_doing_task.id()  # type: ignore
+                  for w in [self.n, self.n1, self.n2, self.n3]}
+        self.assertEqual({"Normal3": "Longest", "Normal2": "Long",
+                          "Normal1": "Mid", "Normal": "Short"}, placed)
+
+    async def test_Dispatcher_ExpectedFinish_Load(self) -> None:
+        """
+        Remaining work of tasks in processing on a worker delay
+        tasks that placed to it.
+        """
+        # Setup
+        self.wr.removeWorker("Normal2")
+        self.wr.removeWorker("Normal3")
+        self.n.max = self.n1.max = 2
+
+        stats = self.sut.buildStats()
+        stats.record("Build", "Normal", 10)
+        stats.record("Build", "Normal1", 12)
+        stats.record("Long", "Normal", 100)
+
+        running = SingleTask("Running", "SN", "REV",
+                             Build("Long", {"cmd": "...", "output": "..."}))
+        self.n.inProcTask.newTask(running)
+
+        begins = {}  # type: typing.Dict[str, float]
+        policy = ExpectedFinish(stats, begins.get)
+        task = SingleTask("T", "SN", "REV",
+                          Build("Build", {"cmd": "...", "output": "..."}))
+
+        # Exercise
+        begins["Running"] = time.monotonic()
+        busy = policy.select(task, self.wr)
+
+        begins["Running"] = time.monotonic() - 200
+        almostDone = policy.select(task, self.wr)
+
+        # Verify
+        self.assertIs(self.n1, busy)
+        self.assertIs(self.n, almostDone)
+
+    async def test_Dispatcher_RecordDuration(self) -> None:
+        # Setup
+        self.sut.set_peer(EndpointStub())
+        self.wr.removeWorker("Merger")
+
+        t = SingleTask("S", "SN", "REV",
+                       Build("GL5610", {"cmd": "...", "output": "..."}))
+        self.sut.dispatch(t)
+        await asyncio.sleep(0.1)
+
+        worker = self.tt.whichWorker("S")
+        assert(worker is not None)
+
+        # Exercise
+        await self.sut.job_notify_handle(("S", Task.STATE_IN_PROC))
+        await asyncio.sleep(0.2)
+        await self.sut.job_notify_handle(("S", Task.STATE_FINISHED))
+
+        # Verify
+        seconds = self.sut.buildStats().expected("GL5610", worker.ident)
+        assert(seconds is not None)
+        self.assertTrue(0.2 <= seconds < 0.5)
+        self.assertEqual(0, worker.numOfTaskProc())
+
+    async def test_Dispatcher_BuildAffinity(self) -> None:
+        """
+        Repeat builds go to the warm worker while it's able
+        to accept.
+        """
+
+        # Setup
+        policy = BuildAffinity()
+        self.sut.add_worker_search_cond(SingleTask, policy)
+        self.sut.start()
+
+        workers = [self.n, self.n1, self.n2, self.n3]
+        for w in workers:
+            w.setMax(2)
+
+        def task(ident: str, build: str) -> SingleTask:
+            return SingleTask(ident, "SN", "REV",
+                              Build(build, {"cmd": "...", "output": "..."}))
+
+        self.sut.dispatch(task("First", "GL5610"))
+        await asyncio.sleep(0.1)
+        warm = self.tt.whichWorker("First")
+        assert(warm is not None)
+
+        # Exercise
+        # Warm worker is no longer the least loaded one.
+        warm.removeTask("First")
+        await warm.do(task("Other", "GL8900"))
+
+        self.sut.dispatch(task("Repeat", "GL5610"))
+        await asyncio.sleep(0.1)
+
+        # Verify
+        self.assertIs(warm, self.tt.whichWorker("Repeat"))
+        self.assertEqual([warm.ident], policy.warmWorkers("GL5610"))
+
+        # Warm worker is full.
+        self.sut.dispatch(task("Spill", "GL5610"))
+        await asyncio.sleep(0.1)
+
+        spill = self.tt.whichWorker("Spill")
+        assert(spill is not None)
+        self.assertIsNot(warm, spill)
+        self.assertEqual(1, spill.numOfTaskProc())
+        self.assertEqual([spill.ident, warm.ident],
+                         policy.warmWorkers("GL5610"))
+
+    async def test_Dispatcher_DispatchBatch(self) -> None:
+        """
+        Tasks of a batch to a worker are write to it at once.
+        """
+
+        # Setup
+        for ident in ["Normal", "Normal1", "Normal2", "Normal3"]:
+            self.wr.removeWorker(ident)
+
+        writer = WriterRecorder()
+        w = Worker("Real", typing.cast(asyncio.StreamReader, None),
+                   typing.cast(asyncio.StreamWriter, writer),
+                   Worker.ROLE_NORMAL)
+        w.setState(Worker.STATE_ONLINE)
+        w.setMax(8)
+        self.wr.addWorker(w)
+
+        tasks = [SingleTask("S" + str(i), "SN", "REV",
+                            Build("B", {"cmd": ["make"], "output": ["o"]}))
+                 for i in range(5)]
+
+        # Exercise
+        self.sut.dispatch_batch(tasks + [PostTask("P", "V", [], None)])
+        await asyncio.sleep(0.1)
+
+        # Verify
+        self.assertEqual(1, len(writer.writes))
+        self.assertEqual(5, len(writer.writes[0]))
+        self.assertEqual(5, w.numOfTaskProc())
+        self.assertEqual(1, self.m.postCount)
+        self.assertIs(w, self.tt.whichWorker("S4"))
+
+    def _job_tasks(self, jobid: str, num: int,
+                   priority: str = "normal") -> typing.List[SingleTask]:
+        job = Job(jobid, "GL8900", {"priority": priority})
+
+        tasks = []
+        for i in range(num):
+            t = SingleTask(jobid + "_" + str(i), "SN", "REV",
+                           Build("B", {"cmd": "...", "output": "..."}))
+            t.job = job
+            job.addTask(t.id(), t)
+            tasks.append(t)
+
+        return tasks
+
+    async def test_Dispatcher_UrgentJob(self) -> None:
+        """
+        Tasks of an urgent job are dispatched before tasks of a
+        normal job that are enqueued earlier.
+        """
+
+        # Setup
+        self.wr.removeWorker("Merger")
+        self.sut.start()
+
+        self.sut.dispatch_batch(self._job_tasks("Nightly", 40))
+        await asyncio.sleep(0.1)
+        self.assertEqual(36, len(self.sut.getTaskInWaits()))
+
+        # Exercise
+        self.sut.dispatch_batch(self._job_tasks("Urgent", 2, "urgent"))
+        await asyncio.sleep(0.1)
+
+        for w in [self.n, self.n1]:
+            w.removeTask(w.inProcTasks()[0].id())
+        await asyncio.sleep(0.1)
+
+        # Verify
+        self.assertEqual(["Urgent_0", "Urgent_1"],
+                         sorted(t.id() for w in [self.n, self.n1]
+                                for t in w.inProcTasks()))
+        self.assertEqual(36, len(self.sut.getTaskInWaits()))
+
+    async def test_Dispatcher_FairShare(self) -> None:
+        """
+        Jobs of the same priority take turns.
+        """
+
+        # Setup
+        self.wr.removeWorker("Merger")
+        for w in [self.n1, self.n2, self.n3]:
+            self.wr.removeWorker(w.getIdent())
+        self.sut.start()
+
+        self.sut.dispatch_batch(self._job_tasks("A", 4))
+        await asyncio.sleep(0.1)
+        self.sut.dispatch_batch(self._job_tasks("B", 2))
+        await asyncio.sleep(0.1)
+
+        # Exercise
+        done = []
+        for i in range(4):
+            t = self.n.inProcTasks()[0]
+            done.append(t.id())
+            self.n.removeTask(t.id())
+            await asyncio.sleep(0.05)
+
+        # Verify
+        self.assertEqual(["A_0", "A_1", "B_0", "A_2"], done)
+
+    async def test_Dispatcher_CancelWaiting(self) -> None:
+        """
+        Canceled task is removed from WaitArea at once.
+        """
+
+        # Setup
+        self.wr.removeWorker("Merger")
+        self.sut.start()
+
+        tasks = self._job_tasks("J", 6)
+        self.sut.dispatch_batch(tasks)
+        await asyncio.sleep(0.1)
+        self.assertEqual(2, len(self.sut.getTaskInWaits()))
+
+        # Exercise
+        await self.sut.cancel(tasks[5].id())
+
+        # Verify
+        self.assertEqual([tasks[4]], self.sut.getTaskInWaits())
+        self.assertFalse(self.tt.isInTrack(tasks[5].id()))
+
+    async def test_Dispatcher_SetPriority(self) -> None:
+        # Setup
+        self.wr.removeWorker("Merger")
+        for w in [self.n1, self.n2, self.n3]:
+            self.wr.removeWorker(w.getIdent())
+        self.sut.start()
+
+        self.sut.dispatch_batch(self._job_tasks("A", 3))
+        low = self._job_tasks("L", 1, "low")
+        self.sut.dispatch_batch(low)
+        await asyncio.sleep(0.1)
+
+        # Exercise
+        low[0].job.setPriority(Job.PRIORITY_URGENT)
+        await self.sut.handle(
+            (Dispatcher.ENDPOINT_PRIORITY, (low[0].job, Job.PRIORITY_URGENT)))
+        self.n.removeTask(self.n.inProcTasks()[0].id())
+        await asyncio.sleep(0.1)
+
+        # Verify
+        self.assertEqual("L_0", self.n.inProcTasks()[0].id())
+
+    async def test_Dispatcher_Backlog(self) -> None:
+        """
+        A backlog far more than size of WaitArea's head is
+        queued and dispatched without block.
+        """
+
+        # Setup
+        self.wr.removeWorker("Merger")
+        self.sut.start()
+
+        # Exercise
+        self.sut.dispatch_batch(self._job_tasks("Release", 1000))
+        await asyncio.sleep(0.1)
+
+        # Verify
+        self.assertEqual(996, len(self.sut.getTaskInWaits()))
+
+        workers = [self.n, self.n1, self.n2, self.n3]
+        for w in workers:
+            w.setMax(250)
+        await asyncio.sleep(0.1)
+
+        self.assertEqual(0, len(self.sut.getTaskInWaits()))
+        self.assertEqual(1000, sum(w.numOfTaskProc() for w in workers))
+
+    async def _straggler(self) -> typing.Tuple[SingleTask, Worker, Worker]:
+        """
+        A task that run much longer than usual on it's worker
+        and a copy of it on another worker.
+        """
+        self.sut.set_peer(self.peer)
+        self.sut.setSpeculation(2)
+        self.wr.removeWorker("Merger")
+
+        t = SingleTask("S", "SN", "REV",
+                       Build("GL5610", {"cmd": "...", "output": "..."}))
+        self.sut.dispatch(t)
+        await asyncio.sleep(0.1)
+
+        slow = self.tt.whichWorker("S")
+        assert(slow is not None)
+        self.sut.buildStats().record("GL5610", slow.getIdent(), 0.05)
+
+        await asyncio.sleep(0.15)
+        self.assertEqual(1, await self.sut._speculate())
+
+        copy = self.tt.copiesOf("S")[0]
+        fast = self.tt.whichWorker(copy.id())
+        assert(fast is not None)
+
+        return (t, slow, fast)
+
+    async def test_Dispatcher_Speculate(self) -> None:
+        # Setup
+        self.peer = EndpointStub()
+
+        # Exercise
+        t, slow, fast = await self._straggler()
+
+        # Verify
+        self.assertIsNot(slow, fast)
+        self.assertEqual(1, fast.numOfTaskProc())
+        self.assertEqual("S~1", self.tt.copiesOf("S")[0].id())
+
+        # A task is copied once.
+        self.assertEqual(0, await self.sut._speculate())
+
+    async def test_Dispatcher_Speculate_CopyWins(self) -> None:
+        # Setup
+        self.peer = EndpointStub()
+        t, slow, fast = await self._straggler()
+
+        # Exercise
+        self.assertTrue(self.tt.settle("S~1", Task.STATE_FINISHED))
+        await self.sut.job_notify_handle(("S~1", Task.STATE_FINISHED))
+
+        # Verify
+        # Peer only see the task.
+        self.assertEqual(
+            [("S", Task.STATE_STR_MAPPING[Task.STATE_FINISHED])],
+            self.peer.received)
+        # The task is canceled on the slow worker.
+        self.assertEqual(["S"], slow.cancel_jobs)
+        self.assertEqual(0, fast.numOfTaskProc())
+        self.assertFalse(self.tt.isInTrack("S"))
+        self.assertFalse(self.tt.isInTrack("S~1"))
+
+    async def test_Dispatcher_Speculate_FailedCopy(self) -> None:
+        # Setup
+        self.peer = EndpointStub()
+        t, slow, fast = await self._straggler()
+
+        # Exercise
+        # Failure of the task is not taken while it's copy
+        # is running.
+        self.assertFalse(self.tt.settle("S", Task.STATE_FAILURE))
+        await self.sut.job_notify_handle(("S", Task.STATE_FAILURE))
+
+        # Verify
+        self.assertEqual([], self.peer.received)
+        self.assertEqual(0, slow.numOfTaskProc())
+        self.assertTrue(self.tt.isInTrack("S"))
+
+        # Then the copy fail too.
+        self.assertTrue(self.tt.settle("S~1", Task.STATE_FAILURE))
+        await self.sut.job_notify_handle(("S~1", Task.STATE_FAILURE))
+
+        self.assertEqual(
+            [("S", Task.STATE_STR_MAPPING[Task.STATE_FAILURE])],
+            self.peer.received)
+        self.assertEqual(0, fast.numOfTaskProc())
+        self.assertFalse(self.tt.isInTrack("S"))
@@ -0,0 +1,107 @@
+# MIT License
+#
+# Copyright (c) 2020 Gcom
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import unittest
+
+from manager.master.fairQueue import FairQueue
+
+
+class FairQueueTestCases(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.sut = FairQueue(3, maxsize=10)
+
+    def test_FairQueue_RoundRobin(self) -> None:
+        # Setup
+        for i in range(3):
+            self.sut.put("A" + str(i), "A", 1)
+        self.sut.put("B0", "B", 1)
+        self.sut.put("C0", "C", 1)
+
+        # Exercise
+        items = [self.sut.get() for i in range(5)]
+
+        # Verify
+        self.assertEqual(["A0", "B0", "C0", "A1", "A2"], items)
+        self.assertTrue(self.sut.empty())
+
+    def test_FairQueue_Classes(self) -> None:
+        # Setup
+        self.sut.put("L", "Low", 2)
+        self.sut.put("N", "Normal", 1)
+        self.sut.put("U", "Urgent", 0)
+
+        # Exercise and Verify
+        self.assertEqual("U", self.sut.peek())
+        self.assertEqual(["U", "N", "L"],
+                         [self.sut.get() for i in range(3)])
+
+    def test_FairQueue_Remove(self) -> None:
+        # Setup
+        self.sut.put("A0", "A", 1)
+        self.sut.put("A1", "A", 1)
+        self.sut.put("B0", "B", 1)
+
+        # Exercise
+        self.assertTrue(self.sut.remove("A0"))
+        self.assertFalse(self.sut.remove("A0"))
+        self.assertTrue(self.sut.remove("B0"))
+
+        # Verify
+        self.assertEqual(["A1"], list(self.sut))
+        self.assertEqual(1, len(self.sut))
+        self.assertNotIn("B0", self.sut)
+
+    def test_FairQueue_SetClass(self) -> None:
+        # Setup
+        self.sut.put("N", "Normal", 1)
+        self.sut.put("L0", "Low", 2)
+        self.sut.put("L1", "Low", 2)
+
+        # Exercise
+        self.sut.setClass("Low", 0)
+
+        # Verify
+        self.assertEqual(["L0", "L1", "N"],
+                         [self.sut.get() for i in range(3)])
+
+    def test_FairQueue_Full(self) -> None:
+        # Exercise
+        for i in range(10):
+            self.sut.put(i, i % 2, 1)
+
+        # Verify
+        self.assertTrue(self.sut.full())
+        self.sut.get()
+        self.assertFalse(self.sut.full())
+
+    def test_FairQueue_Head(self) -> None:
+        # Setup
+        for i in range(3):
+            self.sut.put("A" + str(i), "A", 1)
+        self.sut.put("B0", "B", 1)
+        self.sut.put("U0", "U", 0)
+
+        # Exercise and Verify
+        self.assertEqual(["U0", "A0", "B0", "A1"], self.sut.head(4))
+        self.assertEqual(5, len(self.sut.head(10)))
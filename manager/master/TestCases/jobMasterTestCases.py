@@ -20,6 +20,8 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import os
+import asyncio
 import shutil
 import unittest
 import typing
@@ -30,7 +32,7 @@ from manager.master.job import Job
 from manager.master.jobMaster import JobMaster, task_prefix_trim, \
     JobMasterMsgSrc
 from manager.basic.endpoint import Endpoint
-from manager.models import Jobs, JobHistory, TaskHistory
+from manager.models import Jobs, JobInfos, JobHistory, TaskHistory
 from asgiref.sync import sync_to_async
 from channels.db import database_sync_to_async
 from manager.master.jobMaster import command_var_replace, \
@@ -39,6 +41,10 @@ from manager.master.build import Build
 from manager.basic.mmanager import MManager
 from manager.master.TestCases.misc.stubs import StorageStub
 from manager.master.persistentDB import PersistentDB
+from manager.master.dispatcher import Dispatcher
+from manager.master.resultCache import ResultCache
+from manager.master.misc import job_result_url
+from manager.basic.storage import Storage, StoChooser
 
 
 class DispatcherFake(Endpoint):
@@ -47,9 +53,13 @@ class DispatcherFake(Endpoint):
         Endpoint.__init__(self)
         self.tasks = []  # type: typing.List[Task]
 
-    async def handle(self, msg: typing.Tuple[str, Task]) -> None:
-        cmd, task = msg
-        self.tasks.append(task)
+    async def handle(self, msg: typing.Tuple[int, typing.Any]) -> None:
+        cmd, content = msg
+
+        if cmd == Dispatcher.ENDPOINT_DISPATCH_BATCH:
+            self.tasks += content
+        else:
+            self.tasks.append(content)
 
     async def fin(self) -> None:
         """
@@ -115,6 +125,23 @@ class JobMasterTestCases(unittest.IsolatedAsyncioTestCase):
         job = await sync_to_async(Jobs.objects.filter)(jobid="JobMasterTest1")
         await sync_to_async(job.delete)()  # type: ignore
 
+    async def test_JobMaster_BindBuild(self) -> None:
+        """
+        Bind a job with a Job command that is a Build, the job
+        contain a task that refer to the job.
+        """
+        # Setup
+        job = Job("JobMasterTest2", "GL5610",
+                  {"sn": "123456", "vsn": "123456"})
+
+        # Exercise
+        await self.sut.bind(job)
+
+        # Verify
+        tasks = job.tasks()
+        self.assertEqual(1, len(tasks))
+        self.assertIs(job, tasks[0].job)
+
     async def test_JobMaster_DoJob(self) -> None:
         """
         Assign a job to JobMaster, JobMaster should bind
@@ -178,6 +205,161 @@ class JobMasterTestCases(unittest.IsolatedAsyncioTestCase):
             taskhistory.delete
         )()
 
+    async def test_JobMaster_ReuseResult(self) -> None:
+        """
+        A job with the same recipe of a finished job is
+        finished by result of the finished job.
+        """
+        # Setup
+        storage = Storage("./StorageTest", None)
+        config.mmanager.addModule(storage)
+        cache = ResultCache()
+        self.sut.set_result_cache(cache)
+
+        fake = DispatcherFake()
+        self.sut.set_peer(fake)
+
+        first = Job("Reuse", "GL8900", {"sn": "123456", "vsn": "123456"})
+        await self.sut.do_job(first)
+
+        uid = str(first.unique_id)
+        chooser = typing.cast(StoChooser, storage.create(uid, "Result"))
+        chooser.store(b"Result")
+        chooser.close()
+        first.job_result = job_result_url(uid, chooser.path())
+        await fake.fin()
+
+        # Exercise
+        fake.tasks = []
+        second = Job("Reuse", "GL8900", {"sn": "123456", "vsn": "123456"})
+        await self.sut.do_job(second)
+
+        # Verify
+        self.assertEqual([], fake.tasks)
+        self.assertTrue(second.is_fin())
+
+        # Entry still point to the result of first job.
+        self.assertEqual(1, len(cache))
+        self.assertEqual([uid], [e[1] for e in cache._entries.values()])
+        self.assertTrue(os.path.samefile(
+            chooser.path(), "./StorageTest/" + str(second.unique_id) +
+            "/Result"))
+
+        # Exercise
+        # A rebuild job is dispatched.
+        third = Job("Reuse", "GL8900", {"sn": "123456", "vsn": "123456",
+                                         "rebuild": "true"})
+        await self.sut.do_job(third)
+
+        # Verify
+        self.assertEqual(5, len(fake.tasks))
+
+        # Exercise
+        # Version is recreated with another revision.
+        fourth = Job("Reuse", "GL8900", {"sn": "654321", "vsn": "123456"})
+        await self.sut.do_job(fourth)
+
+        # Verify
+        self.assertEqual(10, len(fake.tasks))
+
+        # Teardown
+        shutil.rmtree("./StorageTest")
+        for job in [first, second, third, fourth]:
+            for model in [Jobs, JobHistory]:
+                rows = await database_sync_to_async(model.objects.filter)(
+                    unique_id=job.unique_id)
+                await database_sync_to_async(rows.delete)()
+
+    async def test_JobMaster_Recover(self) -> None:
+        """
+        Jobs that not done in previous boot are rebuilt from
+        database, a job that unable to be recovered is removed.
+        """
+        # Setup
+        fake = DispatcherFake()
+        self.sut.set_peer(fake)
+
+        job = Job("Recover", "GL8900", {"sn": "123456", "vsn": "123456",
+                                         "priority": "urgent"})
+        await self.sut.do_job(job)
+        uid = str(job.unique_id)
+
+        broken = await database_sync_to_async(
+            Jobs.objects.create  # type: ignore
+        )(unique_id=0, jobid="Broken", cmdid="NotExists")
+
+        # Exercise
+        # Master is restarted.
+        sut = JobMaster()
+        recovered = DispatcherFake()
+        sut.set_peer(recovered)
+        await sut.recover()
+
+        # Verify
+        self.assertIn(uid, sut._jobs)
+        self.assertEqual(Job.PRIORITY_URGENT, sut._jobs[uid].getPriority())
+        self.assertEqual(
+            sorted([t.id() for t in job.tasks()]),
+            sorted([t.id() for t in recovered.tasks
+                    if t.id().startswith(uid + "_")]))
+
+        self.assertNotIn(str(broken.unique_id), sut._jobs)
+        self.assertFalse(await database_sync_to_async(
+            Jobs.objects.filter(unique_id=0).exists)())  # type: ignore
+
+        # Teardown
+        for model in [Jobs, JobHistory]:
+            rows = await database_sync_to_async(model.objects.filter)(
+                unique_id=job.unique_id)
+            await database_sync_to_async(rows.delete)()
+
+    async def test_JobMaster_SetPriority(self) -> None:
+        # Setup
+        fake = DispatcherFake()
+        self.sut.set_peer(fake)
+
+        job = Job("Priority", "GL8900", {"sn": "123456", "vsn": "123456"})
+        await self.sut.do_job(job)
+
+        # Exercise
+        await self.sut.set_priority(str(job.unique_id), Job.PRIORITY_LOW)
+
+        # Verify
+        self.assertEqual(Job.PRIORITY_LOW, job.getPriority())
+        self.assertEqual((job, Job.PRIORITY_LOW), fake.tasks[-1])
+
+        info = await database_sync_to_async(
+            JobInfos.objects.get  # type: ignore
+        )(jobs=job.unique_id, info_key='priority')
+        self.assertEqual("low", info.info_value)
+
+        # Teardown
+        for model in [Jobs, JobHistory]:
+            rows = await database_sync_to_async(model.objects.filter)(
+                unique_id=job.unique_id)
+            await database_sync_to_async(rows.delete)()
+
+    async def test_JobMaster_InvalidateResults(self) -> None:
+        # Setup
+        cache = ResultCache()
+        cache.put("R1", "123456", "1", "Result")
+        cache.put("R2", "654321", "2", "Result")
+        self.sut.set_result_cache(cache)
+
+        # Exercise
+        self.sut.invalidate_results("123456")
+        await asyncio.sleep(0)
+
+        # Verify
+        self.assertEqual(["R2"], list(cache._entries.keys()))
+
+        # Exercise
+        self.sut.invalidate_results()
+        await asyncio.sleep(0)
+
+        # Verify
+        self.assertEqual(0, len(cache))
+
     async def test_JobMaster_GenMsg(self) -> None:
         """
         Try query message from JobMaster.
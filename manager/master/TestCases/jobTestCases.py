@@ -70,3 +70,18 @@ class JobTestCases(unittest.IsolatedAsyncioTestCase):
         self.assertIsNotNone(job_)
         self.assertTrue(len(job_.tasks_record) > 0)  # type: ignore
         self.assertEqual({"ID1": "PREPARE", "ID2": "PREPARE"}, job_.tasks_record)
+
+    async def test_Job_Priority(self) -> None:
+        # Setup
+        job = Job("JobId", "JobCmd", {"priority": "low"})
+        self.assertEqual(Job.PRIORITY_LOW, job.getPriority())
+        self.assertEqual(Job.PRIORITY_NORMAL,
+                         Job("JobId", "JobCmd", {}).getPriority())
+
+        # Exercise
+        job.setPriority(Job.PRIORITY_URGENT)
+
+        # Verify
+        self.assertEqual(Job.PRIORITY_URGENT, job.getPriority())
+        self.assertEqual("urgent", job.get_info("priority"))
+        self.assertRaises(ValueError, job.setPriority, 10)
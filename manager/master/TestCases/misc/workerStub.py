@@ -25,6 +25,7 @@ import typing
 
 from manager.master.worker import Worker
 from manager.master.task import Task, SingleTask, PostTask
+from manager.basic.letter import Letter
 from manager.basic.stubs.workerStup import \
     StreamReaderDummy, StreamWriterDummy
 
@@ -39,7 +40,7 @@ class WorkerStub(Worker):
         self.singleCount = 0
         self.cancel_jobs = []  # type: typing.List[str]
 
-    async def do(self, task: Task) -> None:
+    def assign(self, task: Task) -> Letter:
         self.in_doing_task = task
 
         if isinstance(task, SingleTask):
@@ -52,6 +53,14 @@ class WorkerStub(Worker):
         except Exception as e:
             print(e)
 
+        self._changed()
+
+        # Nothing is sent.
+        return typing.cast(Letter, None)
+
+    async def _send(self, letter: Letter) -> None:
+        return None
+
     async def cancel(self, id: str) -> None:
         self.cancel_jobs.append(id)
 
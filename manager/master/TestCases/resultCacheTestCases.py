@@ -0,0 +1,100 @@
+# MIT License
+#
+# Copyright (c) 2020 Gcom
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import os
+import time
+import unittest
+
+from manager.master.build import Build
+from manager.master.resultCache import ResultCache
+
+
+def build(ident: str, cmd: str) -> Build:
+    return Build(ident, {'cmd': [cmd], 'output': ["./" + ident]})
+
+
+class ResultCacheTestCases(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.sut = ResultCache("./ResultCache", maxEntries=2)
+
+    def tearDown(self) -> None:
+        if os.path.exists("./ResultCache"):
+            os.remove("./ResultCache")
+
+    def test_ResultCache_Recipe(self) -> None:
+        r = ResultCache.recipe("V1", [build("B", "make")])
+
+        # Verify
+        self.assertEqual(r, ResultCache.recipe("V1", [build("B", "make")]))
+        self.assertNotEqual(r, ResultCache.recipe("V2", [build("B", "make")]))
+        self.assertNotEqual(r, ResultCache.recipe("V1", [build("B", "cc")]))
+        self.assertNotEqual(r, ResultCache.recipe("V1", [build("C", "make")]))
+
+    def test_ResultCache_Evict(self) -> None:
+        # Exercise
+        self.sut.put("R1", "V1", "1", "F1")
+        self.sut.put("R2", "V1", "2", "F2")
+        self.sut.get("R1")
+        self.sut.put("R3", "V2", "3", "F3")
+
+        # Verify
+        # R2 is the least recently used.
+        self.assertEqual(("1", "F1"), self.sut.get("R1"))
+        self.assertIsNone(self.sut.get("R2"))
+        self.assertEqual(("3", "F3"), self.sut.get("R3"))
+
+        # Index is kept.
+        cache = ResultCache("./ResultCache", maxEntries=2)
+        self.assertEqual(("1", "F1"), cache.get("R1"))
+        self.assertEqual(2, len(cache))
+
+    def test_ResultCache_Age(self) -> None:
+        sut = ResultCache(maxAge=10)
+        sut.put("R1", "V1", "1", "F1")
+
+        # Exercise
+        sut._entries["R1"] = ("V1", "1", "F1", time.time() - 11)
+
+        # Verify
+        self.assertIsNone(sut.get("R1"))
+        self.assertNotIn("R1", sut)
+
+    def test_ResultCache_Invalidate(self) -> None:
+        self.sut.put("R1", "V1", "1", "F1")
+        self.sut.put("R2", "V2", "2", "F2")
+
+        # Exercise
+        self.sut.invalidateRevision("V1")
+
+        # Verify
+        self.assertNotIn("R1", self.sut)
+        self.assertIn("R2", self.sut)
+
+        # Exercise
+        self.sut.clear()
+
+        # Verify
+        self.assertEqual(0, len(self.sut))
+        self.assertEqual(0, len(ResultCache("./ResultCache")))
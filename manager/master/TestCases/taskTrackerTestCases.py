@@ -26,7 +26,8 @@ import unittest
 from concurrent.futures import ProcessPoolExecutor
 from manager.master.taskTracker import TaskTracker
 from manager.master.worker import Worker
-from manager.master.task import Task
+from manager.master.task import Task, SingleTask
+from manager.master.build import Build
 
 
 class TaskTrackerTestCases(unittest.IsolatedAsyncioTestCase):
@@ -62,3 +63,40 @@ class TaskTrackerTestCases(unittest.IsolatedAsyncioTestCase):
 
         # Verify
         self.assertEqual(worker, self.sut.whichWorker("T"))
+
+    async def test_TaskTracker_Settle(self) -> None:
+        # Setup
+        task = SingleTask("T", "R", "V", Build("B", {"cmd": [], "output": []}))
+        copy = task.speculate()
+        self.sut.track(task)
+        self.sut.trackCopy(copy)
+
+        # Exercise and Verify
+        self.assertEqual("T", self.sut.originOf("T~1"))
+        self.assertTrue(self.sut.isSpeculated("T"))
+
+        # First result wins.
+        self.assertTrue(self.sut.settle("T~1", Task.STATE_FINISHED))
+        self.assertFalse(self.sut.settle("T", Task.STATE_FINISHED))
+        self.assertEqual("T~1", self.sut.winnerOf("T"))
+
+        # Copies are untracked with the task.
+        self.sut.untrack("T")
+        self.assertFalse(self.sut.isInTrack("T~1"))
+        self.assertFalse(self.sut.isSpeculated("T"))
+
+    async def test_TaskTracker_Settle_Failure(self) -> None:
+        # Setup
+        task = SingleTask("T", "R", "V", Build("B", {"cmd": [], "output": []}))
+        self.sut.track(task)
+        self.sut.trackCopy(task.speculate())
+        self.sut.trackCopy(task.speculate())
+
+        # Exercise and Verify
+        self.assertFalse(self.sut.settle("T~1", Task.STATE_FAILURE))
+        self.sut.untrack("T~1")
+        self.assertFalse(self.sut.settle("T", Task.STATE_FAILURE))
+
+        # Failure is taken while all of them fail.
+        self.assertTrue(self.sut.settle("T~2", Task.STATE_FAILURE))
+        self.assertEqual(["T", "T~2"], self.sut.family("T"))
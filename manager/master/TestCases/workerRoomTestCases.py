@@ -12,6 +12,9 @@ from manager.basic.info import Info
 from manager.basic.observer import Subject
 from manager.basic.stubs.virtualMachine import VirtualMachine
 from manager.basic.observer import Observer
+from manager.master.task import SingleTask
+from manager.master.build import Build
+from manager.master.TestCases.misc.workerStub import WorkerStub
 
 
 class sInst:
@@ -31,6 +34,22 @@ class VirtualWorker(VirtualMachine):
         await sending(w, propLetter)
 
 
+class VirtualWorker_WideFrame(VirtualMachine):
+
+    async def run(self) -> None:
+        r, w = await asyncio.open_connection(self._host, self._port)
+
+        self.r = r
+        self.w = w
+
+        propLetter = PropLetter(self._ident, "1", "0", "Merger",
+                                frame=Letter.FRAME_V2)
+        await sending(w, propLetter)
+
+        # Master should reply the framing to use.
+        self.buff.append(await receving(r, timeout=3))
+
+
 class WaitMessgComp(Observer):
 
     def __init__(self) -> None:
@@ -125,6 +144,27 @@ class WorkerRoomTestCases(unittest.IsolatedAsyncioTestCase):
         self.assertTrue(self.wr.isExists("w1"))
         self.assertTrue(self.wr.isExists("w2"))
 
+    async def test_WorkerRoom_FrameNegotiate(self) -> None:
+        # Setup
+        v_wr = VirtualWorker_WideFrame("w1", "127.0.0.1", 30002)
+
+        # Exercise
+        self.wr.start()
+        await asyncio.sleep(0.1)
+
+        v_wr.start()
+        self.v_wr2.start()
+        await asyncio.sleep(1)
+
+        # Verify
+        reply = v_wr.buff[0]
+        self.assertTrue(isinstance(reply, PropLetter))
+        self.assertEqual(Letter.FRAME_V2, reply.getFrame())
+        self.assertEqual(Letter.FRAME_V2,
+                         self.wr.getWorker("w1").getFrame())
+        self.assertEqual(Letter.FRAME_V1,
+                         self.wr.getWorker("w2").getFrame())
+
     def test_WorkerRoom_lisAddrUpdate(self) -> None:
         pass
 
@@ -158,3 +198,69 @@ class WorkerRoomTestCases(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(comp.conn_msg_count, 2)
         self.assertEqual(comp.wait_msg_count, 2)
         self.assertEqual(comp.remove_msg_count, 2)
+
+    async def test_WorkerRoom_Index(self) -> None:
+        # Setup
+        workers = []
+        for i in range(3):
+            w = WorkerStub("N" + str(i), Worker.ROLE_NORMAL)
+            w.setState(Worker.STATE_ONLINE)
+            w.setMax(2)
+            self.wr.addWorker(w)
+            workers.append(w)
+
+        big = WorkerStub("Big", Worker.ROLE_NORMAL)
+        big.setState(Worker.STATE_ONLINE)
+        big.setMax(4)
+        self.wr.addWorker(big)
+
+        m = WorkerStub("M", Worker.ROLE_MERGER)
+        m.setState(Worker.STATE_ONLINE)
+        self.wr.addWorker(m)
+
+        def task(i: int) -> SingleTask:
+            return SingleTask("S" + str(i), "SN", "REV",
+                              Build("B", {"cmd": "...", "output": "..."}))
+
+        # Exercise
+        placed = []
+        for i in range(10):
+            w = self.wr.leastLoadedWorker()
+            assert(w is not None)
+            await w.do(task(i))
+            placed.append(w.getIdent())
+
+        # Verify
+        # Placed by load rather than number of tasks.
+        self.assertEqual(4, placed.count("Big"))
+        self.assertEqual(None, self.wr.leastLoadedWorker())
+        self.assertEqual([m], self.wr.getMergers())
+
+        # Index is updated while task is removed and worker
+        # is offline.
+        for t in big.inProcTasks():
+            big.removeTask(t.id())
+        workers[0].removeTask(workers[0].inProcTasks()[0].id())
+        self.assertIs(big, self.wr.leastLoadedWorker())
+
+        big.setState(Worker.STATE_OFFLINE)
+        m.setState(Worker.STATE_OFFLINE)
+        self.assertIs(workers[0], self.wr.leastLoadedWorker())
+        self.assertEqual([], self.wr.getMergers())
+
+        self.wr.removeWorker("N0")
+        self.assertEqual(None, self.wr.leastLoadedWorker())
+
+    async def test_WorkerRoom_Index_Unnotified(self) -> None:
+        """
+        A worker changed without notify is not returned
+        while it's unable to accept.
+        """
+        w = WorkerStub("N", Worker.ROLE_NORMAL)
+        w.setState(Worker.STATE_ONLINE)
+        w.setMax(1)
+        self.wr.addWorker(w)
+
+        w.max = 0
+
+        self.assertEqual(None, self.wr.leastLoadedWorker())
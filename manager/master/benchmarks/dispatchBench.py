@@ -0,0 +1,256 @@
+# MIT License
+#
+# Copyright (c) 2020 Gcom
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+# dispatchBench.py
+#
+# Benchmark of placement of tasks by Dispatcher while tasks
+# are more than workers are able to accept.
+#
+# Usage: python -m manager.master.benchmarks.dispatchBench [--json] [--quick]
+#
+# Each record is:
+#   {"workers": ..., "backlog": ..., "service": ..., "seconds": ...,
+#    "tasks_per_sec": ..., "wait_p50": ..., "wait_p99": ...,
+#    "idle_p99": ...}
+# service is seconds a worker spend on a task, wait_* is seconds
+# from dispatch() of a task to it is placed and idle_p99 is seconds
+# from a worker is able to accept to next task is placed to it.
+#
+# Selection records compare a scan of all workers by viaOverhead
+# with the index of WorkerRoom:
+#   {"workers": ..., "scan_us": ..., "index_us": ...}
+
+import sys
+import json
+import asyncio
+import argparse
+import timeit
+
+from typing import Any, Dict, List, Optional, cast
+from manager.master.dispatcher import Dispatcher, viaOverhead
+from manager.master.workerRoom import WorkerRoom
+from manager.master.taskTracker import TaskTracker
+from manager.master.worker import Worker
+from manager.master.task import Task, SingleTask
+from manager.master.build import Build
+from manager.basic.letter import Letter
+
+
+Record = Dict[str, Any]
+
+
+class _Configs:
+
+    def getConfig(self, *keys: str) -> Any:
+        return ""
+
+
+class _Inst:
+
+    def getModule(self, name: str) -> Any:
+        return _Configs()
+
+
+class BenchWorker(Worker):
+    """
+    Worker that finish a task after service seconds.
+    """
+
+    def __init__(self, ident: str, service: float,
+                 placed: Dict[str, float], idle: List[float]) -> None:
+        # Nothing is sent to a BenchWorker.
+        Worker.__init__(self, ident,
+                        cast(asyncio.StreamReader, None),
+                        cast(asyncio.StreamWriter, None),
+                        Worker.ROLE_NORMAL)
+        self.setState(Worker.STATE_ONLINE)
+        self.setMax(1)
+
+        self._service = service
+        self._placed = placed
+        self._idle = idle
+        self._freeAt = None  # type: Optional[float]
+
+    def assign(self, task: Task) -> Letter:
+        now = timeit.default_timer()
+
+        self._placed[task.id()] = now
+        if self._freeAt is not None:
+            self._idle.append(now - self._freeAt)
+
+        task.toProcState()
+        self.inProcTask.newTask(task)
+        self._changed()
+
+        asyncio.get_running_loop().call_later(
+            self._service, self._done, task.id())
+
+        return cast(Letter, None)
+
+    async def _send(self, letter: Letter) -> None:
+        return None
+
+    def _done(self, tid: str) -> None:
+        self._freeAt = timeit.default_timer()
+        self.removeTask(tid)
+
+
+def percentile(values: List[float], p: float) -> float:
+    if values == []:
+        return 0.0
+
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+
+async def _placement(workers: int, backlog: int, service: float) -> Record:
+    wr = WorkerRoom("127.0.0.1", 0, _Inst())
+    tracker = TaskTracker()
+
+    dispatcher = Dispatcher()
+    dispatcher.setWorkerRoom(wr)
+    dispatcher.setTaskTracker(tracker)
+    dispatcher.add_worker_search_cond(SingleTask, viaOverhead)
+
+    # Dispatcher log to nobody.
+    dispatcher.removeType(Dispatcher.NOTIFY_LOG)
+
+    placed = {}  # type: Dict[str, float]
+    idle = []  # type: List[float]
+
+    for i in range(workers):
+        wr.addWorker(BenchWorker("W" + str(i), service, placed, idle))
+
+    await dispatcher.run()
+
+    build = Build("GL5610", {"cmd": ["make"], "output": ["out"]})
+    tasks = [SingleTask("S" + str(i), "SN", "REV", build)
+             for i in range(backlog)]
+
+    begin = timeit.default_timer()
+    for t in tasks:
+        dispatcher.dispatch(t)
+
+    while len(placed) < backlog:
+        await asyncio.sleep(service / 10)
+    seconds = timeit.default_timer() - begin
+
+    waits = [placed[t.id()] - begin for t in tasks]
+
+    return {
+        "workers": workers,
+        "backlog": backlog,
+        "service": service,
+        "seconds": seconds,
+        "tasks_per_sec": backlog / seconds,
+        "wait_p50": percentile(waits, 0.5),
+        "wait_p99": percentile(waits, 0.99),
+        "idle_p99": percentile(idle, 0.99)
+    }
+
+
+def bench_placement(quick: bool = False) -> List[Record]:
+    """
+    Place backlogs onto workers that are busy.
+    """
+    records = []  # type: List[Record]
+
+    cases = [(4, 128, 0.01), (16, 140, 0.01), (64, 190, 0.01),
+             (4, 128, 0.1), (4, 2000, 0.01)]
+    if quick:
+        cases = [(4, 40, 0.01)]
+
+    for workers, backlog, service in cases:
+        records.append(asyncio.run(_placement(workers, backlog, service)))
+
+    return records
+
+
+def bench_selection(number: int = 2000) -> List[Record]:
+    """
+    Microseconds to select a worker for a SingleTask.
+    """
+    records = []  # type: List[Record]
+
+    for workers in [10, 100, 1000]:
+        wr = WorkerRoom("127.0.0.1", 0, _Inst())
+        for i in range(workers):
+            w = BenchWorker("W" + str(i), 0, {}, [])
+            w.setMax(4)
+            wr.addWorker(w)
+
+        scan = timeit.timeit(
+            lambda: wr.getWorkerWithCond_nosync(viaOverhead),
+            number=number)
+        index = timeit.timeit(wr.leastLoadedWorker, number=number)
+
+        records.append({
+            "workers": workers,
+            "scan_us": scan / number * 1000000,
+            "index_us": index / number * 1000000
+        })
+
+    return records
+
+
+def print_records(records: List[Record]) -> None:
+    print("%8s %8s %8s %10s %10s %10s %10s %10s" % (
+        "workers", "backlog", "service", "seconds", "tasks/s",
+        "wait p50", "wait p99", "idle p99"))
+
+    for r in records:
+        print("%8d %8d %8.3f %10.3f %10.1f %10.3f %10.3f %10.4f" % (
+            r["workers"], r["backlog"], r["service"], r["seconds"],
+            r["tasks_per_sec"], r["wait_p50"], r["wait_p99"],
+            r["idle_p99"]))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark of task placement")
+    parser.add_argument("--json", action="store_true",
+                        help="print records in json")
+    parser.add_argument("--quick", action="store_true",
+                        help="less tasks, for a smoke run")
+    args = parser.parse_args(argv)
+
+    records = bench_placement(args.quick)
+    selection = bench_selection(200 if args.quick else 2000)
+
+    if args.json:
+        json.dump(records + selection, sys.stdout, indent=1)
+        print()
+        return None
+
+    print_records(records)
+
+    print()
+    print("%8s %10s %10s" % ("workers", "scan us", "index us"))
+    for r in selection:
+        print("%8d %10.2f %10.2f" % (
+            r["workers"], r["scan_us"], r["index_us"]))
+
+
+if __name__ == '__main__':
+    main()
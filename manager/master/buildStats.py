@@ -0,0 +1,108 @@
+# MIT License
+#
+# Copyright (c) 2020 Gcom
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# buildStats.py
+#
+# Statistics of durations of builds on workers.
+
+from typing import Dict, Optional, Tuple
+
+
+class BuildStats:
+    """
+    Exponentially weighted moving averages of durations of builds.
+
+    A worker's speed is the ratio of seconds it spend on builds to
+    the usual seconds of these builds, 1.0 is a host of usual speed
+    and 0.5 is a host twice as fast. Duration of a build is kept
+    normalized by speed of hosts it run on, so a build is able to be
+    estimated on a worker that never run it.
+    """
+
+    ALPHA = 0.3
+
+    def __init__(self, alpha: float = ALPHA) -> None:
+        self._alpha = alpha
+
+        # (build ident, worker ident) -> seconds
+        self._pairs = {}  # type: Dict[Tuple[str, str], float]
+
+        # build ident -> seconds on a host of usual speed
+        self._builds = {}  # type: Dict[str, float]
+
+        # worker ident -> speed
+        self._speeds = {}  # type: Dict[str, float]
+
+    def _ewma(self, old: Optional[float], new: float) -> float:
+        if old is None:
+            return new
+        return self._alpha * new + (1 - self._alpha) * old
+
+    def record(self, build: str, worker: str, seconds: float) -> None:
+        """
+        Record a build is finished by a worker in seconds.
+        """
+        if seconds < 0:
+            return None
+
+        key = (build, worker)
+        self._pairs[key] = self._ewma(self._pairs.get(key), seconds)
+
+        usual = self._builds.get(build)
+        if usual is not None and usual > 0:
+            self._speeds[worker] = self._ewma(
+                self._speeds.get(worker, 1.0), seconds / usual)
+
+        self._builds[build] = self._ewma(
+            usual, seconds / self.speed(worker))
+
+    def speed(self, worker: str) -> float:
+        speed = self._speeds.get(worker, 1.0)
+        return speed if speed > 0 else 1.0
+
+    def usual(self, build: str) -> Optional[float]:
+        """
+        Seconds of a build on a host of usual speed, None
+        if the build is never recorded.
+        """
+        return self._builds.get(build)
+
+    def mean(self) -> Optional[float]:
+        if len(self._builds) == 0:
+            return None
+        return sum(self._builds.values()) / len(self._builds)
+
+    def expected(self, build: str, worker: str) -> Optional[float]:
+        """
+        Expected seconds of a build on a worker, None if
+        nothing is known about the build.
+        """
+        key = (build, worker)
+        if key in self._pairs:
+            return self._pairs[key]
+
+        usual = self._builds.get(build)
+        if usual is None:
+            return None
+
+        return usual * self.speed(worker)
@@ -20,12 +20,14 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import abc
+import time
 import asyncio
 
 from functools import reduce
 from typing import Any, List, Optional, Callable, \
-    Dict, Tuple, cast, Type
-from collections import namedtuple
+    Dict, Tuple, cast, Type, Union
+from collections import namedtuple, OrderedDict
 from threading import Condition
 from manager.basic.observer import Subject, Observer
 from manager.basic.mmanager import ModuleDaemon
@@ -34,20 +36,34 @@ from manager.basic.type import Error
 from manager.master.task import Task, SingleTask, PostTask
 from manager.master.taskTracker import TaskTracker
 from manager.master.workerRoom import WorkerRoom
+from manager.master.buildStats import BuildStats
+from manager.master.fairQueue import FairQueue
+from manager.master.job import Job
 from manager.basic.endpoint import Endpoint
+from manager.basic.letter import Letter
 
 
 M_NAME = "Dispatcher"
 
 WaitAreaSpec = namedtuple('WaitAreaSpec', ['task_type', 'pri', 'num'])
 
+# Tasks assigned to workers and letters of them to be sent.
+Plan = List[Tuple[Worker, Task, Letter]]
+
 
 class WaitArea:
+    """
+    Tasks that wait for workers. Each type of tasks is in a queue of
+    it's own and queues are ordered by priority of types. In a queue
+    tasks are ordered by priority of their jobs and are fair between
+    jobs of the same priority, see FairQueue.
 
-    class Area_unknown_task(Exception):
-        pass
+    Queues are unbounded so a backlog never block dispatching, num of
+    a WaitAreaSpec is the number of tasks at head of a queue that
+    are seen by placement policies (see all_of()).
+    """
 
-    class Area_Full(Exception):
+    class Area_unknown_task(Exception):
         pass
 
     class Area_Empty(Exception):
@@ -57,8 +73,9 @@ class WaitArea:
         self.ident = ident
 
         self._space = [
-            (t, asyncio.Queue(num), pri) for t, pri, num in specifics
-        ]  # type: List[Tuple[str, asyncio.Queue, int]]
+            (t, FairQueue(len(Job.PRIORITIES)), pri)
+            for t, pri, num in specifics
+        ]  # type: List[Tuple[str, FairQueue, int]]
 
         # Sort Queues by priority
         self._space.sort(key=lambda t: t[2])
@@ -66,32 +83,43 @@ class WaitArea:
         # For task append puerpose only.
         self._space_map = {t: queue for t, queue, _ in self._space}
 
+        # Number of tasks at head of each queue
+        self._window = {t: num for t, _, num in specifics}
+
         self._num_of_tasks = 0
         self._cond = asyncio.Condition()
         self._cond_no_async = Condition()
 
-    async def enqueue(self, t: Any, timeout=None) -> None:
-        try:
-            q = self._space_map[type(t).__name__]
-            await asyncio.wait_for(q.put(t), timeout=timeout)
+    @staticmethod
+    def _jobOf(t: Any) -> Tuple[Any, int]:
+        """
+        Group and class of a task in queue, task without job
+        is a group of it's own.
+        """
+        job = getattr(t, 'job', None)
+        if job is None:
+            return (t, Job.PRIORITY_NORMAL)
 
-            self._num_of_tasks += 1
+        return (job, getattr(job, 'priority', Job.PRIORITY_NORMAL))
 
+    def _queueOf(self, t: Any) -> FairQueue:
+        try:
+            return self._space_map[type(t).__name__]
         except KeyError:
             raise WaitArea.Area_unknown_task
-        except asyncio.exceptions.TimeoutError:
-            raise WaitArea.Area_Full
+
+    async def enqueue(self, t: Any, timeout=None) -> None:
+        self._put(self._queueOf(t), t)
 
     def enqueue_nowait(self, t: Any) -> None:
-        try:
-            q = self._space_map[type(t).__name__]
-            q.put_nowait(t)
-            self._num_of_tasks += 1
+        self._put(self._queueOf(t), t)
 
-        except KeyError:
-            raise WaitArea.Area_unknown_task
-        except asyncio.QueueFull:
-            raise WaitArea.Area_Full
+    def _put(self, q: FairQueue, t: Any) -> None:
+        group, cls = WaitArea._jobOf(t)
+
+        if t not in q:
+            q.put(t, group, cls)
+            self._num_of_tasks += 1
 
     async def dequeue(self, timeout=None) -> Any:
         async with self._cond:
@@ -119,40 +147,121 @@ class WaitArea:
 
     def _dequeue(self) -> Any:
         for _, q, _ in self._space:
+            if not q.empty():
+                return self._get(q)
 
-            try:
-                task = q.get_nowait()
-                self._num_of_tasks -= 1
-                return task
-
-            except asyncio.QueueEmpty:
-                pass
+    def _get(self, q: FairQueue) -> Any:
+        task = q.get()
+        self._num_of_tasks -= 1
+        return task
 
     def peek(self) -> Any:
         if self._num_of_tasks == 0:
             return None
 
         for _, q, _ in self._space:
-            if len(q._queue) > 0:  # type: ignore
-                return q._queue[0]  # type: ignore
-            else:
-                continue
+            if not q.empty():
+                return q.peek()
+
+    def types(self) -> List[str]:
+        """
+        Type of tasks of each queue in order of priority.
+        """
+        return [t for t, _, _ in self._space]
+
+    def peek_of(self, type_: str) -> Any:
+        """
+        Head of queue of a type of tasks.
+        """
+        try:
+            return self._space_map[type_].peek()
+        except KeyError:
+            raise WaitArea.Area_unknown_task
+
+    def dequeue_of_nowait(self, type_: str) -> Any:
+        try:
+            q = self._space_map[type_]
+        except KeyError:
+            raise WaitArea.Area_unknown_task
+
+        if q.empty():
+            raise WaitArea.Area_Empty()
+
+        return self._get(q)
+
+    def waiting(self, t: Any) -> bool:
+        """
+        Is there any task of the same type as t in WaitArea.
+        """
+        q = self._space_map.get(type(t).__name__)
+        return q is not None and not q.empty()
+
+    def all_of(self, type_: str) -> List[Any]:
+        """
+        Tasks at head of queue of a type in order of they are
+        dequeued, at most num of the type.
+        """
+        try:
+            return self._space_map[type_].head(self._window[type_])
+        except KeyError:
+            raise WaitArea.Area_unknown_task
+
+    def remove(self, t: Any) -> bool:
+        """
+        Remove a task from WaitArea in O(1).
+        """
+        q = self._space_map.get(type(t).__name__)
+
+        if q is None or not q.remove(t):
+            return False
+
+        self._num_of_tasks -= 1
+        return True
+
+    def setPriority(self, job: Any, priority: int) -> None:
+        """
+        Move queued tasks of a job into another priority class.
+        """
+        for _, q, _ in self._space:
+            q.setClass(job, priority)
 
     def all(self) -> List[Any]:
         all_content = []
 
         for _, q, _ in self._space:
-            all_content += list(q._queue)  # type: ignore
+            all_content += list(q)
 
         return all_content
 
 
+class PlacementPolicy(abc.ABC):
+    """
+    A search condition that choose a worker for a task rather than
+    filter workers. It's registered via add_worker_search_cond() as
+    filter functions.
+    """
+
+    @abc.abstractmethod
+    def select(self, task: Task, wr: WorkerRoom) -> Optional[Worker]:
+        """
+        Worker to process the task, None if no worker is able to.
+        """
+
+    def order(self, tasks: List[Task]) -> List[Task]:
+        """
+        Order in which tasks in WaitArea are placed.
+        """
+        return tasks
+
+
 class Dispatcher(ModuleDaemon, Subject, Observer, Endpoint):
 
     NOTIFY_LOG = "log"
 
     ENDPOINT_DISPATCH = 0
     ENDPOINT_CANCEL = 1
+    ENDPOINT_DISPATCH_BATCH = 2
+    ENDPOINT_PRIORITY = 3
 
     def __init__(self) -> None:
         global M_NAME
@@ -176,11 +285,28 @@ class Dispatcher(ModuleDaemon, Subject, Observer, Endpoint):
 
         # An Event to indicate that there is some task in taskWait queue
         self.taskEvent = asyncio.Event()
+
+        # Set while a task is enqueued or a worker is able to
+        # accept tasks, dispatching loop is wakeup to place tasks
+        # in WaitArea.
+        self._wakeup = asyncio.Event()
         self.dispatchLock = asyncio.Lock()
         self._taskTracker = None  # type: Optional[TaskTracker]
         self._workers = None  # type: Optional[WorkerRoom]
         self._loop = asyncio.get_running_loop()
-        self._search_cond = {}  # type: Dict[str, Callable]
+        self._search_cond = \
+            {}  # type: Dict[str, Union[Callable, PlacementPolicy]]
+
+        # Durations of builds, task id -> (worker, time it's started)
+        # of tasks in processing.
+        self._stats = BuildStats()
+        self._started = {}  # type: Dict[str, Tuple[str, float]]
+
+        # A SingleTask that run longer than _spec_factor times of
+        # it's expected duration is copied to an idle worker, it's
+        # checked every _spec_interval seconds. 0 to disable.
+        self._spec_factor = 0.0
+        self._spec_interval = 5.0
 
     async def begin(self) -> None:
         return None
@@ -190,6 +316,32 @@ class Dispatcher(ModuleDaemon, Subject, Observer, Endpoint):
 
     def setWorkerRoom(self, wr: WorkerRoom) -> None:
         self._workers = wr
+        wr.hook_install(self._worker_changed)
+
+    def _worker_changed(self, w: Worker) -> None:
+        if w.isOnline() and w.isAbleToAccept():
+            self.wakeup()
+
+    def buildStats(self) -> BuildStats:
+        return self._stats
+
+    def startedAt(self, taskid: str) -> Optional[float]:
+        """
+        Monotonic time that the task is started on it's worker,
+        None if the task is not started.
+        """
+        started = self._started.get(taskid)
+        return None if started is None else started[1]
+
+    def setSpeculation(self, factor: float, interval: float = 5.0) -> None:
+        self._spec_factor = factor
+        self._spec_interval = interval
+
+    def wakeup(self) -> None:
+        """
+        Let dispatching loop to place tasks in WaitArea.
+        """
+        self._wakeup.set()
 
     def setTaskTracker(self, tt: TaskTracker) -> None:
         self._taskTracker = tt
@@ -202,52 +354,89 @@ class Dispatcher(ModuleDaemon, Subject, Observer, Endpoint):
     #
     # return True if task is assign successful otherwise return False
     async def _dispatch(self, task: Task) -> bool:
-        return await self._do_dispatch(task)
+        plan = []  # type: Plan
+
+        if not self._place(task, plan):
+            return False
 
-    async def _do_dispatch(self, task: Task) -> bool:
+        await self._send_plan(plan)
+        return True
+
+    def _place(self, task: Task, plan: 'Plan') -> bool:
         """
-        First to find a acceptable worker
-        if found then assign task to the worker
-        and _tasks otherwise append to taskWait
+        First to find a acceptable worker if found then
+        assign task to the worker and append it into plan.
         """
         worker = self._search_proc_worker(task)
 
         # No workers satisfiy the condition.
         if worker is None:
-            await self._log("Task " + task.id() +
-                            " dispatch failed: No available worker")
             return False
 
+        return self._reserve(task, worker, plan)
+
+    def _reserve(self, task: Task, worker: Worker, plan: 'Plan') -> bool:
+        """
+        Assign a task to a worker, letter of the task is sent
+        later by _send_plan() so placement of a batch of tasks
+        not wait for any write.
+        """
         try:
-            await worker.do(task)
-            cast(TaskTracker, self._taskTracker).onWorker(task.id(), worker)
-            await self._log(
-                "Task " + task.id() + " dispatch to Worker("
-                + worker.ident + ")"
-            )
+            letter = worker.assign(task)
         except Exception:
-            await self._log(
-                "Task " + task.id() + " dispatch failed: Worker is\
-                unable to do the task.")
             return False
 
+        cast(TaskTracker, self._taskTracker).onWorker(task.id(), worker)
+        self._started[task.id()] = (worker.getIdent(), time.monotonic())
+        plan.append((worker, task, letter))
+
         return True
 
+    async def _send_plan(self, plan: 'Plan') -> None:
+        """
+        Send letters of a plan, letters to a worker are
+        queued together so they are write at once.
+        """
+        letters = {}  # type: Dict[str, Tuple[Worker, List[Letter]]]
+
+        for worker, task, letter in plan:
+            letters.setdefault(worker.getIdent(), (worker, []))[1]\
+                .append(letter)
+
+        await asyncio.gather(*[
+            w.sendLetters(ls) for w, ls in letters.values()
+        ])
+
+        for worker, task, _ in plan:
+            await self._log(
+                "Task " + task.id() + " dispatch to Worker("
+                + worker.ident + ")"
+            )
+
     def _search_proc_worker(self, task: Task) -> Optional[Worker]:
         idx = type(task).__name__
         if idx not in self._search_cond:
             return None
 
         cond = self._search_cond[idx]
-        workers = cast(WorkerRoom, self._workers)\
-            .getWorkerWithCond_nosync(cond)
+
+        if isinstance(cond, PlacementPolicy):
+            return cond.select(task, cast(WorkerRoom, self._workers))
+
+        # Conditions that WorkerRoom is able to answer via it's
+        # index without scan of all workers.
+        if cond in indexedConds:
+            workers = indexedConds[cond](cast(WorkerRoom, self._workers))
+        else:
+            workers = cast(WorkerRoom, self._workers)\
+                .getWorkerWithCond_nosync(cond)
         if workers == []:
             return None
         else:
             return workers[0]
 
     def add_worker_search_cond(self, task_type: Type[Task],
-                               cond: Callable) -> None:
+                               cond: Union[Callable, PlacementPolicy]) -> None:
         """
         Add a filter function to filter out wokrer that is able to
         process a type of tasks.
@@ -258,21 +447,63 @@ class Dispatcher(ModuleDaemon, Subject, Observer, Endpoint):
         t_typeName = task_type.__name__
         self._search_cond[t_typeName] = cond
 
+    def _order(self, tasks: List[Task]) -> List[Task]:
+        """
+        Order of a batch of tasks to be placed, by priority of
+        types in WaitArea and by policy within a type.
+        """
+        types = self._waitArea.types()
+        ordered = []  # type: List[Task]
+
+        for type_ in types:
+            of_type = [t for t in tasks if type(t).__name__ == type_]
+
+            cond = self._search_cond.get(type_)
+            if isinstance(cond, PlacementPolicy):
+                of_type = cond.order(of_type)
+
+            ordered += of_type
+
+        return ordered + [t for t in tasks if type(t).__name__ not in types]
+
     async def _dispatch_async(self, task: Task) -> bool:
         """
         Dispatch a task to workers.
         """
-        await self._log("Dispatch task " + task.id())
+        await self._dispatch_batch_async([task])
+        return True
+
+    async def _dispatch_batch_async(self, tasks: List[Task]) -> None:
+        """
+        Place a batch of tasks in one pass, tasks that no worker is
+        able to process are put into WaitArea.
+        """
+        plan = []  # type: Plan
+        waits = []  # type: List[Task]
 
         async with self.dispatchLock:
-            if await self._dispatch(task) is False:
-                # fixme: Queue may full while inserting
-                await self._waitArea.enqueue(task)
+            for task in self._order(tasks):
+                # Tasks already in WaitArea are placed by their
+                # priorities, a new task should not jump ahead
+                # of them.
+                if not self._waitArea.waiting(task) \
+                   and self._place(task, plan):
+                    continue
+
+                self._waitArea.enqueue_nowait(task)
+                waits.append(task)
+
+            if waits != []:
                 self.taskEvent.set()
+                self.wakeup()
 
-            return True
+        await self._send_plan(plan)
 
-    def dispatch(self, task: Task) -> None:
+        for task in waits:
+            await self._log("Task " + task.id() +
+                            " dispatch failed: No available worker")
+
+    def _track(self, task: Task) -> bool:
         # Task is already in process increase task's refs.
         if cast(TaskTracker, self._taskTracker).isInTrack(task.id()):
             task_exists = cast(TaskTracker, self._taskTracker)\
@@ -280,13 +511,27 @@ class Dispatcher(ModuleDaemon, Subject, Observer, Endpoint):
             assert(task_exists is not None)
             task_exists.refs += 1
 
-            return None
+            return False
 
         cast(TaskTracker, self._taskTracker).track(task)
+        return True
+
+    def dispatch(self, task: Task) -> None:
+        if not self._track(task):
+            return None
 
         # Dispatch task to workers
         self._loop.create_task(self._dispatch_async(task))
 
+    def dispatch_batch(self, tasks: List[Task]) -> None:
+        """
+        Dispatch tasks of a job together.
+        """
+        tasks = [t for t in tasks if self._track(t)]
+
+        if tasks != []:
+            self._loop.create_task(self._dispatch_batch_async(tasks))
+
     async def redispatch(self, task: Task) -> bool:
         taskId = task.id()
 
@@ -301,11 +546,7 @@ class Dispatcher(ModuleDaemon, Subject, Observer, Endpoint):
             cast(TaskTracker, self._taskTracker).untrack(task.id())
             return False
 
-        async with self.dispatchLock:
-            success = await self._do_dispatch(task)
-            if not success:
-                await self._waitArea.enqueue(task)
-                self.taskEvent.set()
+        await self._dispatch_batch_async([task])
 
         return True
 
@@ -315,49 +556,141 @@ class Dispatcher(ModuleDaemon, Subject, Observer, Endpoint):
         assert(cast(TaskTracker, self._taskTracker) is not None)
 
         self._loop.create_task(self._dispatching())
+        self._loop.create_task(self._speculating())
 
-    def _peek_trimUntrackTask(self, area: WaitArea) -> Any:
+    async def _speculating(self) -> None:
         while True:
-            task_peek = area.peek()
-            if task_peek is None:
-                return None
-            else:
-                ident = task_peek.id()
-                if not cast(TaskTracker, self._taskTracker).isInTrack(ident):
-                    # Drop untracked task
-                    area.dequeue_nowait()
+            await asyncio.sleep(self._spec_interval)
+
+            if self._spec_factor > 0:
+                await self._speculate()
+
+    async def _speculate(self) -> int:
+        """
+        Copy stragglers to idle workers, return number of
+        copies started.
+        """
+        tracker = cast(TaskTracker, self._taskTracker)
+        plan = []  # type: Plan
+
+        async with self.dispatchLock:
+            # Waiting tasks go first.
+            if self._waitArea.peek_of(SingleTask.__name__) is not None:
+                return 0
+
+            idle = [w for w in cast(WorkerRoom, self._workers)
+                    .getAcceptableWorkers() if w.isFree()]
+
+            for task, ident in self._stragglers():
+                workers = [w for w in idle if w.getIdent() != ident]
+                if workers == []:
                     continue
+
+                copy = task.speculate()
+                tracker.trackCopy(copy)
+
+                if self._reserve(copy, workers[0], plan):
+                    idle.remove(workers[0])
                 else:
-                    return task_peek
+                    tracker.untrack(copy.id())
+
+        await self._send_plan(plan)
+
+        return len(plan)
+
+    def _stragglers(self) -> List[Tuple[SingleTask, str]]:
+        """
+        SingleTasks that run much longer than their expected
+        durations on their workers.
+        """
+        tracker = cast(TaskTracker, self._taskTracker)
+        now = time.monotonic()
+        stragglers = []
+
+        for tid, (ident, begin) in self._started.items():
+            task = tracker.getTask(tid)
+
+            # A task is copied at most once.
+            if not isinstance(task, SingleTask) or \
+               tracker.isSpeculated(tid):
+                continue
+
+            expected = self._stats.expected(
+                task.getBuild().getIdent(), ident)
+
+            if expected is not None and \
+               now - begin > self._spec_factor * expected:
+                stragglers.append((task, ident))
+
+        return stragglers
 
     # Dispatcher thread that is respond to assign task
     # in queue which name is taskWait
     async def _dispatching(self) -> None:
 
         while True:
-            await asyncio.sleep(1)
+            await self._wakeup.wait()
+            self._wakeup.clear()
 
             if self.taskEvent.is_set():
-                task_peek = self._peek_trimUntrackTask(self._waitArea)
-                if task_peek is None:
-                    self.taskEvent.clear()
-                    continue
+                await self._drain()
 
-                # To check that is a worker available.
-                cond = condChooser[type(task_peek).__name__]
-                if cast(WorkerRoom, self._workers).\
-                   getWorkerWithCond(cond) == []:
+    async def _drain(self) -> int:
+        """
+        Dispatch tasks in WaitArea until it's empty or no worker
+        is able to process any of them. Return number of tasks
+        dispatched.
+
+        Tasks of a type are placed by the same condition, so each
+        queue is drained on it's own and a blocked head (e.g. a
+        PostTask while no merger is online) not block tasks of
+        other types behind it.
+        """
+        plan = []  # type: Plan
 
-                    continue
+        async with self.dispatchLock:
+            for type_ in self._waitArea.types():
+                self._drain_of(type_, plan)
 
-                # Dispatch task to worker
-                async with self.dispatchLock:
-                    current = self._waitArea.dequeue_nowait()
-                    success = await self._dispatch(current)
-                    if not success:
-                        await self._waitArea.enqueue(current)
-            else:
-                continue
+            if self._waitArea.peek() is None:
+                self.taskEvent.clear()
+
+        await self._send_plan(plan)
+
+        return len(plan)
+
+    def _drain_of(self, type_: str, plan: 'Plan') -> None:
+        cond = self._search_cond.get(type_)
+        if isinstance(cond, PlacementPolicy):
+            return self._drain_planned(type_, cond, plan)
+
+        while True:
+            task_peek = self._waitArea.peek_of(type_)
+            if task_peek is None:
+                break
+
+            # To check that is a worker available.
+            worker = self._search_proc_worker(task_peek)
+            if worker is None:
+                break
+
+            # Dispatch task to worker
+            current = self._waitArea.dequeue_of_nowait(type_)
+            if not self._reserve(current, worker, plan):
+                self._waitArea.enqueue_nowait(current)
+                break
+
+    def _drain_planned(self, type_: str, policy: PlacementPolicy,
+                       plan: 'Plan') -> None:
+        for t in policy.order(self._waitArea.all_of(type_)):
+            worker = policy.select(t, cast(WorkerRoom, self._workers))
+            if worker is None:
+                break
+
+            self._waitArea.remove(t)
+            if not self._reserve(t, worker, plan):
+                self._waitArea.enqueue_nowait(t)
+                break
 
     async def cancel(self, taskId: str) -> None:
         """
@@ -375,8 +708,17 @@ class Dispatcher(ModuleDaemon, Subject, Observer, Endpoint):
             await theWorker.cancel(task.id())
             await self._log("Cancel task " + task.id())
 
+        for copy in cast(TaskTracker, self._taskTracker).copiesOf(task.id()):
+            self._started.pop(copy.id(), None)
+
+            w = cast(TaskTracker, self._taskTracker).whichWorker(copy.id())
+            if w is not None and w.isOnline():
+                await w.cancel(copy.id())
+
         task.stateChange(Task.STATE_FAILURE)
+        self._waitArea.remove(task)
         cast(TaskTracker, self._taskTracker).untrack(task.id())
+        self._started.pop(task.id(), None)
         await self._log("Cancel task " + task.id())
 
     # Cancel all tasks processing on a worker
@@ -384,8 +726,20 @@ class Dispatcher(ModuleDaemon, Subject, Observer, Endpoint):
         pass
 
     def removeTask(self, taskId: str) -> None:
+        task = cast(TaskTracker, self._taskTracker).getTask(taskId)
+        if task is not None:
+            self._waitArea.remove(task)
+
         cast(TaskTracker, self._taskTracker).untrack(taskId)
 
+    def setPriority(self, job: Job, priority: int) -> None:
+        """
+        Change priority of a job, it's tasks that wait in
+        WaitArea are moved into the new priority class.
+        """
+        self._waitArea.setPriority(job, priority)
+        self.wakeup()
+
     def getTask(self, taskId: str) -> Optional[Task]:
         return cast(TaskTracker, self._taskTracker).getTask(taskId)
 
@@ -464,7 +818,11 @@ class Dispatcher(ModuleDaemon, Subject, Observer, Endpoint):
 
         for t in tasks:
 
-            if isinstance(t, SingleTask):
+            if isinstance(t, SingleTask) and t.origin is not None:
+                # A copy is not redispatched, the task it
+                # belong to is still in process.
+                self._drop(t.id())
+            elif isinstance(t, SingleTask):
                 # This task is not depend on another task
                 # just redispatch this task again.
                 await self.redispatch(t)
@@ -488,16 +846,91 @@ class Dispatcher(ModuleDaemon, Subject, Observer, Endpoint):
         assert(self._taskTracker is not None)
 
         taskid, state = data
+        tracker = cast(TaskTracker, self._taskTracker)
+        origin = tracker.originOf(taskid)
+
+        if state == Task.STATE_IN_PROC and taskid in self._started:
+            # Worker begin to process the task.
+            self._started[taskid] = (self._started[taskid][0],
+                                     time.monotonic())
 
         if state == Task.STATE_FINISHED or state == Task.STATE_FAILURE:
-            worker = cast(TaskTracker, self._taskTracker).whichWorker(taskid)
-            assert(worker is not None)
-            worker.removeTask(taskid)
+            if tracker.isSpeculated(taskid):
+                if tracker.winnerOf(taskid) != taskid:
+                    # Result of the copy is not taken.
+                    self._drop(taskid)
+                    return None
+
+                await self._settle(taskid, state)
+            else:
+                worker = tracker.whichWorker(taskid)
+                assert(worker is not None)
+
+                self._record(taskid, state)
+                worker.removeTask(taskid)
 
             # Untrack the task
-            self._taskTracker.untrack(taskid)
+            tracker.untrack(origin)
+
+        elif origin != taskid:
+            # Copies are not seen by peer.
+            return None
+
+        await self.peer_notify((origin, Task.STATE_STR_MAPPING[state]))
+
+    async def _settle(self, winner: str, state: int) -> None:
+        """
+        Result of winner is taken as result of the task it
+        belong to, others copies are canceled.
+        """
+        tracker = cast(TaskTracker, self._taskTracker)
+
+        for tid in tracker.family(winner):
+            worker = tracker.whichWorker(tid)
+            if worker is None:
+                continue
+
+            if tid == winner:
+                self._record(tid, state)
+                worker.removeTask(tid)
+                continue
+
+            self._started.pop(tid, None)
+
+            if worker.isOnline():
+                await worker.cancel(tid)
+                await self._log("Cancel copy " + tid + " on Worker(" +
+                                worker.getIdent() + ")")
+            else:
+                worker.removeTask(tid)
+
+    def _drop(self, taskid: str) -> None:
+        """
+        Drop a copy whose result is not taken.
+        """
+        tracker = cast(TaskTracker, self._taskTracker)
+
+        worker = tracker.whichWorker(taskid)
+        if worker is not None:
+            worker.removeTask(taskid)
+        self._started.pop(taskid, None)
+
+        if tracker.originOf(taskid) == taskid:
+            # The task is kept until one of it's copies is done.
+            tracker.onWorker(taskid, None)
+        else:
+            tracker.untrack(taskid)
+
+    def _record(self, taskid: str, state: int) -> None:
+        if taskid not in self._started:
+            return None
+
+        ident, begin = self._started.pop(taskid)
+        task = cast(TaskTracker, self._taskTracker).getTask(taskid)
 
-        await self.peer_notify((taskid, Task.STATE_STR_MAPPING[state]))
+        if state == Task.STATE_FINISHED and isinstance(task, SingleTask):
+            self._stats.record(task.getBuild().getIdent(), ident,
+                               time.monotonic() - begin)
 
     async def handle(self, data: Any) -> Any:
         cmd, content = data
@@ -508,6 +941,12 @@ class Dispatcher(ModuleDaemon, Subject, Observer, Endpoint):
         elif cmd == Dispatcher.ENDPOINT_CANCEL:
             # data :: Tuple[str, str]
             await self.cancel(content)
+        elif cmd == Dispatcher.ENDPOINT_DISPATCH_BATCH:
+            # data :: Tuple[str, List[Task]]
+            self.dispatch_batch(content)
+        elif cmd == Dispatcher.ENDPOINT_PRIORITY:
+            # data :: Tuple[str, Tuple[Job, int]]
+            self.setPriority(*content)
 
         return
 
@@ -529,7 +968,7 @@ def viaOverhead(workers: List[Worker]) -> List[Worker]:
         return []
 
     def f(acc, w):
-        return acc if acc.numOfTaskProc() <= w.numOfTaskProc() else w
+        return acc if WorkerRoom.load(acc) <= WorkerRoom.load(w) else w
     theWorker = reduce(f, normal_workers)
 
     return [theWorker]
@@ -552,7 +991,147 @@ def theListener(workers: List[Worker]) -> List[Worker]:
     ]
 
 
+class ExpectedFinish(PlacementPolicy):
+    """
+    Place a SingleTask to the worker on which it's expected to be
+    finished earliest according to durations in BuildStats. Longer
+    builds are placed first so they go to faster hosts. Builds that
+    never recorded are seen as mean of all builds and tie is broken
+    by load as viaOverhead.
+
+    Remaining work of tasks in processing on a worker share the
+    worker with the task so it's spread over slots of the worker
+    and added to the estimate, startedAt tell when a task is
+    started, without it tasks are seen as just started.
+    """
+
+    def __init__(self, stats: BuildStats,
+                 startedAt: Optional[Callable[[str], Optional[float]]] = None
+                 ) -> None:
+        self._stats = stats
+        self._startedAt = startedAt
+
+    def _ident(self, task: Task) -> str:
+        return cast(SingleTask, task).getBuild().getIdent()
+
+    def expected(self, task: Task, w: Worker) -> float:
+        seconds = self._stats.expected(self._ident(task), w.getIdent())
+
+        if seconds is None:
+            mean = self._stats.mean()
+            seconds = 0.0 if mean is None else \
+                mean * self._stats.speed(w.getIdent())
+
+        return seconds
+
+    def remaining(self, w: Worker) -> float:
+        """
+        Expected seconds of work of tasks in processing on the
+        worker per slot of the worker.
+        """
+        now = time.monotonic()
+        seconds = 0.0
+
+        for t in w.inProcTasks():
+            if not isinstance(t, SingleTask):
+                continue
+
+            left = self.expected(t, w)
+
+            begin = None if self._startedAt is None else \
+                self._startedAt(t.id())
+            if begin is not None:
+                left = max(0.0, left - (now - begin))
+
+            seconds += left
+
+        return seconds / max(w.maxNumOfTask(), 1)
+
+    def select(self, task: Task, wr: WorkerRoom) -> Optional[Worker]:
+        workers = wr.getAcceptableWorkers()
+        if workers == []:
+            return None
+
+        return min(workers, key=lambda w: (
+            self.expected(task, w) + self.remaining(w),
+            WorkerRoom.load(w)))
+
+    def order(self, tasks: List[Task]) -> List[Task]:
+        mean = self._stats.mean() or 0.0
+
+        def usual(t: Task) -> float:
+            seconds = self._stats.usual(self._ident(t))
+            return mean if seconds is None else seconds
+
+        return sorted(tasks, key=usual, reverse=True)
+
+
+class BuildAffinity(PlacementPolicy):
+    """
+    Place a SingleTask to a worker that recently processed the same
+    build, caches of toolchain of the build are still hot on it.
+    Fall back to the least loaded worker while all of them are not
+    able to accept.
+    """
+
+    # Number of workers that remembered for each build.
+    WORKERS_PER_BUILD = 4
+
+    def __init__(self, workersPerBuild: int = WORKERS_PER_BUILD) -> None:
+        self._workersPerBuild = workersPerBuild
+
+        # build ident -> idents of workers, most recent at last.
+        self._recent = {}  # type: Dict[str, OrderedDict]
+
+    def warmWorkers(self, build: str) -> List[str]:
+        """
+        Workers that recently processed the build, most recent first.
+        """
+        if build not in self._recent:
+            return []
+        return list(reversed(self._recent[build]))
+
+    def remember(self, build: str, worker: str) -> None:
+        recent = self._recent.setdefault(build, OrderedDict())
+        recent[worker] = None
+        recent.move_to_end(worker)
+
+        while len(recent) > self._workersPerBuild:
+            recent.popitem(last=False)
+
+    def select(self, task: Task, wr: WorkerRoom) -> Optional[Worker]:
+        build = cast(SingleTask, task).getBuild().getIdent()
+
+        worker = None  # type: Optional[Worker]
+        for ident in self.warmWorkers(build):
+            w = wr.getWorker(ident)
+            if w is not None and not w.isMerger() and \
+               w.isOnline() and w.isAbleToAccept():
+
+                worker = w
+                break
+
+        if worker is None:
+            worker = wr.leastLoadedWorker()
+
+        if worker is not None:
+            self.remember(build, worker.getIdent())
+
+        return worker
+
+
 condChooser = {
     'SingleTask': viaOverhead,
     'PostTask': theListener
 }
+
+
+def _viaIndex(wr: WorkerRoom) -> List[Worker]:
+    w = wr.leastLoadedWorker()
+    return [] if w is None else [w]
+
+
+indexedConds = {
+    viaOverhead: _viaIndex,
+    theListener: WorkerRoom.getMergers
+}  # type: Dict[Callable, Callable[[WorkerRoom], List[Worker]]]
@@ -51,11 +51,14 @@ from manager.basic.storage import StoChooser
 from manager.master.logger import Logger, M_NAME as LOGGER_M_NAME
 
 from manager.master.workerRoom import WorkerRoom, M_NAME as WR_M_NAME
+from manager.master.taskTracker import TaskTracker, \
+    M_NAME as TRACKER_M_NAME
 
 from manager.basic.storage import M_NAME as STORAGE_M_NAME
-from manager.basic.util import pathSeperator
+from manager.basic.util import pathSeperator, speculation_tag
 from manager.basic.notify import Notify, WSCNotify
-from manager.basic.dataLink import DataLink, DataLinkNotify
+from manager.basic.dataLink import DataLink, DataLinkNotify, RawFile
+from manager.basic.ingest import IngestEngine
 from manager.master.persistentDB import PersistentDB, TAIL
 from manager.master.postProc import PostProc
 from manager.master.misc import General_PostProc
@@ -68,6 +71,7 @@ class EVENT_HANDLER_TOOLS:
 
     ProcessPool = concurrent.futures.ProcessPoolExecutor()
     chooserSet = {}  # type: Dict[str, StoChooser]
+    ingest = None  # type: Optional[IngestEngine]
     transfer_finished = {}  # type: Dict[str, path]
 
     PREPARE_ACTIONS = []  # type: List[ActionInfo]
@@ -214,6 +218,28 @@ async def responseHandler(
     if task is None or not Task.isValidState(state):
         return None
 
+    tracker = env.modules.getModule(TRACKER_M_NAME)  # type: TaskTracker
+
+    if state in [Task.STATE_FINISHED, Task.STATE_FAILURE] and \
+       tracker is not None and tracker.isSpeculated(taskId):
+
+        # A task and it's copies are run at the same time, result
+        # of the first done is the result of the task.
+        if not tracker.settle(taskId, state):
+            type = env.eventListener.NOTIFY_TASK_STATE_CHANGED
+            await env.eventListener.notify(type, (taskId, state))
+            return None
+
+        origin = tracker.getTask(tracker.originOf(taskId))
+        if origin is None:
+            return None
+
+        transfered = EVENT_HANDLER_TOOLS.transfer_finished
+        if taskId in transfered:
+            transfered[origin.id()] = transfered.pop(taskId)
+
+        task = origin
+
     if task.stateChange(state) is Error:
         return None
 
@@ -317,36 +343,86 @@ def cmd_log_notify(msg: Tuple[str, str], arg: Any) -> None:
     metaDB.write_sync(tid, content, TAIL)
 
 
+def ingest_engine() -> IngestEngine:
+    """
+    Engine of the DataLink process, it's created after the
+    DataLink process is started.
+    """
+    if EVENT_HANDLER_TOOLS.ingest is None:
+        EVENT_HANDLER_TOOLS.ingest = IngestEngine() if cfg.config is None \
+            else IngestEngine.fromConfig(cfg.config)
+
+    return EVENT_HANDLER_TOOLS.ingest
+
+
 async def binaryHandler(dl: DataLink, letter: BinaryLetter,
                         env: Entry.EntryEnv) -> None:
-    chooserSet = EVENT_HANDLER_TOOLS.chooserSet
+    if isinstance(letter, RawFile):
+        return await rawFileHandler(dl, letter, env)
 
     if not isinstance(letter, BinaryLetter):
         return None
 
     tid = letter.getHeader('tid')
     unique_id = tid.split("_")[0]
+    fileName = letter.getFileName()
 
-    # A new file is transfered.
-    if unique_id not in chooserSet:
-        fileName = letter.getFileName()
+    sto = env.modules.getModule(STORAGE_M_NAME)
+
+    # Files in transfer are keyed by tid so fragments
+    # of a job are able to transfer at the same time.
+    engine = ingest_engine()
+    stream = engine.get(tid)
 
-        sto = env.modules.getModule(STORAGE_M_NAME)
-        chooser = sto.create(unique_id, fileName)
-        chooserSet[unique_id] = chooser
+    # Copies of a task transfer the same file, each of
+    # them is write into a partial file of it's own.
+    tag = speculation_tag(tid)
+
+    # A new file is transfered.
+    if stream is None:
+        partial = sto.partialPath(unique_id, fileName, tag)
+        if partial is None:
+            return None
+        stream = engine.open(tid, partial, digest=True)
 
-    chooser = chooserSet[unique_id]
     content = letter.getContent('bytes')
 
     if content == b"":
         # A file is transfer finished.
-        chooser.close()
-        del chooserSet[unique_id]
+        await stream.close()
+        path = sto.commitPartial(unique_id, fileName, stream.digest(), tag)
 
         # Notify To DataLinker a file is transfered finished.
-        dl.notify(DataLinkNotify("BINARY", (tid, chooser.path())))
+        dl.notify(DataLinkNotify("BINARY", (tid, path)))
     else:
-        chooser.store(content)
+        await stream.write(content)
+
+
+async def rawFileHandler(dl: DataLink, raw: RawFile,
+                         env: Entry.EntryEnv) -> None:
+    """
+    Write a file transfered in raw bytes into storage, bytes
+    of a broken transfer are kept so sender is able to resume.
+    """
+    tid = raw.getTid()
+    unique_id = tid.split("_")[0]
+
+    tag = speculation_tag(tid)
+
+    sto = env.modules.getModule(STORAGE_M_NAME)
+    partial = sto.partialPath(unique_id, raw.getFileName(), tag)
+    if partial is None:
+        return None
+
+    if await raw.saveTo(partial, ingest_engine()) != RawFile.SAVE_DONE:
+        # Digest mismatch or another ranges are in transfer.
+        return None
+
+    path = sto.commitPartial(unique_id, raw.getFileName(),
+                             raw.desc.getSha256(), tag)
+
+    # Notify To DataLinker a file is transfered finished.
+    dl.notify(DataLinkNotify("BINARY", (tid, path)))
 
 
 def binaryNotify(msg: Tuple[str, str], arg: Any) -> None:
@@ -0,0 +1,176 @@
+# MIT License
+#
+# Copyright (c) 2020 Gcom
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# fairQueue.py
+#
+# A queue of tasks in priority classes which is fair between jobs.
+
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterator, List, Optional
+
+
+# Marks the end of items of a group.
+_NIL = object()
+
+
+class FairQueue:
+    """
+    Items of a lower class are dequeued before higher classes. In
+    a class items are dequeued round-robin across their groups (jobs),
+    one item of a group each turn and FIFO in a group.
+
+    All of put(), get(), remove() and setClass() are O(1).
+    """
+
+    def __init__(self, numOfClasses: int, maxsize: int = 0) -> None:
+        self._maxsize = maxsize
+
+        # group -> items of the group, groups are in order of
+        # their turns.
+        self._classes = [
+            OrderedDict() for i in range(numOfClasses)
+        ]  # type: List[OrderedDict]
+
+        # item -> group
+        self._where = {}  # type: Dict[Any, Hashable]
+
+        # group -> class
+        self._groups = {}  # type: Dict[Hashable, int]
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, item: Any) -> bool:
+        return item in self._where
+
+    def __iter__(self) -> Iterator[Any]:
+        for cls in self._classes:
+            for items in cls.values():
+                yield from items
+
+    def head(self, n: int) -> List[Any]:
+        """
+        First n items in order of they are dequeued, cost is
+        O(n) plus number of groups visited.
+        """
+        items = []  # type: List[Any]
+
+        for cls in self._classes:
+            groups = [iter(g) for g in cls.values()]
+
+            while groups != [] and len(items) < n:
+                remains = []
+
+                for g in groups:
+                    item = next(g, _NIL)
+                    if item is _NIL:
+                        continue
+
+                    items.append(item)
+                    remains.append(g)
+
+                    if len(items) == n:
+                        return items
+
+                groups = remains
+
+        return items
+
+    def full(self) -> bool:
+        return self._maxsize > 0 and len(self) >= self._maxsize
+
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    def put(self, item: Any, group: Hashable, cls: int) -> None:
+        """
+        Items of a group are in the class of the group while the
+        group has items in queue.
+        """
+        if item in self._where:
+            return None
+
+        if group not in self._groups:
+            self._groups[group] = cls
+            self._classes[cls][group] = OrderedDict()
+
+        self._classes[self._groups[group]][group][item] = None
+        self._where[item] = group
+
+    def _head(self) -> Optional[Hashable]:
+        for cls in self._classes:
+            if len(cls) > 0:
+                return next(iter(cls))
+        return None
+
+    def peek(self) -> Any:
+        group = self._head()
+        if group is None:
+            return None
+
+        items = self._classes[self._groups[group]][group]
+        return next(iter(items))
+
+    def get(self) -> Any:
+        group = self._head()
+        if group is None:
+            raise IndexError
+
+        cls = self._classes[self._groups[group]]
+        item, _ = cls[group].popitem(last=False)
+        del self._where[item]
+
+        if len(cls[group]) == 0:
+            del cls[group]
+            del self._groups[group]
+        else:
+            # Turn of the group is over.
+            cls.move_to_end(group)
+
+        return item
+
+    def remove(self, item: Any) -> bool:
+        if item not in self._where:
+            return False
+
+        group = self._where.pop(item)
+        cls = self._classes[self._groups[group]]
+        del cls[group][item]
+
+        if len(cls[group]) == 0:
+            del cls[group]
+            del self._groups[group]
+
+        return True
+
+    def setClass(self, group: Hashable, cls: int) -> None:
+        """
+        Move a group into another class, the group
+        get it's turn after groups in that class.
+        """
+        if group not in self._groups or self._groups[group] == cls:
+            return None
+
+        items = self._classes[self._groups[group]].pop(group)
+        self._classes[cls][group] = items
+        self._groups[group] = cls
@@ -31,6 +31,18 @@ class Job:
     STATE_IN_PROCESSING = 1
     STATE_DONE = 2
 
+    # Priority classes, tasks of a lower class are
+    # dispatched before higher classes.
+    PRIORITY_URGENT = 0
+    PRIORITY_NORMAL = 1
+    PRIORITY_LOW = 2
+
+    PRIORITIES = {
+        "urgent": PRIORITY_URGENT,
+        "normal": PRIORITY_NORMAL,
+        "low": PRIORITY_LOW
+    }
+
     def __init__(self, jobid: str, cmd_id: str, info: Dict[str, str]) -> None:
         self.jobid = jobid
 
@@ -48,6 +60,10 @@ class Job:
         self.tasks_record = {}  # type: Dict[str, str]
         self._extra = {}  # type: Dict[str, str]
 
+        # Priority is kept in info so it's recorded
+        # with the job.
+        self.priority = Job.priorityOf(info.get('priority', None))
+
     def is_valid(self) -> bool:
         return len(self.jobid) > 0 and \
             len(self.cmd_id) > 0 and \
@@ -56,6 +72,28 @@ class Job:
     def set_unique_id(self, uid: int) -> None:
         self.unique_id = uid
 
+    @staticmethod
+    def priorityOf(name: Optional[str]) -> int:
+        """
+        Priority class of a name, PRIORITY_NORMAL if
+        the name is unknown.
+        """
+        if name is None:
+            return Job.PRIORITY_NORMAL
+        return Job.PRIORITIES.get(name, Job.PRIORITY_NORMAL)
+
+    def setPriority(self, priority: int) -> None:
+        for name, p in Job.PRIORITIES.items():
+            if p == priority:
+                self.priority = priority
+                self._job_info['priority'] = name
+                return None
+
+        raise ValueError(priority)
+
+    def getPriority(self) -> int:
+        return self.priority
+
     def addTask(self, ident: str, task: Task) -> None:
         if ident not in self._tasks:
             self._tasks[ident] = task
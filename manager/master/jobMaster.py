@@ -43,6 +43,10 @@ from manager.master.job import VerResult
 from manager.basic.mmanager import Module
 from manager.basic.observer import Subject, Observer
 from manager.master.persistentDB import PersistentDB
+from manager.master.resultCache import ResultCache
+from manager.master.misc import job_result_url
+from manager.basic.storage import Storage, M_NAME as STORAGE_M_NAME
+from manager.basic.type import Error
 
 from client.messages import JobInfoMessage, JobStateChangeMessage, \
     JobFinMessage, JobFailMessage, JobBatchMessage, JobHistoryMessage, \
@@ -255,6 +259,11 @@ class JobMaster(Endpoint, Module, Subject, Observer):
         self._jobs = {}  # type: Dict[str, Job]
         self._config = config.config
 
+        # Results of former jobs and recipes of jobs
+        # in processing.
+        self._cache = None  # type: Optional[ResultCache]
+        self._recipes = {}  # type: Dict[str, str]
+
         self._channel_layer = get_channel_layer()
         self._loop = asyncio.get_running_loop()
 
@@ -265,6 +274,9 @@ class JobMaster(Endpoint, Module, Subject, Observer):
         # Observer init
         Observer.__init__(self)
 
+    def set_result_cache(self, cache: ResultCache) -> None:
+        self._cache = cache
+
     async def begin(self) -> None:
         return
 
@@ -342,6 +354,12 @@ class JobMaster(Endpoint, Module, Subject, Observer):
 
             # Store Job into database
             await self._job_record(job)
+
+            # Job is done by result of a former job.
+            if job.is_fin():
+                await self._job_maintain(
+                    str(job.unique_id),
+                    Task.STATE_STR_MAPPING[Task.STATE_FINISHED])
         except Exception as e:
             print(e)
 
@@ -354,24 +372,48 @@ class JobMaster(Endpoint, Module, Subject, Observer):
         # Store job with assigned unique id
         # to make sure no conflict.
         await self.assign_unique_id(job)
+        await self._start_job(job)
+
+    async def _start_job(self, job: Job) -> None:
         self._jobs[str(job.unique_id)] = job
 
         # Bind Job with a job command
         await self.bind(job)
 
-        # Assign job to another module typically
-        # is Dispatcher.
-        for task in job.tasks():
-            await self.peer_notify((Dispatcher.ENDPOINT_DISPATCH, task))
-
         job.state = Job.STATE_IN_PROCESSING
 
+        if job.is_fin():
+            return None
+
+        # Assign job to another module typically
+        # is Dispatcher, tasks of the job are placed together.
+        await self.peer_notify(
+            (Dispatcher.ENDPOINT_DISPATCH_BATCH, job.tasks()))
+
     async def cancel_job(self, jobid: str) -> None:
         tasks = self._jobs[jobid].tasks()
 
         for task in tasks:
             await self.peer_notify((Dispatcher.ENDPOINT_CANCEL, task.id()))
 
+    async def set_priority(self, jobid: str, priority: int) -> None:
+        """
+        Change priority of a job, it's tasks that still wait
+        for workers are reordered by Dispatcher.
+        """
+        job = self._jobs[jobid]
+        job.setPriority(priority)
+
+        # Priority is kept while the job is recovered, a job
+        # created without priority has no such info yet.
+        await database_sync_to_async(
+            JobInfos.objects.update_or_create  # type: ignore
+        )(jobs_id=job.unique_id, info_key='priority',
+          defaults={'info_value': job.get_info('priority')})
+
+        await self.peer_notify(
+            (Dispatcher.ENDPOINT_PRIORITY, (job, priority)))
+
     async def assign_unique_id(self, job: Job) -> None:
         """
         Read the available unique id from DB then
@@ -384,26 +426,45 @@ class JobMaster(Endpoint, Module, Subject, Observer):
             raise UNIQUE_ID_FAILED_TO_UPDATE()
         job.set_unique_id(jobid)
 
-    async def _recovery(self) -> None:
+    async def recover(self) -> None:
         """
-        Recovery Jobs that does not done in
-        previous boot time.
+        Redo Jobs that does not done in previous boot time, a job
+        is recorded in database until it's done so tasks wait in
+        Dispatcher is not lost while master is restart.
         """
-
         jobs = await database_sync_to_async(
-            Jobs.objects.all  # type: ignore
-        )()
+            Jobs.objects.order_by  # type: ignore
+        )('dateTime')
 
-        # Is there some jobs that need to recover.
-        if len(jobs) == 0:
-            return
+        jobs_list = await database_sync_to_async(list)(jobs)
 
-        jobs = await database_sync_to_async(
-            jobs.order_by
-        )('-dateTime')
+        for job_db in jobs_list:
+            infos = await database_sync_to_async(
+                JobInfos.objects.filter  # type: ignore
+            )(jobs=job_db)
 
-        for job in jobs:
-            await self._do_job(job)
+            infos = await database_sync_to_async(list)(infos)
+
+            job = Job(job_db.jobid, job_db.cmdid,
+                      {i.info_key: i.info_value for i in infos})
+            job.set_unique_id(job_db.unique_id)
+
+            try:
+                await self._start_job(job)
+
+                if job.is_fin():
+                    await self._job_maintain(
+                        str(job.unique_id),
+                        Task.STATE_STR_MAPPING[Task.STATE_FINISHED])
+            except Exception as e:
+                # A job that unable to be recovered is dropped
+                # otherwise it fail again on every boot.
+                self._jobs.pop(str(job.unique_id), None)
+                self._recipes.pop(str(job.unique_id), None)
+                await self._job_record_rm(str(job.unique_id))
+
+                await self._log("Failed to recover job " +
+                                str(job.unique_id) + ": " + str(e))
 
     async def handle(self, msg: Any) -> Any:
         """
@@ -453,10 +514,20 @@ class JobMaster(Endpoint, Module, Subject, Observer):
         # To check that is job command a build or buildset.
         if 'Builds' in job_command:
             # Job Command is a BuildSet(tid)
-            self._bind_buildset(job, job_command)
+            builds = self._bind_buildset(job, job_command)
         else:
             # Job Command is a Build
-            self._bind_build(job, job_command)
+            builds = self._bind_build(job, job_command)
+
+        # Version name is already a part of expanded commands.
+        recipe = ResultCache.recipe(cast(str, job.get_info('sn')), builds)
+
+        # Result of a reused job is not remembered again so
+        # age of the result is not renewed.
+        if self._reuse(job, recipe):
+            return None
+
+        self._recipes[str(job.unique_id)] = recipe
 
         # Register persistent place for each task of job.
         metaDB = cast(PersistentDB, config.mmanager.getModule('Meta'))
@@ -466,10 +537,82 @@ class JobMaster(Endpoint, Module, Subject, Observer):
             await database_sync_to_async(metaDB.create)(t.id())
             metaDB.open(t.id())
 
+    def _reuse(self, job: Job, recipe: str) -> bool:
+        """
+        Finish tasks of a job with result of a former job
+        which has the same recipe, the result file is shared
+        with the box of the job.
+        """
+        if self._cache is None or job.get_info('rebuild') == 'true' \
+           or job.get_info('Temporary') == 'true':
+            return False
+
+        # Only a job that is not dispatched yet is able to reuse.
+        if not all(t.isPrepare() for t in job.tasks()):
+            return False
+
+        where = self._cache.get(recipe)
+        if where is None:
+            return False
+
+        assert(config.mmanager is not None)
+        sto = cast(Storage, config.mmanager.getModule(STORAGE_M_NAME))
+
+        box, fileName = where
+        path = sto.share(box, fileName, str(job.unique_id))
+        if path is None:
+            # Result is removed from Storage.
+            self._cache.invalidate(recipe)
+            return False
+
+        # Tasks go to FINISHED through IN_PROC, PREPARE to FINISHED
+        # is not a legal transition.
+        for t in job.tasks():
+            if t.toProcState() is Error or t.toFinState() is Error:
+                for t_ in job.tasks():
+                    t_.toPreState()
+                return False
+
+        job.job_result = job_result_url(str(job.unique_id), path)
+
+        return True
+
+    def _remember(self, job: Job) -> None:
+        recipe = self._recipes.pop(str(job.unique_id), None)
+
+        if self._cache is None or recipe is None or \
+           job.job_result is None or job.get_info('Temporary') == 'true':
+            return None
+
+        # Result is at <DATA_URL>/<unique_id>/<file name>
+        # which is the file of the box of the job.
+        fileName = job.job_result.split("/")[-1]
+        self._cache.put(recipe, cast(str, job.get_info('sn')),
+                        str(job.unique_id), fileName)
+
+    def invalidate_results(self, revision: Optional[str] = None) -> None:
+        """
+        Forget results of a revision or all results if
+        revision is not given, jobs of them will be rebuilt.
+
+        Able to be called from thread other than the thread
+        of JobMaster, e.g. views.
+        """
+        self._loop.call_soon_threadsafe(self._invalidate_results, revision)
+
+    def _invalidate_results(self, revision: Optional[str]) -> None:
+        if self._cache is None:
+            return None
+
+        if revision is None:
+            self._cache.clear()
+        else:
+            self._cache.invalidateRevision(revision)
+
     async def _log(self, message: str) -> None:
         await self.notify(self.NOTIFY_LOG, message)
 
-    def _bind_buildset(self, job: Job, cmd: Dict) -> None:
+    def _bind_buildset(self, job: Job, cmd: Dict) -> List[Build]:
         bs = BuildSet(cmd)
         # Build SingleTask
         sn = job.get_info('sn')
@@ -527,7 +670,9 @@ class JobMaster(Endpoint, Module, Subject, Observer):
         pt.job = job
         job.addTask(job.jobid, pt)
 
-    def _bind_build(self, job: Job, cmd: Dict) -> None:
+        return bs.getBuilds() + [merge_command.getBuild()]
+
+    def _bind_build(self, job: Job, cmd: Dict) -> List[Build]:
         # Job Command is a Build
         build = Build(job.cmd_id, cmd)
 
@@ -540,8 +685,11 @@ class JobMaster(Endpoint, Module, Subject, Observer):
                         revision=sn,
                         build=build,
                         extra={})
+        st.job = job
         job.addTask(build.getIdent(), st)
 
+        return [build]
+
     def exists(self, jobid: str) -> bool:
         return jobid in self._jobs
 
@@ -583,6 +731,7 @@ class JobMaster(Endpoint, Module, Subject, Observer):
         if state == Task.STATE_STR_MAPPING[Task.STATE_FINISHED]:
             # If Job is finished
             if job.is_fin() and job.job_result is not None:
+                self._remember(job)
                 await self._job_maintain_terminate(jobid, JobFinMessage(jobid))
 
                 vr = VerResult(str(job.unique_id), job.jobid, job.job_result)
@@ -593,6 +742,7 @@ class JobMaster(Endpoint, Module, Subject, Observer):
             # need to cancel all tasks of the job to make sure
             # the consistency of tasks of a job is statisfied.
             await self.cancel_job(jobid)
+            self._recipes.pop(jobid, None)
             await self._job_maintain_terminate(jobid, JobFailMessage(jobid))
 
     async def _job_maintain_terminate(self, jobid: str, msg: Message) -> None:
@@ -35,7 +35,7 @@ from manager.basic.info import Info
 from manager.basic.letter import Letter
 from manager.master.workerRoom import WorkerRoom, M_NAME as WR_M_NAME
 from manager.master.dispatcher import Dispatcher, M_NAME as DISPATCHER_M_NAME,\
-    viaOverhead, theListener
+    viaOverhead, theListener, ExpectedFinish, BuildAffinity
 from manager.master.eventListener \
     import EventListener, M_NAME as EVENT_M_NAME, Entry
 from manager.master.eventHandlers import responseHandler, binaryHandler, \
@@ -43,6 +43,7 @@ from manager.master.eventHandlers import responseHandler, binaryHandler, \
     cmd_log_handler, cmd_log_notify
 from manager.master.logger import Logger
 from manager.basic.storage import Storage
+from manager.master.resultCache import ResultCache, RESULTS_INDEX
 from manager.master.taskTracker import TaskTracker
 from manager.master.verControl import RevSync
 from manager.basic.dataLink import DataLinker, DataLink
@@ -132,8 +133,20 @@ class ServerInst(Thread):
         dispatcher.setWorkerRoom(workerRoom)
         dispatcher.setTaskTracker(tracker)
         # Setup task's worker search condition
-        dispatcher.add_worker_search_cond(SingleTask, viaOverhead)
+        placement = info.getConfig('Placement')
+        if placement == "duration":
+            dispatcher.add_worker_search_cond(
+                SingleTask, ExpectedFinish(dispatcher.buildStats(),
+                                           dispatcher.startedAt))
+        elif placement == "affinity":
+            dispatcher.add_worker_search_cond(SingleTask, BuildAffinity())
+        else:
+            dispatcher.add_worker_search_cond(SingleTask, viaOverhead)
         dispatcher.add_worker_search_cond(PostTask, theListener)
+        # Copy stragglers to idle workers
+        speculation = info.getConfig('Speculation')
+        if speculation:
+            dispatcher.setSpeculation(float(speculation))
         # Set as peer of JobMaster
         jobMaster.set_peer(dispatcher)
 
@@ -159,9 +172,18 @@ class ServerInst(Thread):
         cfg.logger = logger
         self.addModule(logger)
 
-        storage = Storage(info.getConfig('Storage'), self)
+        storage = Storage(info.getConfig('Storage'), self,
+                          dedup=info.getConfig('StorageDedup') is True)
         self.addModule(storage)
 
+        # Reuse results of jobs that have the same recipe
+        entries = info.getConfig('ResultCache', 'entries')
+        if entries:
+            jobMaster.set_result_cache(ResultCache(
+                os.path.join(info.getConfig('Storage'), RESULTS_INDEX),
+                maxEntries=int(entries),
+                maxAge=float(info.getConfig('ResultCache', 'age') or 0)))
+
         metaInfos = PersistentDB(info.getConfig('Meta'))
         self.addModule(metaInfos)
 
@@ -231,6 +253,9 @@ class ServerInst(Thread):
 
         await self._mmanager.start_all()
 
+        # Jobs not done before last shutdown.
+        await jobMaster.recover()
+
         if os.path.exists("custom.py"):
             from custom import custom_init
             # Do initialization defined in
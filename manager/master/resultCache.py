@@ -0,0 +1,156 @@
+# MIT License
+#
+# Copyright (c) 2020 Gcom
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# resultCache.py
+#
+# Results of builds that are able to be reused by later jobs.
+
+import os
+import json
+import time
+import hashlib
+
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from manager.master.build import Build
+
+
+# Index of results, it's kept in directory of Storage.
+RESULTS_INDEX = ".results"
+
+
+class ResultCache:
+    """
+    Map recipe of a job to the file of it's result in Storage,
+    a recipe is hash of revision, idents, expanded commands and
+    outputs of builds of the job.
+
+    At most maxEntries results are remembered, the least recently
+    used is evicted first. A result older than maxAge seconds is
+    not reused, 0 means no limit. The index is kept in path so
+    results are reused after master is restarted.
+    """
+
+    def __init__(self, path: Optional[str] = None, maxEntries: int = 256,
+                 maxAge: float = 0) -> None:
+        self._path = path
+        self._maxEntries = maxEntries
+        self._maxAge = maxAge
+
+        # recipe -> (revision, box, file name, time)
+        self._entries = OrderedDict()  # type: OrderedDict
+
+        if path is not None and os.path.exists(path):
+            self._load()
+
+    @staticmethod
+    def recipe(revision: str, builds: List[Build]) -> str:
+        h = hashlib.sha256(revision.encode())
+
+        for b in builds:
+            for part in [b.getIdent(), *b.getCmd(), b.getOutput()]:
+                h.update(b"\0" + part.encode())
+            h.update(b"\1")
+
+        return h.hexdigest()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, recipe: str) -> bool:
+        return recipe in self._entries
+
+    def get(self, recipe: str) -> Optional[Tuple[str, str]]:
+        """
+        Box and file name of result of the recipe.
+        """
+        if recipe not in self._entries:
+            return None
+
+        revision, box, fileName, when = self._entries[recipe]
+
+        if self._maxAge > 0 and time.time() - when > self._maxAge:
+            self.invalidate(recipe)
+            return None
+
+        self._entries.move_to_end(recipe)
+        return (box, fileName)
+
+    def put(self, recipe: str, revision: str,
+            box: str, fileName: str) -> None:
+        if self._maxEntries <= 0:
+            return None
+
+        self._entries[recipe] = (revision, box, fileName, time.time())
+        self._entries.move_to_end(recipe)
+
+        while len(self._entries) > self._maxEntries:
+            self._entries.popitem(last=False)
+
+        self._save()
+
+    def invalidate(self, recipe: str) -> None:
+        if self._entries.pop(recipe, None) is not None:
+            self._save()
+
+    def invalidateRevision(self, revision: str) -> None:
+        """
+        Forget results of a revision, e.g. the revision is rewrited.
+        """
+        self._drop(lambda e: e[0] == revision)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._save()
+
+    def _drop(self, predicate) -> None:
+        recipes = [r for r, e in self._entries.items() if predicate(e)]
+
+        for r in recipes:
+            del self._entries[r]
+
+        if recipes != []:
+            self._save()
+
+    def _load(self) -> None:
+        try:
+            with open(self._path, "r") as f:  # type: ignore
+                entries = json.load(f)
+        except (OSError, ValueError):
+            # A broken index only lose results.
+            return None
+
+        for recipe, revision, box, fileName, when in entries:
+            self._entries[recipe] = (revision, box, fileName, when)
+
+    def _save(self) -> None:
+        if self._path is None:
+            return None
+
+        entries = [[r, *e] for r, e in self._entries.items()]
+
+        tmp = self._path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp, self._path)
@@ -35,6 +35,7 @@ from manager.basic.restricts import TASK_ID_MAX_LENGTH, VERSION_MAX_LENGTH, \
 
 from datetime import datetime
 from manager.master.build import Build, Merge
+from manager.basic.util import SPECULATION_SEP
 
 # Need by test
 from manager.basic.info import Info
@@ -247,6 +248,10 @@ class SingleTask(Task):
         self._build = build
         self._needPost = needPost
 
+        # Task that this task is a copy of.
+        self.origin = None  # type: Optional[SingleTask]
+        self._numOfCopies = 0
+
     def isValid(self) -> bool:
         cond1 = len(self.taskId) <= BinaryLetter.TASK_ID_FIELD_LEN
         cond2 = len(self.vsn) <= VERSION_MAX_LENGTH
@@ -273,6 +278,25 @@ class SingleTask(Task):
     def isBindWithBuild(self) -> bool:
         return self._build is not None
 
+    def getBuild(self) -> Build:
+        return self._build
+
+    def speculate(self) -> 'SingleTask':
+        """
+        A copy of this task which run on another worker, the
+        copy's result is the task's result if it's done first.
+        """
+        self._numOfCopies += 1
+
+        ident = self.id() + SPECULATION_SEP + str(self._numOfCopies)
+
+        copy = SingleTask(ident, self.sn, self.vsn, self._build,
+                          self._needPost, self.extra)
+        copy.job = self.job
+        copy.origin = self
+
+        return copy
+
 
 class PostTask(Task):
 
@@ -22,9 +22,9 @@
 
 # taskTracker.py
 
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Set
 
-from manager.master.task import Task, TaskType
+from manager.master.task import Task, TaskType, SingleTask
 from manager.master.worker import Worker
 from manager.basic.mmanager import Module
 
@@ -76,6 +76,19 @@ class TaskTracker(Module):
         Module.__init__(self, M_NAME)
         self._tasks = {}  # type: Dict[str, TrackUnit]
 
+        # Speculative copies of tasks
+        #
+        # 1._copies: ident of task -> idents of it's copies
+        # 2._origins: ident of copy -> ident of the task
+        # 3._running: ident of task -> idents of the task and
+        #             it's copies that have no result yet.
+        # 4._winners: ident of task -> ident of the task or a
+        #             copy whose result is taken.
+        self._copies = {}  # type: Dict[str, List[str]]
+        self._origins = {}  # type: Dict[str, str]
+        self._running = {}  # type: Dict[str, Set[str]]
+        self._winners = {}  # type: Dict[str, str]
+
     async def begin(self) -> None:
         return None
 
@@ -93,6 +106,91 @@ class TaskTracker(Module):
             return None
         del self._tasks[t_name]
 
+        if t_name in self._origins:
+            self._untrackCopy(t_name)
+            return None
+
+        # Copies are untracked with the task.
+        for copy in self._copies.pop(t_name, []):
+            self._tasks.pop(copy, None)
+            del self._origins[copy]
+
+        self._running.pop(t_name, None)
+        self._winners.pop(t_name, None)
+
+    def _untrackCopy(self, copy: str) -> None:
+        origin = self._origins.pop(copy)
+
+        self._copies[origin].remove(copy)
+        self._running[origin].discard(copy)
+
+        # No copies any more.
+        if self._copies[origin] == [] and origin not in self._winners:
+            del self._copies[origin]
+            del self._running[origin]
+
+    def trackCopy(self, copy: SingleTask) -> None:
+        """
+        Track a copy of a task that is tracked.
+        """
+        assert(copy.origin is not None)
+        origin = copy.origin.id()
+
+        self.track(copy)
+        self._copies.setdefault(origin, []).append(copy.id())
+        self._origins[copy.id()] = origin
+        self._running.setdefault(origin, {origin}).add(copy.id())
+
+    def originOf(self, t_name: str) -> str:
+        return self._origins.get(t_name, t_name)
+
+    def isSpeculated(self, t_name: str) -> bool:
+        """
+        Is t_name a task with copies or a copy.
+        """
+        return self.originOf(t_name) in self._copies
+
+    def copiesOf(self, t_name: str) -> List[Task]:
+        return [self._tasks[c].getTask()
+                for c in self._copies.get(t_name, [])
+                if c in self._tasks]
+
+    def family(self, t_name: str) -> List[str]:
+        """
+        Idents of a task and it's copies that are tracked.
+        """
+        origin = self.originOf(t_name)
+
+        return [t for t in [origin] + self._copies.get(origin, [])
+                if t in self._tasks]
+
+    def settle(self, t_name: str, state: int) -> bool:
+        """
+        Result of copies of a task is first result wins, a failure
+        is taken only if the task and all of it's copies fail.
+        Return True if the result of t_name is taken as the
+        result of the task.
+        """
+        origin = self.originOf(t_name)
+
+        if origin not in self._copies:
+            return True
+
+        if origin in self._winners:
+            return False
+
+        running = self._running[origin]
+        running.discard(t_name)
+
+        if state == Task.STATE_FAILURE and len(running) > 0:
+            return False
+
+        self._winners[origin] = t_name
+        return True
+
+    def winnerOf(self, t_name: str) -> Optional[str]:
+        return self._winners.get(self.originOf(t_name), None)
+
     def getTask(self, t_name: str) -> Optional[Task]:
         if t_name not in self._tasks:
             return None
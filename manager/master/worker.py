@@ -35,6 +35,7 @@ from .task import Task, TaskGroup
 from datetime import datetime
 from manager.basic.letter import Letter, receving as letter_receving, \
     sending as letter_sending
+from manager.basic.letterWriter import LetterWriter
 from manager.basic.commands import Command
 
 
@@ -67,6 +68,18 @@ class Worker:
         self._writer = writer
         self.address = "0.0.0.0"
 
+        # Framing version negotiated with the worker,
+        # old workers only support FRAME_V1.
+        self._frame = Letter.FRAME_V1
+
+        # Letters longer than this are compressed if
+        # the worker support FRAME_V4, 0 means never.
+        self._compress = 0
+
+        # Letters to worker are write by a LetterWriter
+        # which is created while first letter is sent.
+        self._out = None  # type: Optional[LetterWriter]
+
         self.max = 0
         self.inProcTask = TaskGroup()
         self.menus = []  # type: List[Tuple[str, str]]
@@ -95,6 +108,22 @@ class Worker:
         self.counters = [0, 0, 0, 0, 0]
         self._clock = datetime.now()
 
+        # Callbacks that is called while state, capacity or
+        # tasks of the worker is changed.
+        self._watchers = []  # type: List[Callable[[Worker], None]]
+
+    def watch(self, watcher: Callable[['Worker'], None]) -> None:
+        if watcher not in self._watchers:
+            self._watchers.append(watcher)
+
+    def unwatch(self, watcher: Callable[['Worker'], None]) -> None:
+        if watcher in self._watchers:
+            self._watchers.remove(watcher)
+
+    def _changed(self) -> None:
+        for watcher in self._watchers:
+            watcher(self)
+
     def getStream(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
         return (self._reader, self._writer)
 
@@ -103,6 +132,26 @@ class Worker:
 
         self._reader, self._writer = stream
 
+        # Letters queued on the old stream are failed.
+        if self._out is not None:
+            self._out.stop()
+            self._out = None
+
+    def setFrame(self, frame: int) -> None:
+        self._frame = frame
+
+        if self._out is not None:
+            self._out.setFrame(frame)
+
+    def getFrame(self) -> int:
+        return self._frame
+
+    def setCompress(self, threshold: int) -> None:
+        self._compress = threshold
+
+        if self._out is not None:
+            self._out.setCompress(threshold)
+
     def waitCounter(self) -> int:
         self._counterSync()
         return self.counters[Worker.STATE_WAITING]
@@ -126,6 +175,8 @@ class Worker:
         self.state = s
         self._clock = datetime.utcnow()
 
+        self._changed()
+
     def getAddress(self) -> str:
         return self.address
 
@@ -158,12 +209,15 @@ class Worker:
 
     def removeTask(self, tid: str) -> None:
         self.inProcTask.remove(tid)
+        self._changed()
 
     def removeTaskWithCond(self, predicate: Callable[[Task], bool]) -> None:
-        return self.inProcTask.removeTasks(predicate)
+        self.inProcTask.removeTasks(predicate)
+        self._changed()
 
     def setMax(self, max: int) -> None:
         self.max = max
+        self._changed()
 
     def maxNumOfTask(self) -> int:
         return self.max
@@ -179,17 +233,32 @@ class Worker:
         await self._send(letter)
 
     async def do(self, task: Task) -> None:
+        await self._send(self.assign(task))
+
+    def assign(self, task: Task) -> Letter:
+        """
+        Register a task to the worker and return the letter
+        that should be sent to the worker.
+        """
         letter = task.toLetter()
 
         if letter is None:
             raise Exception
 
-        await self._send(letter)
-
         # Register task into task group
         task.toProcState()
 
         self.inProcTask.newTask(task)
+        self._changed()
+
+        return letter
+
+    async def sendLetters(self, letters: List[Letter]) -> None:
+        """
+        Letters are queued in the same loop turn so
+        they are write at once.
+        """
+        await asyncio.gather(*[self._send(l) for l in letters])
 
     async def sendLetter(self, letter: Letter) -> None:
         await self._send(letter)
@@ -210,6 +279,7 @@ class Worker:
 
         # Remove task from this worker
         self.inProcTask.remove(id)
+        self._changed()
 
         cmd = JobCancelCommand(id)
         await self.control(cmd)
@@ -229,15 +299,21 @@ class Worker:
         return await letter_receving(reader, timeout=timeout)
 
     @staticmethod
-    async def sending(writer: asyncio.StreamWriter, letter: Letter) -> None:
-        return await letter_sending(writer, letter)
+    async def sending(writer: asyncio.StreamWriter, letter: Letter,
+                      frame: int = Letter.FRAME_V1) -> None:
+        return await letter_sending(writer, letter, frame=frame)
 
     async def _recv(self, timeout=None) -> Optional[Letter]:
         return await Worker.receving(self._reader, timeout=timeout)
 
     async def _send(self, letter: Letter) -> None:
+        if self._out is None:
+            self._out = LetterWriter(self._writer, self._frame,
+                                     compress=self._compress)
+            self._out.start()
+
         try:
-            await Worker.sending(self._writer, letter)
+            await self._out.send(letter)
         except Exception:
             traceback.print_exc()
 
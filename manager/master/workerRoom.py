@@ -25,6 +25,7 @@
 # Maintain connection with workers
 
 import asyncio
+import heapq
 
 from datetime import datetime
 from manager.basic.observer import Subject, Observer
@@ -36,7 +37,8 @@ from manager.master.task import Task
 from typing import Tuple, Callable, Any, List, Dict, Optional, cast
 from manager.basic.info import M_NAME as INFO_M_NAME
 from manager.basic.commands import AcceptCommand, AcceptRstCommand
-from manager.basic.letter import receving, PropLetter
+from manager.basic.letter import receving, sending, PropLetter, Letter, \
+    negotiateFrame, compressThreshold
 
 M_NAME = "WorkerRoom"
 
@@ -105,9 +107,28 @@ class WorkerRoom(ModuleDaemon, Subject, Observer):
 
         self._stableThres = self._WAITING_INTERVAL + 1
 
+        # Threshold of compression of letters to workers.
+        self._compress = compressThreshold(
+            configs.getConfig('COMPRESSION', 'control'))
+
         self._lastChangedPoint = datetime.utcnow()
         self._lastCandidates = []  # type: List[str]
 
+        # Hooks that is called while a worker in the room is
+        # changed, e.g. connected, online or a task is done.
+        self._hooks = []  # type: List[Callable[[Worker], None]]
+
+        # Index of online NORMAL workers that able to accept tasks.
+        # It's a heap of (load, seq, ident) in which load is
+        # numOfTaskProc() / max, entries are not removed while a
+        # worker changed but skipped while it's out of date.
+        self._index = []  # type: List[Tuple[float, int, str]]
+        self._indexed = {}  # type: Dict[str, Tuple[float, int, str]]
+        self._seq = 0
+
+        # Online mergers.
+        self._mergers = {}  # type: Dict[str, Worker]
+
         self._stop = False
 
     async def begin(self) -> None:
@@ -136,6 +157,8 @@ class WorkerRoom(ModuleDaemon, Subject, Observer):
             w_ident = cast(PropLetter, propLetter).getIdent()
             role = cast(PropLetter, propLetter).getRole()
             max = int(cast(PropLetter, propLetter).getMax())
+            frame = negotiateFrame(
+                cast(PropLetter, propLetter).getFrame())
 
             if role == "MERGER":
                 role_v = Worker.ROLE_MERGER
@@ -145,6 +168,15 @@ class WorkerRoom(ModuleDaemon, Subject, Observer):
             arrived_worker = Worker(w_ident, r, w, role_v)
             arrived_worker.setState(Worker.STATE_ONLINE)
             arrived_worker.setMax(max)
+            arrived_worker.setFrame(frame)
+            arrived_worker.setCompress(self._compress)
+
+            # Worker that support wider frame wait for a PropLetter
+            # from master to know which framing to use. Old workers
+            # never receive it.
+            if frame > Letter.FRAME_V1:
+                await sending(w, PropLetter("Master", "0", "0", "MASTER",
+                                            frame=frame))
 
             await self._WR_LOG("Worker " + w_ident + " is connected")
 
@@ -166,6 +198,8 @@ class WorkerRoom(ModuleDaemon, Subject, Observer):
             # change to acceptedWorker
             workerInWait = self._workers_waiting[w_ident]
             workerInWait.setStream(arrived_worker.getStream())
+            workerInWait.setFrame(arrived_worker.getFrame())
+            workerInWait.setCompress(self._compress)
 
             # Note: Need to setup worker's status before listener
             #       address update otherwise
@@ -290,6 +324,99 @@ class WorkerRoom(ModuleDaemon, Subject, Observer):
     async def notifyEvent(self, eventType: EVENT_TYPE, ident: str) -> None:
         await self._eventQueue.put((eventType, ident))
 
+    def hook_install(self, hook: Callable[[Worker], None]) -> None:
+        if hook not in self._hooks:
+            self._hooks.append(hook)
+
+    def hook_remove(self, hook: Callable[[Worker], None]) -> None:
+        if hook in self._hooks:
+            self._hooks.remove(hook)
+
+    def _worker_changed(self, w: Worker) -> None:
+        # Only workers in room are cared.
+        if self._workers.get(w.getIdent()) is not w:
+            return None
+
+        self._reindex(w)
+
+        for hook in self._hooks:
+            hook(w)
+
+    @staticmethod
+    def load(w: Worker) -> float:
+        return w.numOfTaskProc() / w.maxNumOfTask()
+
+    def _reindex(self, w: Worker) -> None:
+        ident = w.getIdent()
+
+        if w.isMerger():
+            if w.isOnline():
+                self._mergers[ident] = w
+            else:
+                self._mergers.pop(ident, None)
+            return None
+
+        if not (w.isOnline() and w.isAbleToAccept()):
+            self._indexed.pop(ident, None)
+            return None
+
+        entry = self._indexed.get(ident)
+        load = WorkerRoom.load(w)
+        if entry is not None and entry[0] == load:
+            return None
+
+        self._seq += 1
+        entry = (load, self._seq, ident)
+        self._indexed[ident] = entry
+        heapq.heappush(self._index, entry)
+
+        # Out of date entries are more than live entries.
+        if len(self._index) > 2 * len(self._indexed) + 64:
+            self._index = list(self._indexed.values())
+            heapq.heapify(self._index)
+
+    def _unindex(self, w: Worker) -> None:
+        self._indexed.pop(w.getIdent(), None)
+        self._mergers.pop(w.getIdent(), None)
+
+    def leastLoadedWorker(self) -> Optional[Worker]:
+        """
+        Online NORMAL worker which is able to accept and with
+        lowest load, None if no such worker.
+        """
+        while self._index != []:
+            entry = self._index[0]
+            load, _, ident = entry
+
+            if self._indexed.get(ident) is not entry:
+                heapq.heappop(self._index)
+                continue
+
+            # Worker may be changed without notify, check it
+            # before it's returned.
+            w = self._workers[ident]
+            if not (w.isOnline() and w.isAbleToAccept()) or \
+               WorkerRoom.load(w) != load:
+
+                heapq.heappop(self._index)
+                del self._indexed[ident]
+                self._reindex(w)
+                continue
+
+            return w
+
+        return None
+
+    def getAcceptableWorkers(self) -> List[Worker]:
+        """
+        Online NORMAL workers that able to accept tasks.
+        """
+        workers = [self._workers[ident] for ident in self._indexed]
+        return [w for w in workers if w.isOnline() and w.isAbleToAccept()]
+
+    def getMergers(self) -> List[Worker]:
+        return [w for w in self._mergers.values() if w.isOnline()]
+
     def getWorker(self, ident: str) -> Optional[Worker]:
         if ident not in self._workers:
             return None
@@ -315,6 +442,9 @@ class WorkerRoom(ModuleDaemon, Subject, Observer):
         self.numOfWorkers += 1
         self._changePoint()
 
+        w.watch(self._worker_changed)
+        self._worker_changed(w)
+
         return Ok
 
     def isExists(self, ident: str) -> bool:
@@ -357,6 +487,9 @@ class WorkerRoom(ModuleDaemon, Subject, Observer):
         if ident not in self._workers:
             return Error
 
+        self._workers[ident].unwatch(self._worker_changed)
+        self._unindex(self._workers[ident])
+
         del self._workers[ident]
         self.numOfWorkers -= 1
         self._changePoint()
@@ -51,3 +51,8 @@ class VersionInfoSerializer(serializers.Serializer):
 
 class BuildInfoSerializer(serializers.Serializer):
     extra = serializers.CharField(max_length=60)
+    # One of "urgent", "normal" and "low"
+    priority = serializers.ChoiceField(
+        choices=["urgent", "normal", "low"], required=False)
+    # Build again even a result of the same recipe exists.
+    rebuild = serializers.BooleanField(required=False)
@@ -46,6 +46,15 @@ from manager.master.logger import \
 from manager.master.TestCases.taskTrackerTestCases import \
     TaskTrackerTestCases
 
+from manager.master.TestCases.buildStatsTestCases import \
+    BuildStatsTestCases
+
+from manager.master.TestCases.fairQueueTestCases import \
+    FairQueueTestCases
+
+from manager.master.TestCases.resultCacheTestCases import \
+    ResultCacheTestCases
+
 from manager.master.TestCases.eventHandlerTestCases import EventHandlerTestCases
 
 from manager.master.worker import \
@@ -78,6 +87,7 @@ from manager.worker.TestCases.workerTestCases import \
 from manager.worker.TestCases.procUnitTestCases import \
     ProcUnitUnitTestCases, \
     JobProcUnitTestCases, \
+    ResultTransferTestCases, \
     PostProcUnitTestCases
 
 from manager.basic.TestCases.notifyTestCases import \
@@ -118,3 +128,12 @@ from manager.worker.TestCases.linkerTestCases import \
     LinkerTestCases
 
 from manager.basic.TestCases.macroTestCases import MacroTestCases
+
+from manager.basic.TestCases.letterWriterTestCases import \
+    LetterWriterTestCases
+
+from manager.basic.TestCases.ingestTestCases import \
+    IngestTestCases
+
+from manager.basic.TestCases.streamCodecTestCases import \
+    StreamCodecTestCases
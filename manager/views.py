@@ -109,6 +109,9 @@ class VersionViewSet(viewsets.ModelViewSet):
 
         assert(cfg.config is not None)
 
+        priority = "normal"
+        rebuild = False
+
         if len(request.data) == 0:
             extra_info = ""
         else:
@@ -121,6 +124,9 @@ class VersionViewSet(viewsets.ModelViewSet):
             if extra_info is None:
                 extra_info = ""
 
+            priority = generate_info.data.get('priority', priority)
+            rebuild = generate_info.data.get('rebuild', rebuild)
+
         try:
             version = Versions.objects.get(pk=pk)  # type: ignore
         except ObjectDoesNotExist:
@@ -130,7 +136,9 @@ class VersionViewSet(viewsets.ModelViewSet):
         job = Job(pk, "GL8900", {
             'vsn': pk,
             'sn': version.sn,
-            'extra': extra_info
+            'extra': extra_info,
+            'priority': priority,
+            'rebuild': 'true' if rebuild else 'false'
         })
 
         assert(S.ServerInstance is not None)
@@ -178,6 +186,27 @@ class RevisionViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
+    @action(detail=True, methods=['delete'])
+    def results(self, request, pk=None) -> Response:
+        """
+        Forget results of builds of the revision, jobs
+        of the revision will be rebuilt.
+        """
+        assert(S.ServerInstance is not None)
+        jobMaster = cast(JobMaster, S.ServerInstance.getModule('JobMaster'))
+        jobMaster.invalidate_results(pk)
+
+        return Response()
+
+    @action(detail=False, methods=['delete'])
+    def allResults(self, request) -> Response:
+        assert(S.ServerInstance is not None)
+        jobMaster = cast(JobMaster, S.ServerInstance.getModule('JobMaster'))
+        jobMaster.invalidate_results()
+
+        return Response()
+
+
 class JobHistoryViewSet(viewsets.ModelViewSet):
     queryset = JobHistory.objects.all().order_by('-dateTime')
     serializer_class = JobHistorySerializer
@@ -21,7 +21,10 @@
 # SOFTWARE.
 
 
+import os
 import asyncio
+import multiprocessing
+import tempfile
 import unittest
 import manager.worker.TestCases.misc.linker as misc
 import manager.worker.configs as cfg
@@ -30,6 +33,8 @@ import typing as T
 from manager.basic.letter import Letter, NotifyLetter
 from manager.basic.info import Info
 from manager.worker.connector import Linker, Connector
+from manager.worker.datalink import binaryStore
+from manager.basic.dataLink import TCPDataLink, RawFile
 
 
 class ServerProto(asyncio.DatagramProtocol):
@@ -57,6 +62,13 @@ class ClientProto(asyncio.DatagramProtocol):
         return
 
 
+async def letterOnlyStore(dl, letter, post_dir) -> None:
+    # DataLink that not support raw file.
+    if isinstance(letter, RawFile):
+        return None
+    await binaryStore(dl, letter, post_dir)
+
+
 class ConnectorTestCases(unittest.IsolatedAsyncioTestCase):
 
     async def asyncSetUp(self) -> None:
@@ -224,3 +236,169 @@ class LinkerTestCases(unittest.IsolatedAsyncioTestCase):
 
         # Verify
         self.assertGreater(vir_worker._reconn_count, 0)
+
+    async def _sendfile(self, processor: T.Callable,
+                        partial: T.Optional[bytes] = None,
+                        attempts: int = 1,
+                        content: T.Optional[bytes] = None) -> T.List[bool]:
+        # Setup
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+
+        path = os.path.join(tmp.name, "result.bin")
+        if content is None:
+            content = os.urandom(3 * 1024 * 1024 + 7)
+        with open(path, "wb") as f:
+            f.write(content)
+
+        notifies, w = multiprocessing.Pipe(duplex=False)
+        post_dir = os.path.join(tmp.name, "Post")
+        dl = TCPDataLink("127.0.0.1", 7788, processor, post_dir, w)
+        t = asyncio.get_running_loop().create_task(dl.datalink_create())
+        self.addCleanup(t.cancel)
+        await asyncio.sleep(0.1)
+
+        # Bytes left by a broken transfer.
+        if partial is not None:
+            os.makedirs(os.path.join(post_dir, "ver"))
+            with open(os.path.join(post_dir, "ver", "result.bin.part"),
+                      "wb") as f:
+                f.write(partial)
+
+        # Exercise
+        self.linker.RAW_ACCEPT_TIMEOUT = 1
+        rets = []
+        for i in range(attempts):
+            rets.append(await self.linker.sendfile(
+                "Master", "1_GL5610", path, "ver", "result.bin"))
+
+        # DataLink is run in this loop.
+        for i in range(50):
+            if notifies.poll():
+                break
+            await asyncio.sleep(0.1)
+
+        # Verify
+        self.assertTrue(rets[-1])
+        self.assertEqual([("BINARY", ("ver", "1_GL5610", "result.bin"))],
+                         notifies.recv())
+        self.assertFalse(notifies.poll())
+
+        with open(os.path.join(post_dir, "ver", "result.bin"), "rb") as f:
+            self.assertEqual(content, f.read())
+        self.assertFalse(os.path.exists(
+            os.path.join(post_dir, "ver", "result.bin.part")))
+
+        return rets
+
+    async def test_Linker_Sendfile_Raw(self) -> None:
+        await self._sendfile(binaryStore)
+
+    async def test_Linker_Sendfile_Fallback(self) -> None:
+        await self._sendfile(letterOnlyStore)
+
+    async def test_Linker_Sendfile_Resume(self) -> None:
+        content = os.urandom(3 * 1024 * 1024 + 7)
+        offsets = []
+
+        async def store(dl, raw, post_dir):
+            await binaryStore(dl, raw, post_dir)
+            offsets.append(raw.desc.getOffset())
+
+        rets = await self._sendfile(store, partial=content[:1024 * 1024],
+                                    content=content)
+
+        # Only bytes after the partial are transfered.
+        self.assertEqual([True], rets)
+        self.assertEqual([1024 * 1024], offsets)
+
+    async def test_Linker_Sendfile_Ranges(self) -> None:
+        descs = []
+
+        async def store(dl, raw, post_dir):
+            descs.append((raw.desc.getBegin(), raw.desc.getEnd()))
+            await binaryStore(dl, raw, post_dir)
+
+        self.linker._streams = 4
+        self.linker.MIN_RANGE_SIZE = 1024 * 1024
+
+        rets = await self._sendfile(store)
+
+        # File is transfered in 3 ranges concurrently.
+        self.assertEqual([True], rets)
+        self.assertEqual([(0, 1048579), (1048579, 2097158),
+                          (2097158, 3145735)], sorted(descs))
+
+    async def test_Linker_Sendfile_Ranges_Resume(self) -> None:
+        offsets = []
+
+        async def store(dl, raw, post_dir):
+            if raw.desc.getBegin() == 1048579 and offsets == []:
+                # Link is broken after first chunk of the range.
+                chunks = raw.chunks
+
+                async def broken(size=RawFile.CHUNK_SIZE):
+                    async for chunk in chunks(size):
+                        yield chunk
+                        raise ConnectionError()
+                raw.chunks = broken
+
+            await binaryStore(dl, raw, post_dir)
+            offsets.append((raw.desc.getBegin(), raw.desc.getOffset()))
+
+        self.linker._streams = 4
+        self.linker.MIN_RANGE_SIZE = 1024 * 1024
+
+        rets = await self._sendfile(store, attempts=2)
+
+        # Only the broken range is transfered by the second
+        # attempt and it's resumed.
+        self.assertEqual([False, True], rets)
+
+        (_, first), (_, second), (_, third) = sorted(offsets[-3:])
+        self.assertEqual(1048579, first)
+        self.assertTrue(1048579 < second < 2097158)
+        self.assertEqual(3145735, third)
+
+    async def test_Linker_Sendfile_Corrupt(self) -> None:
+        # Partial bytes are not part of the file so digest is
+        # mismatched, partial is dropped and next transfer
+        # begin from zero.
+        # Merger is not notified of the mismatch, the
+        # file is transfered by the second attempt.
+        rets = await self._sendfile(binaryStore, partial=b"x" * 1024,
+                                    attempts=2)
+        self.assertEqual([False, True], rets)
+
+    async def test_Linker_Sendfile_Compressed(self) -> None:
+        encodings = []
+
+        async def store(dl, raw, post_dir):
+            await binaryStore(dl, raw, post_dir)
+            encodings.append(raw.desc.getEncoding())
+
+        cfg.config.getConfig('MASTER_ADDRESS')['compress'] = 1
+        self.linker._streams = 4
+        self.linker.MIN_RANGE_SIZE = 1024 * 1024
+
+        rets = await self._sendfile(
+            store, content=b"firmware image of GL5610\n" * 150000)
+
+        # Each range is transfered in zlib blocks.
+        self.assertEqual([True], rets)
+        self.assertEqual(["zlib"] * 3, encodings)
+
+    async def test_Linker_Sendfile_Incompressible(self) -> None:
+        encodings = []
+
+        async def store(dl, raw, post_dir):
+            await binaryStore(dl, raw, post_dir)
+            encodings.append(raw.desc.getEncoding())
+
+        cfg.config.getConfig('MASTER_ADDRESS')['compress'] = 1
+
+        rets = await self._sendfile(store)
+
+        # Random bytes are sent as is.
+        self.assertEqual([True], rets)
+        self.assertEqual([""], encodings)
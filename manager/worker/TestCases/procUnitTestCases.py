@@ -22,6 +22,7 @@
 # SOFTWARE.
 
 import os
+import tempfile
 import unittest
 import asyncio
 import typing
@@ -36,6 +37,9 @@ from manager.worker.procUnit import ProcUnit, JobProcUnit,\
     PROC_UNIT_HIGHT_OVERLOAD, PROC_UNIT_IS_IN_DENY_MODE,\
     PostProcUnit, PostTaskLetter, UNIT_TYPE_JOB_PROC, Post,\
     CommandExecutor
+import manager.worker.procUnit as procUnit
+from manager.worker.procUnit import job_result_transfer_check_link_forever
+from manager.basic.letter import Letter
 from manager.worker.proc_common import Output
 from manager.worker.channel import ChannelEntry
 
@@ -185,6 +189,15 @@ class JobProcUnitTestCases(unittest.IsolatedAsyncioTestCase):
 
         self.sut.setChannel(ChannelEntry("JobProcUnit"))
 
+    async def asyncTearDown(self) -> None:
+        # Jobs in processing are stopped so no result
+        # is left in BUILD_DIR.
+        self.sut.stop()
+        await self.sut.reset()
+
+        if os.path.exists("./Builds/job_result"):
+            os.remove("./Builds/job_result")
+
     async def test_JobProcUnit_JobProc(self) -> None:
         # Setup
         self.sut.start()
@@ -293,6 +306,78 @@ class JobProcUnitTestCases(unittest.IsolatedAsyncioTestCase):
         self.assertEqual("123\n", dataes[0].getContent("message"))
 
 
+class OutputBroken:
+    """
+    Output that transfer of file is always failed.
+    """
+
+    def __init__(self) -> None:
+        self.attempts = 0
+
+    async def sendfile(self, target: str, path: str, tid: str,
+                       version: str, fileName: str) -> bool:
+        self.attempts += 1
+        return False
+
+
+class ResultTransferTestCases(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        configs.config = Info("manager/worker/TestCases/misc/jobprocunit_config.yaml")
+
+        # Result is placed in a temporary build directory.
+        self.build_dir = tempfile.TemporaryDirectory()
+        configs.config.getConfigs()['BUILD_DIR'] = self.build_dir.name
+
+        os.makedirs(os.path.join(self.build_dir.name, "trivial"))
+        with open(os.path.join(self.build_dir.name, "trivial", "result"),
+                  "w") as f:
+            f.write("result")
+
+        procUnit.RESULT_TRANSFER_DELAY = 0.01
+
+    async def asyncTearDown(self) -> None:
+        self.build_dir.cleanup()
+        procUnit.RESULT_TRANSFER_DELAY = 1
+
+    async def test_ResultTransfer_Attempts(self) -> None:
+        # Setup
+        output = OutputBroken()
+        sent = []  # type: typing.List[Letter]
+
+        async def send(letter: Letter) -> None:
+            sent.append(letter)
+
+        job = NewLetter("Job", "123456", "v1", "",
+                        {'cmds': [], 'resultPath': "./result"})
+
+        # Exercise
+        await job_result_transfer_check_link_forever(
+            typing.cast(Output, output), "Master", job, send)
+
+        # Verify
+        self.assertEqual(procUnit.RESULT_TRANSFER_ATTEMPTS, output.attempts)
+        self.assertEqual(1, len(sent))
+        self.assertEqual(Letter.RESPONSE_STATE_FAILURE,
+                         sent[0].getContent('state'))
+
+    async def test_ResultTransfer_JobProcUnit(self) -> None:
+        # Setup
+        output = OutputBroken()
+        unit = JobProcUnit("JobUnit")
+        unit.setOutput(typing.cast(Output, output))
+
+        job = NewLetter("Job", "123456", "v1", "",
+                        {'cmds': [], 'resultPath': "./result"})
+
+        # Exercise
+        with self.assertRaises(ConnectionError):
+            await unit._job_result_transfer("Poster", job)
+
+        # Verify
+        self.assertEqual(procUnit.RESULT_TRANSFER_ATTEMPTS, output.attempts)
+
+
 class PostProcUnitTestCases(unittest.IsolatedAsyncioTestCase):
 
     async def asyncSetUp(self) -> None:
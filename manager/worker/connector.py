@@ -20,7 +20,9 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import os
 import asyncio
+import hashlib
 import typing
 import platform
 import traceback
@@ -28,10 +30,41 @@ import manager.worker.configs as cfg
 from datetime import datetime
 from manager.basic.letter import BinaryLetter, sending_sock
 from socket import socket
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from manager.worker.channel import ChannelReceiver
 from manager.basic.letter import receving, sending, HeartbeatLetter, Letter,\
-    PropLetter
+    PropLetter, FileDescLetter, negotiateFrame, compressThreshold
+from manager.basic.letterWriter import LetterWriter
+from manager.basic.streamCodec import ENCODING_ZLIB, choose_encoding, \
+    encode_range
+
+
+def file_digests(path: str, ranges: typing.List[typing.Tuple[int, int]]) \
+        -> typing.Tuple[str, typing.List[str]]:
+    """
+    Hex digest of a file and of each of it's ranges in one pass,
+    ranges are consecutive from the begin of the file.
+    """
+    whole = hashlib.sha256()
+    digests = []
+
+    with open(path, "rb") as f:
+        for begin, end in ranges:
+            h = hashlib.sha256()
+            remain = end - begin
+
+            while remain > 0:
+                chunk = f.read(min(remain, 1024 * 1024))
+                if chunk == b"":
+                    break
+
+                whole.update(chunk)
+                h.update(chunk)
+                remain -= len(chunk)
+
+            digests.append(h.hexdigest())
+
+    return whole.hexdigest(), digests
 
 
 class Link:
@@ -49,7 +82,7 @@ class Link:
     def __init__(self, ident: str, host: str, port: int,
                  reader: asyncio.StreamReader,
                  writer: asyncio.StreamWriter,
-                 isActive: int) -> None:
+                 isActive: int, compress: int = 0) -> None:
         self.ident = ident
         self.reader = reader
         self.writer = writer
@@ -60,6 +93,35 @@ class Link:
         self.host = host
         self.port = port
 
+        # Framing version of letters send on this link. Stay
+        # in FRAME_V1 until opposite confirm it support wider frame.
+        self.frame = Letter.FRAME_V1
+
+        # Threshold of compression, used after opposite
+        # confirm it support FRAME_V4.
+        self.compress = compress
+
+        # Letters of this link are write by it's own
+        # writer so a slow link unable to block others.
+        self.out = LetterWriter(writer, self.frame, compress=compress)
+
+    def setFrame(self, frame: int) -> None:
+        self.frame = frame
+        self.out.setFrame(frame)
+
+    def setStream(self, reader: asyncio.StreamReader,
+                  writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+
+        # Letters queued on the broken stream are failed.
+        self.out.stop()
+        self.frame = Letter.FRAME_V1
+        self.out = LetterWriter(writer, self.frame, compress=self.compress)
+
+    async def send(self, letter: Letter) -> None:
+        await self.out.send(letter)
+
     def hb_timeer_udpate(self) -> None:
         self.last = datetime.utcnow()
 
@@ -67,23 +129,44 @@ class Link:
         return (datetime.utcnow() - self.last).seconds
 
     def disconnect(self) -> None:
+        self.out.stop()
         self.writer.close()
 
 
 class Linker:
 
+    # Seconds to wait for opposite to accept a file
+    # in raw bytes before fallback to BinaryLetters.
+    RAW_ACCEPT_TIMEOUT = 3
+
+    # A file is split into ranges no smaller than this
+    # while it's uploaded over several data connections.
+    MIN_RANGE_SIZE = 64 * 1024 * 1024
+
     def __init__(self) -> None:
         self._links = {}  # type: typing.Dict[str, Link]
         self._links_passive = {}  # type: typing.Dict[str, Link]
         self._lis = {}  # type: typing.Dict[str, typing.Any]
         self.msg_callback = None  # type: typing.Optional[typing.Callable]
         self._loop = asyncio.get_running_loop()
-        self._lock = asyncio.Lock()
 
         assert(cfg.config is not None)
         self._hostname = cfg.config.getConfig('WORKER_NAME')
         if self._hostname == "":
             self._hostname = platform.node()
+
+        # Threshold of compression of each type of links.
+        self._compress = compressThreshold(
+            cfg.config.getConfig('COMPRESSION', 'control'))
+        self._compress_data = compressThreshold(
+            cfg.config.getConfig('COMPRESSION', 'data'))
+
+        # Number of data connections a file is uploaded over.
+        streams = cfg.config.getConfig('UPLOAD_STREAMS')
+        self._streams = max(int(streams), 1) if streams != "" else 1
+
+        self._encoders = None  # type: typing.Optional[ThreadPoolExecutor]
+        self._encoder_workers = os.cpu_count() or 1
         self.channel_data = None  # type: typing.Optional[typing.Dict]
 
     def set_host_name(self, name: str) -> None:
@@ -96,7 +179,8 @@ class Linker:
         reader, writer = await asyncio.open_connection(host, port)
 
         self._links[linkid] = Link(
-            linkid, host, port, reader, writer, Link.ACTIVE)
+            linkid, host, port, reader, writer, Link.ACTIVE,
+            compress=self._compress)
 
         self._loop.create_task(self._active_link(reader, writer, linkid))
 
@@ -112,8 +196,7 @@ class Linker:
                 await asyncio.sleep(1)
 
         link.hbCount = 0
-        link.reader = reader
-        link.writer = writer
+        link.setStream(reader, writer)
         link.state = Link.CONNECTED
 
         self._loop.create_task(self._active_link(reader, writer, link.ident))
@@ -134,13 +217,18 @@ class Linker:
             # RST command will sended by master
             # so proc must be 0.
             await sending(writer, PropLetter(
-                self._hostname, max_proc_job, str(0), role))
+                self._hostname, max_proc_job, str(0), role,
+                frame=Letter.FRAME_V4))
 
             # Send First heartbeat
             await sending(writer, HeartbeatLetter(self._hostname, 0))
             # Update timer
             link.hb_timeer_udpate()
 
+            # Handshake is done, letters queued during
+            # connecting are able to be write.
+            link.out.start()
+
         except (ConnectionError, BrokenPipeError):
             # Wait a while
             await asyncio.sleep(1)
@@ -171,6 +259,9 @@ class Linker:
             if isinstance(letter, HeartbeatLetter):
                 link.hb_timeer_udpate()
                 await self.heartbeat_proc_active(linkid, letter)
+            elif isinstance(letter, PropLetter):
+                # Opposite confirm the framing to use.
+                link.setFrame(negotiateFrame(letter.getFrame()))
             else:
                 if self.msg_callback is None:
                     raise LINK_MSG_CALLBACK_NOT_EXISTS()
@@ -210,8 +301,16 @@ class Linker:
             if ident in self._links:
                 return
 
-            self._links_passive[ident] = Link(
-                ident, "", 0, reader, writer, Link.PASSIVE)
+            link = Link(ident, "", 0, reader, writer, Link.PASSIVE,
+                        compress=self._compress)
+            frame = negotiateFrame(propLetter.getFrame())
+            self._links_passive[ident] = link
+
+            if frame > Letter.FRAME_V1:
+                await sending(writer, PropLetter(
+                    self._hostname, "0", "0", "", frame=frame))
+            link.setFrame(frame)
+            link.out.start()
         else:
             return
 
@@ -219,7 +318,7 @@ class Linker:
             try:
                 letter = await receving(reader)
             except Exception:
-                writer.close()
+                link.disconnect()
                 del self._links_passive[ident]
                 break
 
@@ -239,11 +338,12 @@ class Linker:
         except KeyError:
             raise LINK_NOT_EXISTS(linkid)
 
-        await sending(link.writer, letter, lock=self._lock)
+        await link.send(letter)
 
     @staticmethod
     def _do_send_file(sock: socket, path: str, tid: str,
-                      version: str, fileName: str) -> bool:
+                      version: str, fileName: str,
+                      compress: int = 0) -> bool:
 
         try:
             with open(path, "rb") as f:
@@ -256,7 +356,7 @@ class Linker:
                         tid=tid, bStr=bytes,
                         parent=version, fileName=fileName)
 
-                    sending_sock(sock, bLetter)
+                    sending_sock(sock, bLetter, compress=compress)
 
             lastLetter = BinaryLetter(
                 tid=tid, bStr=b"",
@@ -274,6 +374,11 @@ class Linker:
                        version: str, fileName: str) -> bool:
         """
         First, open a datalink to target then transfer file.
+
+        File is transfered in raw bytes via loop.sendfile() if
+        opposite accept it otherwise in BinaryLetters. Bytes are
+        compressed while transfer if compress of the address is
+        a zlib level and the file is compressible.
         """
         assert(cfg.config is not None)
 
@@ -286,6 +391,110 @@ class Linker:
 
         assert(address != {})
 
+        sent = await self._sendfile_raw(address, tid, path, version, fileName)
+        if sent is not None:
+            return sent
+
+        return await self._sendfile_letters(
+            address, tid, path, version, fileName)
+
+    def _encoder(self) -> ThreadPoolExecutor:
+        # Blocks of files are compressed on all cores.
+        if self._encoders is None:
+            self._encoders = ThreadPoolExecutor(self._encoder_workers)
+        return self._encoders
+
+    def _ranges(self, size: int) -> typing.List[typing.Tuple[int, int]]:
+        n = min(self._streams, max(size // self.MIN_RANGE_SIZE, 1))
+        step = -(-size // n)
+
+        return [(b, min(b + step, size)) for b in range(0, size, step)] \
+            or [(0, 0)]
+
+    async def _sendfile_raw(self, address: typing.Dict, tid: str, path: str,
+                            version: str, fileName: str) -> typing.Optional[bool]:
+        """
+        Return None if opposite not accept the file.
+
+        A large file is split into ranges which are transfered over
+        several data connections concurrently. Transfer of a range
+        begin from the offset opposite replied so a broken transfer
+        is resumed, the range is transfered only if digest computed
+        by opposite is equal to digest of the range.
+        """
+        size = os.path.getsize(path)
+        ranges = self._ranges(size)
+
+        digest, digests = await self._loop.run_in_executor(
+            None, file_digests, path, ranges)
+
+        level = address.get('compress', 0) or 0
+        encoding = await self._loop.run_in_executor(
+            None, choose_encoding, path, level)
+
+        results = await asyncio.gather(*[
+            self._sendrange(address, path, FileDescLetter(
+                tid, version, fileName, size, sha256=digest,
+                begin=begin, end=end, rangeSha256=rangeDigest,
+                encoding=encoding), level)
+            for (begin, end), rangeDigest in zip(ranges, digests)
+        ])
+
+        if all(r is None for r in results):
+            return None
+
+        return all(results)
+
+    async def _sendrange(self, address: typing.Dict, path: str,
+                         desc: FileDescLetter,
+                         level: int = 0) -> typing.Optional[bool]:
+        r, w = await asyncio.open_connection(
+            address['host'], address['dataPort'])
+
+        try:
+            await sending(w, desc)
+
+            try:
+                reply = await receving(r, timeout=self.RAW_ACCEPT_TIMEOUT)
+            except (asyncio.TimeoutError, ConnectionError):
+                # Opposite unable to receive file in raw bytes.
+                return None
+
+            if not isinstance(reply, FileDescLetter):
+                return None
+
+            offset, end = reply.getOffset(), desc.getEnd()
+
+            if offset < end and reply.getEncoding() == ENCODING_ZLIB:
+                async for block in encode_range(
+                        path, offset, end, level,
+                        self._encoder(), self._encoder_workers):
+                    w.write(block)
+                    await w.drain()
+            elif offset < end:
+                with open(path, "rb") as f:
+                    await self._loop.sendfile(
+                        w.transport, f, offset, end - offset)
+                await w.drain()
+
+            verdict = await receving(r)
+            if not isinstance(verdict, FileDescLetter) or \
+               verdict.getRangeSha256() != desc.getRangeSha256():
+                return False
+
+        except Exception:
+            traceback.print_exc()
+            return False
+
+        finally:
+            # Close DataLink
+            w.close()
+
+        return True
+
+    async def _sendfile_letters(self, address: typing.Dict, tid: str,
+                                path: str, version: str,
+                                fileName: str) -> bool:
         r, w = await asyncio.open_connection(
             address['host'], address['dataPort'])
 
@@ -294,7 +503,7 @@ class Linker:
             with ProcessPoolExecutor() as e:
                 await self._loop.run_in_executor(
                     e, self._do_send_file, sock._sock,
-                    path, tid, version, fileName)
+                    path, tid, version, fileName, self._compress_data)
 
             # Close DataLink
             w.close()
@@ -333,7 +542,7 @@ class Linker:
         link.hbCount += 1
 
         heartbeat.setIdent(self._hostname)
-        await sending(link.writer, heartbeat)
+        await link.send(heartbeat)
 
     async def _next_heartbeat(self, link: Link, delay: int) -> None:
         await asyncio.sleep(delay)
@@ -341,7 +550,7 @@ class Linker:
         hb = HeartbeatLetter(self._hostname, link.hbCount)
 
         try:
-            await sending(link.writer, hb)
+            await link.send(hb)
         except ConnectionError:
             # Just return
             # that link will be rebuild while timer
@@ -382,6 +591,10 @@ class Connector(ChannelReceiver):
         # cause Linker only maintain connection.
         self._endpoints = {}  # type: typing.Dict[str, asyncio.DatagramTransport]
 
+        assert(cfg.config is not None)
+        self._compress_log = compressThreshold(
+            cfg.config.getConfig('COMPRESSION', 'log'))
+
     async def listen(self, lisId: str, host: str, port: int) -> None:
         await self._linker.new_listen(lisId, host, port)
 
@@ -459,7 +672,8 @@ class Connector(ChannelReceiver):
             raise ENDPOINT_NOT_EXISTS(endpoint_id)
 
         endpoint = self._endpoints[endpoint_id]
-        endpoint.sendto(preproc(data, *procargs).toBytesWithLength())
+        endpoint.sendto(preproc(data, *procargs).toBytesWithLength(
+            compress=self._compress_log))
 
 
 class LINK_ID_NOT_FOUND(Exception):
@@ -22,75 +22,124 @@
 
 import os
 import traceback
-from typing import Dict, BinaryIO, Optional, cast, Tuple
+import manager.worker.configs as cfg
+from typing import Optional, Tuple, Union
 from manager.basic.letter import BinaryLetter
-from manager.basic.dataLink import DataLink, DataLinkNotify
+from manager.basic.dataLink import DataLink, DataLinkNotify, RawFile
+from manager.basic.storage import PARTIAL_SUFFIX
+from manager.basic.ingest import IngestEngine
+from manager.basic.util import speculation_tag
 from manager.worker.processor import Processor
 
 
-def post_file_create(post_dir: str, version: str, fileName: str) -> Optional[BinaryIO]:
+def post_file_path(post_dir: str, version: str, fileName: str) -> str:
     path = "/".join([post_dir, version])
     if not os.path.exists(path):
         os.makedirs(path)
 
-    return open("/".join([path, fileName]), "wb")
+    return "/".join([path, fileName])
 
 
 class POST_BINARY_STORE_FAILED(Exception):
     pass
 
 
-async def binaryStore(dl: DataLink, bl: BinaryLetter,
+def ingest_engine() -> IngestEngine:
+    """
+    Engine of the DataLink process, it's created after the
+    DataLink process is started.
+    """
+    global _engine
+
+    if _engine is None:
+        _engine = IngestEngine() if cfg.config is None \
+            else IngestEngine.fromConfig(cfg.config)
+
+    return _engine
+
+
+_engine = None  # type: Optional[IngestEngine]
+
+
+async def binaryStore(dl: DataLink, bl: Union[BinaryLetter, RawFile],
                       post_dir: str) -> None:
     """
     Save binaryfile to to PostDir.
     """
+    if isinstance(bl, RawFile):
+        return await rawFileStore(dl, bl, post_dir)
+
+    engine = ingest_engine()
+
+    tid = bl.getTid()
+    fileName = bl.getFileName()
+    version = bl.getParent()
+
+    # Several files may transfer at the same time, each
+    # of them is write by it's own stream keyed by tid.
+    stream = engine.get(tid)
 
     try:
-        # Cause several file may transfer at the same time
-        # so need a dict to keep track of all of in transfered file.
-        #
-        # Store info of in transfer file in binaryStore is better
-        # than in global cause these info should only be accessed
-        # by binaryStore.
-        if not hasattr(binaryStore, 'fds'):
-            binaryStore.fds = {}  # type: Dict[str, BinaryIO]
-
-        fds = cast(Dict[str, BinaryIO], binaryStore.fds)  # type: ignore
-
-        tid = bl.getTid()
-        fileName = bl.getFileName()
-        version = bl.getParent()
-
-        if tid not in fds:
-            # A new transfer file.
+        # Copies of a task transfer the same file, each of
+        # them is write into a partial file of it's own.
+        suffix = speculation_tag(tid) + PARTIAL_SUFFIX
 
-            fd = post_file_create(post_dir, version, fileName)
-            if fd is None:
-                raise POST_BINARY_STORE_FAILED()
-            else:
-                fds[tid] = fd
-        else:
-            fd = fds[tid]
+        if stream is None:
+            # A new transfer file.
+            path = post_file_path(post_dir, version, fileName)
+            stream = engine.open(tid, path + suffix)
 
         bStr = bl.getBytes()
         if bStr == b"":
             # File transfer done
-            fd.close()
-            del fds[tid]
+            await stream.close()
+            os.replace(stream.path(), stream.path()[:-len(suffix)])
 
             # Notify to PostProcUnit that a file is transfer
             # finished.
             dl.notify(DataLinkNotify("BINARY", (version, tid, fileName)))
         else:
-            fd.write(bStr)
+            await stream.write(bStr)
     except Exception:
+        if stream is not None and engine.get(tid) is not None:
+            await stream.abort()
+
         # Notify to PostProcUnit that a file is fail to
         # transfer
         dl.notify(DataLinkNotify("BINARY", (version, tid, "")))
         traceback.print_exc()
 
 
+async def rawFileStore(dl: DataLink, raw: RawFile, post_dir: str) -> None:
+    """
+    Save a file transfered in raw bytes to PostDir, bytes of
+    a broken transfer are kept so sender is able to resume.
+    """
+    tid, fileName, version = raw.getTid(), raw.getFileName(), raw.getParent()
+
+    try:
+        path = post_file_path(post_dir, version, fileName)
+    except Exception:
+        # Notify to PostProcUnit that a file is fail to
+        # transfer
+        dl.notify(DataLinkNotify("BINARY", (version, tid, "")))
+        raise
+
+    partial = path + speculation_tag(tid) + PARTIAL_SUFFIX
+
+    if await raw.saveTo(partial, ingest_engine()) != RawFile.SAVE_DONE:
+        # Digest mismatch or another ranges are in transfer. A
+        # mismatched range is sent again by sender, sender report
+        # the task as failed if it give up.
+        return None
+
+    os.replace(partial, path)
+
+    # Notify to PostProcUnit that a file is transfer
+    # finished.
+    dl.notify(DataLinkNotify("BINARY", (version, tid, fileName)))
+
+
 def binaryStoreNotify(msg: Tuple[str, str, str], proc: Processor) -> None:
     version, tid, fileName = msg[0], msg[1], msg[2]
     bl = BinaryLetter(tid, bStr=b"", fileName=fileName, parent=version)
@@ -29,13 +29,14 @@ from manager.basic.util import decode_confident
 async def jobProcUnit_output_proc(datas: bytes, *args) -> None:
     """
     Warp log data within TaskLogLetter then send via endpoint.
-    args: [taskid, endpoint]
+    args: [taskid, endpoint, compress]
     """
     taskid, endpoint = args[0], args[1]  # type: str, asyncio.DatagramTransport
+    compress = args[2] if len(args) > 2 else 0
 
     datas_decode = decode_confident(datas)
     if datas_decode == "":
         return None
     letter = TaskLogLetter(taskid, datas_decode)
 
-    endpoint.sendto(letter.toBytesWithLength())
+    endpoint.sendto(letter.toBytesWithLength(compress=compress))
@@ -38,9 +38,10 @@ from manager.basic.commandExecutor import CommandExecutor
 
 # Need by JobProcUnit
 import shutil
-from manager.basic.util import pathSeperator, execute_shell_until_complete
+from manager.basic.util import pathSeperator, execute_shell_until_complete, \
+    speculation_origin
 from manager.basic.letter import NewLetter, ResponseLetter,\
-    BinaryLetter
+    BinaryLetter, compressThreshold
 from manager.worker.connector import Link
 from manager.basic.info import Info
 from manager.worker.misc.jobProcUnitMisc import jobProcUnit_output_proc
@@ -54,6 +55,11 @@ from manager.worker.exceptions import RESULT_FILE_NOT_FOUND
 UNIT_TYPE_JOB_PROC = 0
 UNIT_TYPE_POST_PROC = 1
 
+# Attempts to transfer a result and seconds to wait
+# before the second attempt.
+RESULT_TRANSFER_ATTEMPTS = 5
+RESULT_TRANSFER_DELAY = 1
+
 
 class ProcUnit(abc.ABC):
 
@@ -239,7 +245,10 @@ async def job_result_transfer(target: str, job: NewLetter,
     if not os.path.exists(result_path):
         raise RESULT_FILE_NOT_FOUND(result_path)
 
-    await output.sendfile(target, result_path, tid, version, fileName)
+    if not await output.sendfile(target, result_path, tid, version, fileName):
+        # Transfer again, it's resumed from bytes that
+        # opposite already received.
+        raise ConnectionError()
 
 
 async def do_job_result_transfer(path, tid: str, linkid: str,
@@ -280,18 +289,28 @@ async def job_result_transfer_check_link(
 async def job_result_transfer_check_link_forever(
         output: Output, linkid: str, job: NewLetter,
         send_rtn: Callable, timeout=None) -> None:
+    """
+    Transfer result until it's done, a failed transfer is
+    tried again after a delay which is doubled each time. The
+    transfer is reported as failed after RESULT_TRANSFER_ATTEMPTS
+    attempts.
+    """
+    delay = RESULT_TRANSFER_DELAY
+
+    for i in range(RESULT_TRANSFER_ATTEMPTS):
+        try:
+            await job_result_transfer_check_link(output, linkid, job,
+                                                 send_rtn, timeout=timeout)
+            return
+        except (ConnectionError, BrokenPipeError):
+            await asyncio.sleep(delay)
+            delay = delay * 2
 
-    try:
-        await job_result_transfer_check_link(output, linkid, job,
-                                             send_rtn, timeout=timeout)
-    except (ConnectionError, BrokenPipeError):
-        asyncio.get_running_loop().create_task(
-            job_result_transfer_check_link_forever(
-                output, linkid, job, send_rtn, timeout=timeout)
-        )
+        except asyncio.exceptions.TimeoutError:
+            return
 
-    except asyncio.exceptions.TimeoutError:
-        return
+    await notify_job_state(
+        job.getTid(), Letter.RESPONSE_STATE_FAILURE, send_rtn)
 
 
 async def notify_job_state(tid: str, state: str, rtn: Callable) -> None:
@@ -460,8 +479,11 @@ class JobProcUnit(JobProcUnitProto):
 
         # Setup CommandExecutor
         self._cmd_executor.setCommand(commands)
+        compress = compressThreshold(
+            self._config.getConfig('COMPRESSION', 'log'))
+
         self._cmd_executor.set_output_proc(
-            jobProcUnit_output_proc, tid, endpoint)
+            jobProcUnit_output_proc, tid, endpoint, compress)
 
         # Execute Command
         ret_code = await self._cmd_executor.run()
@@ -539,6 +561,18 @@ class JobProcUnit(JobProcUnitProto):
                                    job: NewLetter) -> None:
 
         assert(self._output_space is not None)
+
+        # A failed transfer is resumed by next attempt, failure
+        # of the last attempt is raised to caller.
+        delay = RESULT_TRANSFER_DELAY
+        for i in range(RESULT_TRANSFER_ATTEMPTS - 1):
+            try:
+                return await job_result_transfer(
+                    target, job, self._output_space)
+            except (ConnectionError, BrokenPipeError):
+                await asyncio.sleep(delay)
+                delay = delay * 2
+
         await job_result_transfer(target, job, self._output_space)
 
     async def _notify_job_state(self, tid: str, state: str) -> None:
@@ -684,6 +718,8 @@ class Post:
 
 class PostProcUnit(PostProcUnitProto):
 
+    TRANSFER_ATTEMPTS = 5
+
     def __init__(self, ident: str) -> None:
         PostProcUnitProto.__init__(self, ident, UNIT_TYPE_POST_PROC)
         self._posts = {}  # type: Dict[str, Post]
@@ -721,7 +757,8 @@ class PostProcUnit(PostProcUnitProto):
     async def _frag_collect(self, letter: BinaryLetter) -> None:
         assert(configs.config is not None)
 
-        tid = letter.getTid()
+        # A frag may come from a copy of the task.
+        tid = speculation_origin(letter.getTid())
         version = letter.getParent()
 
         # Make target post's ident via
@@ -756,8 +793,12 @@ class PostProcUnit(PostProcUnitProto):
             # Success
             fileName = path.split(pathSeperator())[-1]
 
-            await self._output_space.sendfile(
-                "Master", path, post.ident(), post.version(), fileName)
+            for i in range(self.TRANSFER_ATTEMPTS):
+                # A failed transfer is resumed by next attempt.
+                if await self._output_space.sendfile(
+                        "Master", path, post.ident(), post.version(),
+                        fileName):
+                    break
 
             # Wait a seonds
             await asyncio.sleep(3)